@@ -1,11 +1,18 @@
-from re import S
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import csv
 import os
-from database_handlers import get_database_handler, DatabaseHandler
-from sponsor import Sponsor
-from help import HelpSystem
+from database_handlers import get_database_handler
+from limits import PartialResult, QueryLimits
+from metrics import get_registry, format_status
+from result_set import ResultSet, as_result_set
+from tracing import get_tracer, span
+
+# How often the status bar metrics are refreshed
+METRICS_REFRESH_MS = 1000
+# Guard rails for loading a table into the grid
+GRID_LIMITS = QueryLimits(max_rows=100000, max_bytes=512 * 1024 * 1024, max_seconds=60)
+# Rows shown when a table is opened as a random sample preview
+PREVIEW_ROWS = 1000
 
 class SQLiteApp:
     def __init__(self, root, sponsor=None):
@@ -16,7 +23,13 @@ class SQLiteApp:
         self.conn = None
         self.current_table = None
         self.db_handler = None
-        self.help_system = HelpSystem(self.root)
+        self.help_system = None
+        self.plugin_manager = None
+        self.search_index = None
+        self.tree_items = []
+        self.sort_order = None
+        # Sampled rows shown in the grid, while previewing a table
+        self.preview = None
 
     def ask_table_selection(self, tables):
         dialog = tk.Toplevel(self.root)
@@ -58,11 +71,31 @@ class SQLiteApp:
         menubar.add_cascade(label='File', menu=file_menu)
         file_menu.add_command(label='Open Database', command=self.open_database, accelerator='Ctrl+O')
         file_menu.add_command(label='Export to CSV', command=self.export_to_csv, accelerator='Ctrl+E')
+        file_menu.add_command(label='Export Metrics', command=self.export_metrics)
         file_menu.add_separator()
         file_menu.add_command(label='Create Sample Database', command=self.create_sample_database)
         file_menu.add_separator()
         file_menu.add_command(label='Exit', command=self.root.quit, accelerator='Ctrl+Q')
 
+        # Create Tools menu
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label='Tools', menu=tools_menu)
+        tools_menu.add_command(label='Start Tracing', command=self.start_tracing)
+        tools_menu.add_command(label='Stop Tracing and Save...', command=self.stop_tracing)
+        tools_menu.add_command(label='Profile Table...', command=self.profile_table)
+        tools_menu.add_command(label='Copy Table to SQLite...', command=self.copy_table_to_sqlite)
+        tools_menu.add_command(label='Explain Query...', command=self.explain_query)
+        tools_menu.add_command(label='Suggest Indexes...', command=self.suggest_indexes)
+        tools_menu.add_separator()
+        # Copy dBase, MVO and Access tables into a local SQLite cache on open
+        self.use_cache = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label='Use Local Cache for File Databases',
+                                   variable=self.use_cache)
+        # Open tables as a random sample instead of reading them from the start
+        self.sample_preview = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label='Open Tables as Random Sample Preview',
+                                   variable=self.sample_preview)
+
         # Create Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label='Help', menu=help_menu)
@@ -70,6 +103,89 @@ class SQLiteApp:
         help_menu.add_command(label='Show Help', command=self.show_help, accelerator='Ctrl+H')
         help_menu.add_command(label='Sponsors', command=self.show_sponsors, accelerator='Ctrl+S')
 
+        # Status bar: messages on the left, live query metrics on the right
+        status_frame = ttk.Frame(self.root, relief=tk.SUNKEN)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_bar = ttk.Label(status_frame, text='Ready', anchor=tk.W)
+        self.status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.metrics_label = ttk.Label(status_frame, text='', anchor=tk.E)
+        self.metrics_label.pack(side=tk.RIGHT)
+
+        # Search bar
+        search_frame = ttk.Frame(self.root)
+        search_frame.pack(side=tk.TOP, fill=tk.X)
+        ttk.Label(search_frame, text='Search:').pack(side=tk.LEFT, padx=(5, 2))
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, pady=2)
+        self.search_entry.bind('<Return>', lambda e: self.search())
+        ttk.Button(search_frame, text='Find', command=self.search).pack(side=tk.LEFT, padx=5)
+
+        # Table grid
+        tree_frame = ttk.Frame(self.root)
+        tree_frame.pack(fill='both', expand=True)
+        self.tree = ttk.Treeview(tree_frame, show='headings')
+        y_scroll = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        x_scroll = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.tree.pack(fill='both', expand=True)
+
+        # Keyboard shortcuts
+        self.root.bind('<Control-o>', lambda e: self.open_database())
+        self.root.bind('<Control-e>', lambda e: self.export_to_csv())
+        self.root.bind('<Control-q>', lambda e: self.root.quit())
+        self.root.bind('<Control-h>', lambda e: self.show_help())
+        self.root.bind('<Control-s>', lambda e: self.show_sponsors())
+        self.root.bind('<Control-f>', lambda e: self.search_entry.focus_set())
+
+        self.refresh_metrics()
+
+    def refresh_metrics(self):
+        """Update the live metrics shown in the status bar"""
+        summary = get_registry().summary()
+        if summary['queries'] or summary['rows']:
+            self.metrics_label.config(text=format_status(summary))
+        self.root.after(METRICS_REFRESH_MS, self.refresh_metrics)
+
+    def start_tracing(self):
+        """Begin recording trace spans for handler and UI stages"""
+        get_tracer().start()
+        self.status_bar.config(text='Tracing started')
+
+    def stop_tracing(self):
+        """Stop tracing and save the spans as a Chrome trace for Perfetto"""
+        tracer = get_tracer()
+        tracer.stop()
+        try:
+            file_path = filedialog.asksaveasfilename(
+                defaultextension='.json',
+                filetypes=[('Chrome trace', '*.json'), ('All files', '*.*')],
+                initialfile='dbbrowser_trace.json'
+            )
+            if not file_path:
+                return
+            count = tracer.export_chrome_trace(file_path)
+            self.status_bar.config(text=f'Saved {count} trace spans to {os.path.basename(file_path)}')
+        except Exception as e:
+            messagebox.showerror('Export Error', str(e))
+
+    def export_metrics(self):
+        """Save a snapshot of the query metrics for monitoring"""
+        try:
+            file_path = filedialog.asksaveasfilename(
+                defaultextension='.prom',
+                filetypes=[('Prometheus text', '*.prom'), ('JSON', '*.json'), ('All files', '*.*')],
+                initialfile='dbbrowser_metrics.prom'
+            )
+            if not file_path:
+                return
+            get_registry().dump(file_path)
+            self.status_bar.config(text=f'Metrics saved to {os.path.basename(file_path)}')
+        except Exception as e:
+            messagebox.showerror('Export Error', str(e))
+
     def show_sponsors(self):
         if self.sponsor:
             self.sponsor.show_sponsor()
@@ -172,17 +288,6 @@ class SQLiteApp:
             messagebox.showerror('Error', f'Failed to create sample database: {str(e)}')
             dialog.destroy()
 
-        # Status bar
-        self.status_bar = ttk.Label(self.root, text='Ready', relief=tk.SUNKEN, anchor=tk.W)
-        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
-
-        # Keyboard shortcuts
-        self.root.bind('<Control-o>', lambda e: self.open_database())
-        self.root.bind('<Control-e>', lambda e: self.export_to_csv())
-        self.root.bind('<Control-q>', lambda e: self.root.quit())
-        self.root.bind('<Control-h>', lambda e: self.show_help())
-        self.root.bind('<Control-s>', lambda e: self.show_sponsors())
-
     def open_database(self):
         try:
             db_path = filedialog.askopenfilename(
@@ -214,16 +319,20 @@ class SQLiteApp:
                 self.db_handler.close()
             
             # Get the appropriate database handler
-            self.db_handler = get_database_handler(db_path)
-            
-            if not self.db_handler:
-                messagebox.showerror('Error', f'No handler found for database type: {db_path}')
-                return
-            
-            self.db_handler.connect()
-            
-            # Get tables
-            tables = self.db_handler.get_tables()
+            with span('open_database', category='ui', path=db_path):
+                self.db_handler = get_database_handler(db_path)
+                
+                if not self.db_handler:
+                    messagebox.showerror('Error', f'No handler found for database type: {db_path}')
+                    return
+                
+                self.db_handler.connect()
+                self.db_handler.limits = GRID_LIMITS
+                if self.use_cache.get() and self.db_handler.CACHEABLE:
+                    self.db_handler.enable_cache()
+                
+                # Get tables
+                tables = self.db_handler.get_tables()
             
             if not tables:
                 messagebox.showwarning('Warning', 'No tables found in the database')
@@ -233,33 +342,105 @@ class SQLiteApp:
             selected_table = self.ask_table_selection(tables)
             
             if selected_table:
-                # Clear existing treeview
-                for i in self.tree.get_children():
-                    self.tree.delete(i)
-                
-                # Fetch and display table data
-                query = f'SELECT * FROM {selected_table}'
-                rows = self.db_handler.execute_query(query)
-                
-                if rows:
-                    # Configure treeview columns
-                    columns = list(rows[0].keys())
-                    self.tree['columns'] = columns
-                    for col in columns:
-                        self.tree.heading(col, text=col)
-                        self.tree.column(col, anchor='center', width=100)
-                    
-                    # Insert data
-                    for row in rows:
-                        self.tree.insert('', 'end', values=list(row.values()))
+                with span('load_table', category='ui', table=selected_table):
+                    # Fetch and display table data
+                    if self.sample_preview.get():
+                        rows = self.db_handler.sample_table(selected_table, PREVIEW_ROWS)
+                        self.preview = rows
+                    else:
+                        query = f'SELECT * FROM {selected_table}'
+                        rows = self.db_handler.execute_query(query)
+                        self.preview = None
+                    self.sort_order = None
+                    self.display_rows(rows)
                 
                 # Update status bar
-                self.status_bar.config(text=f'Loaded {selected_table} from {os.path.basename(db_path)}')
+                if self.preview is not None:
+                    estimate = self.db_handler.estimate_row_count(selected_table)
+                    total = f' of about {estimate:,}' if estimate else ''
+                    self.status_bar.config(text=f'Previewing a random sample of {len(rows):,} rows{total} '
+                                                f'in {selected_table}')
+                elif isinstance(rows, PartialResult):
+                    self.status_bar.config(text=f'Loaded the first {len(rows)} rows of {selected_table} '
+                                                f'({rows.describe()})')
+                else:
+                    self.status_bar.config(text=f'Loaded {selected_table} from {os.path.basename(db_path)}')
                 self.current_table = selected_table
         
         except Exception as e:
             messagebox.showerror('Error', str(e))
 
+    def display_rows(self, rows):
+        """Replace the grid contents with rows and index them for search"""
+        # Clear existing treeview
+        with span('clear', category='ui'):
+            for i in self.tree.get_children():
+                self.tree.delete(i)
+            self.tree_items = []
+            if self.search_index is not None:
+                self.search_index.cancel()
+                self.search_index = None
+
+        if not rows:
+            return
+        with span('render', category='ui', rows=len(rows)):
+            # Configure treeview columns; clicking a heading sorts by that column
+            rows = as_result_set(rows)
+            columns = list(rows.columns)
+            self.tree['columns'] = columns
+            for col in columns:
+                text = col
+                if self.sort_order and self.sort_order[0] == col:
+                    text += ' \u25b2' if self.sort_order[1] == 'asc' else ' \u25bc'
+                self.tree.heading(col, text=text, command=lambda c=col: self.sort_by_column(c))
+                self.tree.column(col, anchor='center', width=100)
+
+            # Insert data
+            self.tree_items = [self.tree.insert('', 'end', values=values) for values in rows.rows]
+
+        # Index the loaded rows for search in the background
+        from search import InvertedIndex
+        self.search_index = InvertedIndex()
+        self.search_index.build_async([rows])
+
+    def sort_by_column(self, column):
+        """Reload the current table sorted by a column, toggling the direction on repeated clicks"""
+        if not self.db_handler or not self.current_table:
+            return
+        direction = 'asc'
+        if self.sort_order and self.sort_order[0] == column and self.sort_order[1] == 'asc':
+            direction = 'desc'
+        try:
+            # SQL handlers sort with ORDER BY; dBase and MVO use an external merge sort
+            with span('sort', category='ui', column=column, direction=direction):
+                if self.preview is not None:
+                    # A preview sorts its sample instead of reading the table
+                    from sorting import sort_key
+                    key = sort_key([(column, direction)])
+                    ordered = sorted(self.preview, key=key)
+                    self.preview = ResultSet(self.preview.columns, [row.values() for row in ordered])
+                    self.sort_order = (column, direction)
+                    self.display_rows(self.preview)
+                    self.status_bar.config(text=f'Sorted the sample of {self.current_table} by {column} ({direction})')
+                    return
+                rows = None
+                batches = self.db_handler.iter_table(self.current_table, order_by=[(column, direction)])
+                for batch in batches:
+                    batch = as_result_set(batch)
+                    if rows is None:
+                        rows = ResultSet(batch.columns)
+                    rows.extend(batch)
+                    if len(rows) >= GRID_LIMITS.max_rows:
+                        rows = rows[:GRID_LIMITS.max_rows]
+                        break
+                if hasattr(batches, 'close'):
+                    batches.close()
+                self.sort_order = (column, direction)
+                self.display_rows(rows)
+            self.status_bar.config(text=f'Sorted {self.current_table} by {column} ({direction})')
+        except Exception as e:
+            messagebox.showerror('Sort Error', str(e))
+
     def export_to_csv(self):
         try:
             if not self.db_handler:
@@ -280,33 +461,242 @@ class SQLiteApp:
                 if not selected_table:
                     return
 
-            # Ask user for save location
+            # Ask user for save location; a .gz or .zst suffix compresses the export
             file_path = filedialog.asksaveasfilename(
                 defaultextension='.csv',
-                filetypes=[('CSV files', '*.csv'), ('All files', '*.*')],
+                filetypes=[('CSV files', '*.csv'), ('Gzip-compressed CSV', '*.csv.gz'),
+                           ('Zstandard-compressed CSV', '*.csv.zst'),
+                           ('JSON Lines', '*.ndjson'), ('JSON', '*.json'), ('All files', '*.*')],
                 initialfile=f'{selected_table}.csv'
             )
 
             if not file_path:
                 return
 
-            query = f'SELECT * FROM {selected_table}'
-            rows = self.db_handler.execute_query(query)
-
-            with open(file_path, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                # Get column names from cursor description
-                columns = list(rows[0].keys())
-                writer.writerow(columns)
-                writer.writerows([list(row.values()) for row in rows])
+            # Rows are streamed from the database to the file in batches
+            with span('export', category='ui', table=selected_table):
+                json_format = self.json_export_format(file_path)
+                if json_format:
+                    self.export_to_json(selected_table, file_path, json_format)
+                else:
+                    # Checkpointed when the table has a key, so an interrupted export can be resumed
+                    from resumable_export import checkpoint_path, discard_checkpoint, resume_key
+                    if os.path.exists(checkpoint_path(file_path)) and not messagebox.askyesno(
+                            'Resume Export', 'An interrupted export to this file was found. Resume it?'):
+                        discard_checkpoint(file_path)
+                    resumable = resume_key(self.db_handler, selected_table) is not None
+                    self.db_handler.export_to_csv(selected_table, file_path, resumable=resumable)
             
             messagebox.showinfo('Success', f'Data exported to {os.path.basename(file_path)}')
         
         except Exception as e:
             messagebox.showerror('Export Error', str(e))
 
+    def search(self):
+        """Select the grid rows containing every word typed in the search bar"""
+        text = self.search_var.get().strip()
+        if not text or self.search_index is None:
+            return
+        with span('search', category='ui', text=text) as search_span:
+            positions = self.search_index.search(text)
+            search_span.set(matches=len(positions))
+            items = [self.tree_items[p] for p in positions if p < len(self.tree_items)]
+            self.tree.selection_set(items)
+            if items:
+                self.tree.see(items[0])
+        status = f'{len(items)} rows match "{text}"'
+        if not self.search_index.done.is_set():
+            status += f' (indexed {self.search_index.row_count} of {len(self.tree_items)} rows)'
+        self.status_bar.config(text=status)
+
+    def profile_table(self):
+        """Show per-column statistics of a table without loading it into the grid"""
+        if not self.db_handler:
+            messagebox.showerror('Error', 'No database connection')
+            return
+        tables = self.db_handler.get_tables()
+        if not tables:
+            messagebox.showwarning('Warning', 'No tables found in the database')
+            return
+        selected_table = self.current_table if self.current_table in tables else self.ask_table_selection(tables)
+        if not selected_table:
+            return
+        try:
+            from profiler import profile_table
+            with span('profile_table', category='ui', table=selected_table):
+                profiles = profile_table(self.db_handler, selected_table)
+        except Exception as e:
+            messagebox.showerror('Profile Error', str(e))
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f'Profile of {selected_table}')
+        fields = ('column', 'count', 'nulls', 'distinct', 'min', 'max', 'mean', 'stddev', 'top')
+        tree = ttk.Treeview(dialog, columns=fields, show='headings')
+        for field in fields:
+            tree.heading(field, text=field)
+            tree.column(field, width=90 if field != 'top' else 240)
+        for profile in profiles.values():
+            values = [profile['column'], profile['count'], profile['nulls'], f"~{profile['distinct']}",
+                      profile['min'], profile['max'],
+                      '' if profile['mean'] is None else f"{profile['mean']:.4g}",
+                      '' if profile['stddev'] is None else f"{profile['stddev']:.4g}",
+                      ', '.join(f'{value} ({count})' for value, count, _ in profile['top'][:5])]
+            tree.insert('', 'end', values=values)
+        tree.pack(fill='both', expand=True)
+        self.status_bar.config(text=f'Profiled {len(profiles)} columns of {selected_table}')
+
+    def copy_table_to_sqlite(self):
+        """Copy a table, with its column types translated, into a SQLite database file"""
+        if not self.db_handler:
+            messagebox.showerror('Error', 'No database connection')
+            return
+        tables = self.db_handler.get_tables()
+        if not tables:
+            messagebox.showwarning('Warning', 'No tables found in the database')
+            return
+        selected_table = self.current_table if self.current_table in tables else self.ask_table_selection(tables)
+        if not selected_table:
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension='.db',
+            filetypes=[('SQLite Database', '*.db'), ('All Files', '*.*')],
+            confirmoverwrite=False
+        )
+        if not file_path:
+            return
+        from database_handlers import SQLiteHandler
+        from table_copy import copy_table
+        destination = SQLiteHandler(file_path)
+        try:
+            destination.connect()
+            if selected_table in destination.get_tables() and not messagebox.askyesno(
+                    'Replace Table', f'{selected_table} already exists in {os.path.basename(file_path)}. Replace it?'):
+                return
+            with span('copy_table', category='ui', table=selected_table):
+                stats = copy_table(self.db_handler, selected_table, destination, if_exists='replace')
+            self.status_bar.config(text=f'Copied {stats.rows} rows of {selected_table} '
+                                        f'in {stats.seconds:.1f}s ({stats.rows_per_second:.0f} rows/s)')
+        except Exception as e:
+            messagebox.showerror('Copy Error', str(e))
+        finally:
+            destination.close()
+
+    def explain_query(self):
+        """Show the execution plan of a query, highlighting full scans and sorts of large tables"""
+        if not self.db_handler:
+            messagebox.showerror('Error', 'No database connection')
+            return
+        if not self.db_handler.SQL_QUERIES:
+            messagebox.showinfo('Explain Query', 'This database type does not run SQL queries')
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Explain Query')
+        dialog.geometry('900x500')
+
+        query_text = tk.Text(dialog, height=5, wrap='word')
+        query_text.pack(fill=tk.X, padx=5, pady=5)
+        if self.current_table:
+            query_text.insert('1.0', f'SELECT * FROM {self.db_handler.quote_identifier(self.current_table)}')
+
+        controls = ttk.Frame(dialog)
+        controls.pack(fill=tk.X, padx=5)
+        analyze_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls, text='Run query to measure actual rows and time (EXPLAIN ANALYZE)',
+                        variable=analyze_var).pack(side=tk.LEFT)
+        summary = ttk.Label(controls, text='')
+        summary.pack(side=tk.RIGHT)
+
+        fields = ('estimated', 'actual', 'time', 'cost', 'table rows', 'warnings')
+        tree = ttk.Treeview(dialog, columns=fields, show='tree headings')
+        tree.heading('#0', text='Operation')
+        tree.column('#0', width=330)
+        for field in fields:
+            tree.heading(field, text=field if field != 'time' else 'time (ms)')
+            tree.column(field, width=80 if field != 'warnings' else 220)
+        # Full scans of large tables and big sorts
+        tree.tag_configure('warning', background='#ffd6d6')
+
+        def show_plan():
+            query = query_text.get('1.0', 'end').strip()
+            if not query:
+                return
+            try:
+                with span('explain', category='ui'):
+                    plan = self.db_handler.explain(query, analyze=analyze_var.get())
+            except Exception as e:
+                messagebox.showerror('Explain Error', str(e), parent=dialog)
+                return
+            tree.delete(*tree.get_children())
+
+            def insert(node, parent):
+                text = node.label()
+                if node.detail and node.detail != node.operation:
+                    text += f' ({node.detail})'
+                values = ['' if value is None else value for value in
+                          (node.estimated_rows, node.actual_rows, node.actual_ms, node.cost, node.table_rows)]
+                values.append('; '.join(node.warnings))
+                item = tree.insert(parent, 'end', text=text, values=values, open=True,
+                                   tags=('warning',) if node.warnings else ())
+                for child in node.children:
+                    insert(child, item)
+            insert(plan.root, '')
+            timings = [f'{name} {value:.1f} ms' for name, value in
+                       (('planning', plan.planning_ms), ('execution', plan.execution_ms)) if value is not None]
+            warnings = plan.warnings
+            summary.config(text=', '.join(timings + [f'{len(warnings)} warnings' if warnings else 'no warnings']))
+
+        ttk.Button(controls, text='Explain', command=show_plan).pack(side=tk.RIGHT, padx=5)
+        tree.pack(fill='both', expand=True, padx=5, pady=5)
+
+    def suggest_indexes(self):
+        """Show CREATE INDEX statements for the queries run so far"""
+        if not self.db_handler:
+            messagebox.showerror('Error', 'No database connection')
+            return
+        if not self.db_handler.SQL_QUERIES:
+            messagebox.showinfo('Suggest Indexes', 'This database type does not run SQL queries')
+            return
+        from index_advisor import advise_indexes, recommendations_ddl
+        try:
+            with span('advise_indexes', category='ui'):
+                recommendations = advise_indexes(self.db_handler)
+        except Exception as e:
+            messagebox.showerror('Index Advisor Error', str(e))
+            return
+        if not recommendations:
+            messagebox.showinfo('Suggest Indexes', 'No index recommendations for the queries run so far')
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Suggest Indexes')
+        dialog.geometry('800x400')
+        text = tk.Text(dialog, wrap='none')
+        text.insert('1.0', recommendations_ddl(recommendations))
+        text.pack(fill='both', expand=True, padx=5, pady=5)
+
+    @staticmethod
+    def json_export_format(file_path):
+        """Return the JSON format named by an export file's suffix (before .gz/.zst), or None"""
+        from compression import compression_from_path
+        base = os.path.splitext(file_path)[0] if compression_from_path(file_path) else file_path
+        extension = os.path.splitext(base)[1].lower().lstrip('.')
+        return extension if extension in ('ndjson', 'jsonl', 'json') else None
+
+    def export_to_json(self, table_name, file_path, json_format):
+        """Export through the JSON export plugin, or the serializer directly before plugins load"""
+        plugin = None
+        if self.plugin_manager is not None:
+            plugin = self.plugin_manager.find_plugin_for(json_format, 'export')
+        if plugin is not None:
+            return plugin.export_table(self.db_handler, table_name, file_path, json_format)
+        from serializer import write_json
+        return write_json(self.db_handler.iter_table(table_name), file_path, json_format)
+
     def show_help(self):
         """Show the help system"""
+        if self.help_system is None:
+            from help import HelpSystem
+            self.help_system = HelpSystem(self.root)
         self.help_system.show_help()
 
     def show_about(self):
@@ -321,9 +711,19 @@ A cross-platform database browser application.
         """
         messagebox.showinfo("About Database Browser", about_text)
 
+    def show_plugin_status(self, results):
+        """Report plugin health check results in the status bar"""
+        unavailable = [name for name, status in results.items() if status != 'ok']
+        text = f'Plugins: {len(results) - len(unavailable)} available'
+        if unavailable:
+            text += f' ({", ".join(unavailable)} unavailable)'
+        self.status_bar.config(text=text)
+
     def close(self):
         if self.db_handler:
             self.db_handler.close()
+        if self.plugin_manager:
+            self.plugin_manager.shutdown()
         self.root.quit()
 
 if __name__ == '__main__':
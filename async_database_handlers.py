@@ -0,0 +1,338 @@
+"""
+Asyncio counterparts of the database handlers.
+
+PostgreSQL and MySQL use native async drivers (asyncpg, aiomysql) when they are
+installed. SQLite, dBase, MVO and Access, and the network databases when no
+async driver is available, run the synchronous handler in a shared, bounded
+thread pool, so hundreds of concurrent requests share a fixed number of threads
+instead of needing one thread per query.
+
+Example:
+    handler = get_async_database_handler(db_path='employees.db')
+    async with handler:
+        async for batch in handler.iter_table('Employees', batch_size=500):
+            ...
+"""
+
+import asyncio
+import csv
+import functools
+import importlib.util
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from compression import open_export_file
+from database_handlers import (DatabaseHandler, SQLiteHandler, MySQLHandler, PostgreSQLHandler,
+                               get_database_handler, load_driver)
+from metrics import instrument
+from result_set import ResultSet
+from tracing import span, traced
+
+# Worker threads shared by every thread-offloaded handler
+OFFLOAD_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_offload_executor() -> ThreadPoolExecutor:
+    """Return the shared thread pool used for blocking driver calls."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=OFFLOAD_WORKERS,
+                                           thread_name_prefix='db-offload')
+        return _executor
+
+class AsyncDatabaseHandler:
+    """
+    Async handler running a synchronous DatabaseHandler in the shared thread pool.
+
+    Calls on one handler are serialized with an asyncio lock because DB-API
+    connections are not safe for concurrent use; run several handlers (one per
+    connection) to execute queries concurrently.
+    """
+
+    def __init__(self, handler: DatabaseHandler):
+        self.handler = handler
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Created lazily so the lock binds to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        async with self._get_lock():
+            return await loop.run_in_executor(get_offload_executor(),
+                                              functools.partial(func, *args, **kwargs))
+
+    async def connect(self) -> None:
+        if isinstance(self.handler, SQLiteHandler):
+            # The connection is used from whichever pool thread picks up the call
+            self.handler.check_same_thread = False
+        await self._run(self.handler.connect)
+
+    async def get_tables(self) -> List[str]:
+        return await self._run(self.handler.get_tables)
+
+    async def execute_query(self, query: str, params: tuple = None) -> ResultSet:
+        return await self._run(self.handler.execute_query, query, params)
+
+    async def iter_batches(self, query: str, params: tuple = None,
+                           batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE
+                           ) -> AsyncIterator[ResultSet]:
+        """Stream a query result in batches; each batch is fetched in the thread pool."""
+        async for batch in self._iterate(self.handler.iter_batches, query, params, batch_size):
+            yield batch
+
+    async def iter_table(self, table_name: str,
+                         batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE
+                         ) -> AsyncIterator[ResultSet]:
+        """Stream every row of a table in batches."""
+        async for batch in self._iterate(self.handler.iter_table, table_name, batch_size):
+            yield batch
+
+    async def _iterate(self, factory, *args):
+        loop = asyncio.get_running_loop()
+        executor = get_offload_executor()
+        # Hold the lock for the whole stream: unbuffered cursors (MySQL) cannot
+        # interleave other statements on the same connection
+        async with self._get_lock():
+            iterator = await loop.run_in_executor(executor, lambda: iter(factory(*args)))
+            try:
+                while True:
+                    batch = await loop.run_in_executor(executor, next, iterator, None)
+                    if batch is None:
+                        break
+                    yield batch
+            finally:
+                close = getattr(iterator, 'close', None)
+                if close is not None:
+                    await loop.run_in_executor(executor, close)
+
+    async def export_to_csv(self, table_name: str, output_path: str,
+                            compression: str = 'auto') -> int:
+        return await self._run(self.handler.export_to_csv, table_name, output_path, compression)
+
+    async def close(self) -> None:
+        await self._run(self.handler.close)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+class NativeAsyncHandler(AsyncDatabaseHandler):
+    """Base for handlers backed by an async driver; blocking file writes still use the pool."""
+
+    async def export_to_csv(self, table_name: str, output_path: str,
+                            compression: str = 'auto') -> int:
+        loop = asyncio.get_running_loop()
+        executor = get_offload_executor()
+        count = 0
+        csvfile = await loop.run_in_executor(executor, open_export_file, output_path, compression)
+        try:
+            headers = None
+            async for batch in self.iter_table(table_name):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                if headers is None:
+                    headers = list(batch.columns)
+                    writer.writerow(headers)
+                writer.writerows(batch.rows)
+                with span('write', rows=len(batch)):
+                    await loop.run_in_executor(executor, csvfile.write, buffer.getvalue())
+                count += len(batch)
+        finally:
+            # Closing a compressed file waits for its last blocks
+            await loop.run_in_executor(executor, csvfile.close)
+        return count
+
+def _to_dollar_params(query: str) -> str:
+    """Convert DB-API %s placeholders to asyncpg's $1, $2, ..."""
+    parts = query.split('%s')
+    return parts[0] + ''.join(f'${i}{part}' for i, part in enumerate(parts[1:], start=1))
+
+def _records_to_result_set(records) -> ResultSet:
+    """Convert asyncpg Records, which carry their column names, to a ResultSet."""
+    return ResultSet(records[0].keys() if records else (), [tuple(record) for record in records])
+
+class AsyncPostgreSQLHandler(NativeAsyncHandler):
+    """PostgreSQL over asyncpg"""
+
+    def __init__(self, handler: PostgreSQLHandler):
+        super().__init__(handler)
+        self.connection_params = handler.connection_params
+        self.conn = None
+
+    @traced('connect')
+    @instrument('connect')
+    async def connect(self) -> None:
+        asyncpg = load_driver('asyncpg')
+        params = self.connection_params
+        self.conn = await asyncpg.connect(
+            host=params.get('host', 'localhost'),
+            user=params.get('user', ''),
+            password=params.get('password', ''),
+            database=params.get('database', ''),
+            port=params.get('port', 5432),
+            # asyncpg prepares every query and keeps an LRU of the statements itself
+            statement_cache_size=self.handler.statement_cache_size
+        )
+
+    @traced('get_tables')
+    @instrument('get_tables')
+    async def get_tables(self) -> List[str]:
+        async with self._get_lock():
+            rows = await self.conn.fetch(
+                "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'"
+            )
+        return [row[0] for row in rows]
+
+    @traced('execute_query')
+    @instrument('execute_query')
+    async def execute_query(self, query: str, params: tuple = None) -> ResultSet:
+        async with self._get_lock():
+            rows = await self.conn.fetch(_to_dollar_params(query), *(params or ()))
+        return _records_to_result_set(rows)
+
+    async def iter_batches(self, query: str, params: tuple = None,
+                           batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE
+                           ) -> AsyncIterator[ResultSet]:
+        # asyncpg cursors are server-side and must run inside a transaction
+        async with self._get_lock():
+            async with self.conn.transaction():
+                cursor = await self.conn.cursor(_to_dollar_params(query), *(params or ()))
+                while True:
+                    rows = await cursor.fetch(batch_size)
+                    if not rows:
+                        break
+                    yield _records_to_result_set(rows)
+
+    async def iter_table(self, table_name: str,
+                         batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE
+                         ) -> AsyncIterator[ResultSet]:
+        query = f'SELECT * FROM {self.handler.quote_identifier(table_name)}'
+        async for batch in self.iter_batches(query, batch_size=batch_size):
+            yield batch
+
+    @traced('export_to_csv')
+    @instrument('export_to_csv')
+    async def export_to_csv(self, table_name: str, output_path: str,
+                            compression: str = 'auto') -> int:
+        # COPY streams CSV straight from the server; its chunks are written (and compressed) in the pool
+        loop = asyncio.get_running_loop()
+        executor = get_offload_executor()
+        query = f'SELECT * FROM {self.handler.quote_identifier(table_name)}'
+        output = await loop.run_in_executor(
+            executor, functools.partial(open_export_file, output_path, compression, binary=True))
+
+        async def write(data: bytes) -> None:
+            await loop.run_in_executor(executor, output.write, data)
+
+        try:
+            async with self._get_lock():
+                status = await self.conn.copy_from_query(query, output=write,
+                                                         format='csv', header=True)
+        finally:
+            await loop.run_in_executor(executor, output.close)
+        return int(status.split()[-1]) if status else 0
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+class AsyncMySQLHandler(NativeAsyncHandler):
+    """MySQL over aiomysql"""
+
+    def __init__(self, handler: MySQLHandler):
+        super().__init__(handler)
+        self.connection_params = handler.connection_params
+        self.conn = None
+
+    @traced('connect')
+    @instrument('connect')
+    async def connect(self) -> None:
+        self.handler._validate_connection_params()
+        aiomysql = load_driver('aiomysql')
+        params = self.connection_params
+        self.conn = await aiomysql.connect(
+            host=params['host'],
+            user=params['user'],
+            password=params['password'],
+            db=params['database'],
+            port=params.get('port', 3306)
+        )
+
+    @traced('get_tables')
+    @instrument('get_tables')
+    async def get_tables(self) -> List[str]:
+        async with self._get_lock():
+            async with self.conn.cursor() as cursor:
+                await cursor.execute("SHOW TABLES")
+                return [row[0] for row in await cursor.fetchall()]
+
+    @traced('execute_query')
+    @instrument('execute_query')
+    async def execute_query(self, query: str, params: tuple = None) -> ResultSet:
+        async with self._get_lock():
+            async with self.conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                return ResultSet.from_cursor(cursor, await cursor.fetchall())
+
+    async def iter_batches(self, query: str, params: tuple = None,
+                           batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE
+                           ) -> AsyncIterator[ResultSet]:
+        aiomysql = load_driver('aiomysql')
+        async with self._get_lock():
+            # Unbuffered cursor: rows are read from the server as they are fetched
+            async with self.conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield ResultSet.from_cursor(cursor, rows)
+
+    async def iter_table(self, table_name: str,
+                         batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE
+                         ) -> AsyncIterator[ResultSet]:
+        query = f'SELECT * FROM {self.handler.quote_identifier(table_name)}'
+        async for batch in self.iter_batches(query, batch_size=batch_size):
+            yield batch
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+# Sync handler class -> (async driver module, native async handler class)
+NATIVE_ASYNC_HANDLERS = {
+    PostgreSQLHandler: ('asyncpg', AsyncPostgreSQLHandler),
+    MySQLHandler: ('aiomysql', AsyncMySQLHandler),
+}
+
+def get_async_database_handler(db_path: str = None, connection_params: Dict[str, Any] = None,
+                               prefer_native: bool = True) -> AsyncDatabaseHandler:
+    """
+    Factory method returning the async counterpart of get_database_handler().
+
+    :param db_path: Path to the database file
+    :param connection_params: Dictionary of connection parameters
+    :param prefer_native: Use asyncpg/aiomysql when installed instead of the thread pool
+    :return: AsyncDatabaseHandler instance
+    """
+    handler = get_database_handler(db_path=db_path, connection_params=connection_params)
+    native = NATIVE_ASYNC_HANDLERS.get(type(handler))
+    if prefer_native and native and importlib.util.find_spec(native[0]) is not None:
+        return native[1](handler)
+    return AsyncDatabaseHandler(handler)
@@ -0,0 +1,146 @@
+"""
+Memory and speed of ResultSet rows compared with a dictionary per row.
+
+Builds a SQLite table of ``--rows`` rows, then reads it back both ways: the
+dictionary per row that handlers used to return (``dict(sqlite3.Row)``) and
+the ResultSet returned by SQLiteHandler.execute_query(). For each it reports
+the memory the result holds and the peak while fetching it (measured with
+tracemalloc), the time to fetch it, the time to read every value by column
+name and the time to write it as CSV. Fails when the reduction of the held
+memory is below ``--min-reduction``.
+
+The saving is the per-row container: the values themselves cost the same
+either way, so narrow rows of small values gain the most. Reading by name
+through a row view is slower than a dictionary lookup; code handling whole
+batches (export, bulk insert, the grid) reads the tuples directly.
+
+Usage:
+    python benchmarks/result_set_benchmark.py [--rows 1000000] [--min-reduction 1.4]
+"""
+
+import argparse
+import csv
+import gc
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from database_handlers import SQLiteHandler  # noqa: E402
+from result_set import ResultSet  # noqa: E402
+
+# Default required ratio of dictionary memory to ResultSet memory
+DEFAULT_MIN_REDUCTION = 1.4
+
+COLUMNS = ('id', 'name', 'department', 'salary', 'hired', 'active')
+QUERY = 'SELECT * FROM employees'
+
+
+def create_table(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, department TEXT, '
+                 'salary REAL, hired TEXT, active INTEGER)')
+    conn.executemany('INSERT INTO employees VALUES (?, ?, ?, ?, ?, ?)',
+                     ((i, f'Employee {i}', ('HR', 'Finance', 'IT')[i % 3], 30000.0 + i % 5000,
+                       f'20{10 + i % 15}-0{1 + i % 9}-1{i % 10}', i % 2) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def fetch_dicts(path: str) -> List[Dict[str, Any]]:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(QUERY).fetchall()]
+    finally:
+        conn.close()
+
+
+def fetch_result_set(path: str) -> ResultSet:
+    handler = SQLiteHandler(path)
+    handler.connect()
+    try:
+        return handler.execute_query(QUERY)
+    finally:
+        handler.close()
+
+
+def read_by_name(rows) -> None:
+    for row in rows:
+        for column in COLUMNS:
+            row[column]
+
+
+def write_csv(rows) -> None:
+    writer = csv.writer(io.StringIO())
+    if isinstance(rows, ResultSet):
+        writer.writerows(rows.rows)
+    else:
+        writer.writerows([[row.get(column) for column in COLUMNS] for row in rows])
+
+
+def measure_memory(fetch: Callable[[str], Any], path: str) -> Tuple[int, int]:
+    """Return (bytes held by the fetched result, peak bytes allocated while fetching it)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = fetch(path)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current - baseline, peak - baseline
+
+
+def timed(func: Callable, *args) -> Tuple[float, Any]:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare ResultSet rows with a dictionary per row')
+    parser.add_argument('--rows', type=int, default=1000000, help='rows in the benchmark table')
+    parser.add_argument('--min-reduction', type=float, default=DEFAULT_MIN_REDUCTION,
+                        help='fail if dictionaries use less than this many times the ResultSet memory')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.db')
+        create_table(path, args.rows)
+
+        results = {}
+        for label, fetch in (('dict per row', fetch_dicts), ('ResultSet', fetch_result_set)):
+            memory, peak = measure_memory(fetch, path)
+            fetch_seconds, rows = timed(fetch, path)
+            read_seconds, _ = timed(read_by_name, rows)
+            csv_seconds, _ = timed(write_csv, rows)
+            del rows
+            results[label] = (memory, peak, fetch_seconds, read_seconds, csv_seconds)
+
+    megabyte = 1024 * 1024
+    print(f'{args.rows:,} rows x {len(COLUMNS)} columns')
+    print(f'  {"":<14}{"held":>11}{"peak":>11}{"fetch":>9}{"read":>9}{"csv":>9}')
+    for label, (memory, peak, fetch_seconds, read_seconds, csv_seconds) in results.items():
+        print(f'  {label:<14}{memory / megabyte:>8.1f} MB{peak / megabyte:>8.1f} MB'
+              f'{fetch_seconds:>8.2f}s{read_seconds:>8.2f}s{csv_seconds:>8.2f}s')
+
+    reduction = results['dict per row'][0] / max(results['ResultSet'][0], 1)
+    print(f'Memory reduction: {reduction:.2f}x')
+    if reduction < args.min_reduction:
+        print(f'FAIL: expected at least {args.min_reduction:.2f}x')
+        return 1
+    print(f'OK: at least {args.min_reduction:.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
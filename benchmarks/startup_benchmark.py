@@ -0,0 +1,99 @@
+"""
+Cold-start import benchmark for Database Browser.
+
+Runs ``python -X importtime -c "import main"`` in a fresh interpreter, reports
+the slowest imports and fails when the total import time exceeds the budget or
+when a module that should be loaded lazily (database drivers, sample
+generators, help) is imported at startup.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--budget-ms 250] [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Default cold-start budget for importing the application entry point
+DEFAULT_BUDGET_MS = 250.0
+
+# Modules that must not be imported before a database of that type is opened
+LAZY_MODULES = (
+    'sqlite3', 'pyodbc', 'MySQLdb', 'psycopg2', 'dbf', 'mvo_db', 'mysql.connector',
+    'create_sample_access', 'create_sample_dbase', 'create_sample_mvo',
+    'create_sample_mysql', 'create_sample_sql', 'create_sample_sqlite',
+    'help', 'plugins.plugin_manager',
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_imports(target: str = 'main') -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """
+    Import ``target`` in a fresh interpreter with ``-X importtime``.
+
+    :return: (total cumulative milliseconds, {module: (self_us, cumulative_us)})
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing {target} failed:\n{result.stderr}')
+
+    modules: Dict[str, Tuple[int, int]] = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        indent = len(name) - len(name.lstrip())
+        name = name.strip()
+        modules[name] = (int(self_us), int(cumulative_us))
+        # Top-level imports are indented by a single space
+        if indent == 1:
+            total_us += int(cumulative_us)
+    return total_us / 1000.0, modules
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure Database Browser cold-start import time')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='fail if the median import time exceeds this many milliseconds')
+    parser.add_argument('--runs', type=int, default=5, help='number of fresh interpreters to time')
+    parser.add_argument('--top', type=int, default=15, help='number of slowest imports to list')
+    parser.add_argument('--target', default='main', help='module to import (default: main)')
+    args = parser.parse_args(argv)
+
+    totals = []
+    modules: Dict[str, Tuple[int, int]] = {}
+    for _ in range(args.runs):
+        total_ms, modules = measure_imports(args.target)
+        totals.append(total_ms)
+    median_ms = statistics.median(totals)
+
+    print(f'Import time for {args.target!r} over {args.runs} runs: '
+          f'median {median_ms:.1f} ms (min {min(totals):.1f}, max {max(totals):.1f})')
+    print('Slowest imports (cumulative, last run):')
+    ranked = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in ranked[:args.top]:
+        print(f'  {cumulative_us / 1000.0:8.1f} ms  {self_us / 1000.0:8.1f} ms self  {name}')
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f'FAIL: modules imported eagerly at startup: {", ".join(eager)}')
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f'FAIL: median import time {median_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms')
+        failed = True
+    if not failed:
+        print(f'OK: within {args.budget_ms:.1f} ms budget and no eager driver imports')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
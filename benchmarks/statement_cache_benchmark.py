@@ -0,0 +1,119 @@
+"""
+Latency of repeated parameterized lookups with and without the statement cache.
+
+Creates a keyed table of ``--rows`` rows in the given database (a file with
+``--db``, or a server with ``--type/--host/--user/--database``), then looks
+up ``--lookups`` random keys twice: on a connection with
+``statement_cache_size = 0`` (the driver's plain, client-side interpolated
+execute) and on one with the cache enabled (PREPARE once, then EXECUTE).
+Reports the mean and median time per lookup and drops the table again.
+
+The saving is the server's parse and plan of each query, so it grows with
+query complexity and shrinks with network latency: on MySQL every cached
+lookup takes two round trips (SET of the parameters, EXECUTE) instead of
+one, which is why its cache is off unless statement_cache_size is set.
+
+Usage:
+    python benchmarks/statement_cache_benchmark.py --db bench.db [--rows 10000] [--lookups 5000]
+    python benchmarks/statement_cache_benchmark.py --type mysql --host db1 --user bench --database test
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from database_handlers import DatabaseHandler, get_database_handler  # noqa: E402
+
+TABLE = 'dbbrowser_statement_bench'
+# Statements the cache keeps while benchmarking (any size above one works for a single query)
+CACHE_SIZE = 100
+
+
+def open_handler(args: argparse.Namespace, cache_size: int) -> DatabaseHandler:
+    if args.db:
+        handler = get_database_handler(db_path=args.db)
+    else:
+        handler = get_database_handler(connection_params={
+            'type': args.type, 'host': args.host, 'user': args.user,
+            'password': args.password or os.environ.get('DBBROWSER_PASSWORD', ''),
+            'database': args.database,
+        })
+    if handler is None:
+        raise SystemExit('Unsupported database')
+    handler.statement_cache_size = cache_size
+    handler.connect()
+    return handler
+
+
+def create_table(handler: DatabaseHandler, rows: int) -> None:
+    handler.create_table(TABLE, [('id', 'integer'), ('name', 'varchar(40)'), ('amount', 'float')],
+                         if_exists='replace')
+    handler.commit()
+    handler.execute_batch([f'CREATE INDEX {TABLE}_id ON {handler.quote_identifier(TABLE)} '
+                           f'({handler.quote_identifier("id")})'])
+    handler.bulk_insert(TABLE, ['id', 'name', 'amount'],
+                        [(i, f'Customer {i}', i * 1.5) for i in range(rows)])
+    handler.commit()
+
+
+def time_lookups(handler: DatabaseHandler, keys: List[int]) -> List[float]:
+    placeholder = handler.PARAM_PLACEHOLDER
+    query = (f'SELECT {handler.quote_identifier("name")}, {handler.quote_identifier("amount")} '
+             f'FROM {handler.quote_identifier(TABLE)} WHERE {handler.quote_identifier("id")} = {placeholder}')
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        handler.execute_query(query, (key,))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare lookups with and without the statement cache')
+    parser.add_argument('--db', help='Database file')
+    parser.add_argument('--type', help='Server type (mysql, postgresql)')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='')
+    parser.add_argument('--password')
+    parser.add_argument('--database', default='')
+    parser.add_argument('--rows', type=int, default=10000, help='rows in the benchmark table')
+    parser.add_argument('--lookups', type=int, default=5000, help='lookups per run')
+    args = parser.parse_args(argv)
+    if not args.db and not args.type:
+        parser.error('one of --db or --type is required')
+
+    setup = open_handler(args, 0)
+    try:
+        create_table(setup, args.rows)
+        keys = [random.randrange(args.rows) for _ in range(args.lookups)]
+        results = {}
+        for label, cache_size in (('uncached', 0), ('cached', CACHE_SIZE)):
+            handler = open_handler(args, cache_size)
+            try:
+                # One warm-up lookup: connection setup and the first PREPARE are not timed
+                time_lookups(handler, keys[:1])
+                results[label] = time_lookups(handler, keys)
+            finally:
+                handler.close()
+    finally:
+        setup.drop_table(TABLE)
+        setup.close()
+
+    print(f'{type(setup).__name__}: {args.lookups:,} lookups in {args.rows:,} rows')
+    for label, timings in results.items():
+        print(f'  {label:<9}mean {statistics.mean(timings) * 1000:8.3f} ms'
+              f'   median {statistics.median(timings) * 1000:8.3f} ms')
+    ratio = statistics.mean(results['uncached']) / statistics.mean(results['cached'])
+    print(f'Cached lookups are {ratio:.2f}x the speed of uncached ones')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
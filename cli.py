@@ -0,0 +1,401 @@
+"""
+Command-line batch mode: queries, exports and copies without the GUI.
+
+Runs on headless servers and from cron: nothing here imports tkinter, and
+rows are streamed to files (optionally compressed) or to stdout batch by
+batch. Throughput of each job is printed to stderr when it finishes.
+
+Databases are opened with get_database_handler(): a file path (--db), or
+--type/--host/--user/--database for network servers, with the password taken
+from --password or the DBBROWSER_PASSWORD environment variable.
+
+Usage:
+    python cli.py --db sales.db tables
+    python cli.py --db sales.db query "SELECT * FROM orders WHERE status = ?" -p open --format ndjson
+    python cli.py --db sales.db export orders customers -o 'exports/{table}.csv.gz' --workers 2
+    python cli.py --type postgresql --host db1 --user etl --database shop \\
+        export orders -o orders.ndjson.zst --incremental --watermark updated_at
+    python cli.py --db legacy.dbf copy customers --to warehouse.db --if-exists replace
+    python cli.py --db legacy.dbf diff customers --with warehouse.db --key id
+
+Exit status is 0 when every job succeeded, 1 when any failed or a diff found
+differences, and 2 for usage errors.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from database_handlers import DatabaseHandler, get_database_handler, write_csv
+
+DEFAULT_BATCH_SIZE = DatabaseHandler.DEFAULT_BATCH_SIZE
+# Environment variable holding the password of a network database
+PASSWORD_ENV = 'DBBROWSER_PASSWORD'
+# Output formats and their file suffixes
+FORMATS = {'csv': '.csv', 'ndjson': '.ndjson', 'json': '.json'}
+
+logger = logging.getLogger('CLI')
+
+class JobStats:
+    """Rows, bytes and time of one query, export or copy"""
+
+    def __init__(self, name: str, output: str = None):
+        self.name = name
+        self.output = output
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+        # Rows missing, extra or changed, for diff jobs
+        self.differences = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        if self.error:
+            return f'{self.name}: failed after {self.seconds:.2f}s: {self.error}'
+        text = f'{self.name}: {self.rows:,} rows in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s'
+        if self.bytes and self.seconds:
+            text += f', {self.bytes / self.seconds / 1e6:.1f} MB/s'
+        if self.differences:
+            text += f', {self.differences:,} rows differ'
+        return text + ')' + (f' -> {self.output}' if self.output else '')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'output': self.output,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'error': self.error,
+            'differences': self.differences,
+        }
+
+def add_connection_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the --db / --type, --host, --user, --password and --database options."""
+    connection = parser.add_argument_group('connection')
+    connection.add_argument('--db', help='Database file (.db, .dbf, .db3, .mdb, .accdb, .mvo)')
+    connection.add_argument('--type', help='Network database type (mysql, postgresql)')
+    connection.add_argument('--host', default='localhost')
+    connection.add_argument('--user', default='')
+    connection.add_argument('--password', help=f'Password (default: ${PASSWORD_ENV})')
+    connection.add_argument('--database', default='')
+
+def create_handler(args: argparse.Namespace) -> DatabaseHandler:
+    """Create the (unconnected) handler named by the connection options."""
+    if args.db:
+        return get_database_handler(db_path=args.db)
+    params = {'type': args.type, 'host': args.host, 'user': args.user, 'database': args.database,
+              'password': args.password if args.password is not None else os.environ.get(PASSWORD_ENV, '')}
+    return get_database_handler(connection_params=params)
+
+def open_handler(args: argparse.Namespace) -> DatabaseHandler:
+    """Create and connect the handler named by the connection options."""
+    handler = create_handler(args)
+    handler.connect()
+    return handler
+
+def output_format(args: argparse.Namespace, output: str) -> str:
+    """Return the --format option, or the format implied by the output file's suffix."""
+    if args.format:
+        return args.format
+    if output == '-':
+        return 'csv'
+    from incremental_export import export_format
+    return export_format(output)
+
+def write_stdout(batches: Iterable[List[Dict[str, Any]]], fmt: str, stats: JobStats) -> int:
+    """Stream row batches to stdout as CSV or JSON, flushing after every batch."""
+    from serializer import encode_batches
+    count = 0
+
+    def counted():
+        nonlocal count
+        for batch in batches:
+            count += len(batch)
+            yield batch
+    out = sys.stdout.buffer
+    for chunk in encode_batches(counted(), fmt):
+        out.write(chunk)
+        out.flush()
+        stats.bytes += len(chunk)
+    return count
+
+def write_rows(batches: Iterable[List[Dict[str, Any]]], output: str, fmt: str, compression: str,
+               stats: JobStats, empty_header: Callable[[], List[str]] = None) -> int:
+    """Write row batches to a file or, for '-', to stdout."""
+    if output == '-':
+        if compression not in ('auto', None):
+            raise ValueError("Compressed output needs an output file")
+        return write_stdout(batches, fmt, stats)
+    if fmt == 'csv':
+        rows = write_csv(batches, output, compression, empty_header=empty_header)
+    else:
+        from serializer import write_json
+        rows = write_json(batches, output, fmt, compression)
+    stats.bytes = os.path.getsize(output)
+    return rows
+
+def run_job(stats: JobStats, job: Callable[[JobStats], None]) -> JobStats:
+    start = time.perf_counter()
+    try:
+        job(stats)
+    except BrokenPipeError:
+        raise
+    except Exception as e:
+        logger.error(f"{stats.name} failed: {e}")
+        stats.error = str(e)
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+def command_tables(args: argparse.Namespace) -> List[JobStats]:
+    handler = open_handler(args)
+    try:
+        for table in handler.get_tables():
+            print(table)
+    finally:
+        handler.close()
+    return []
+
+def command_query(args: argparse.Namespace) -> List[JobStats]:
+    query = sys.stdin.read() if args.sql == '-' else args.sql
+    output = args.output or '-'
+    stats = JobStats('query', None if output == '-' else output)
+
+    def job(stats: JobStats) -> None:
+        handler = open_handler(args)
+        try:
+            batches = handler.iter_batches(query, tuple(args.param) or None, batch_size=args.batch_size)
+            stats.rows = write_rows(batches, output, output_format(args, output), args.compression, stats)
+        finally:
+            handler.close()
+    return [run_job(stats, job)]
+
+def export_path(args: argparse.Namespace, table: str) -> str:
+    """Return the output file of one table: the --output template, or <table><format suffix>."""
+    if args.output is None:
+        return table + FORMATS[args.format or 'csv']
+    if args.output == '-':
+        return '-'
+    if '{table}' in args.output:
+        return args.output.format(table=table)
+    if os.path.isdir(args.output):
+        return os.path.join(args.output, table + FORMATS[args.format or 'csv'])
+    return args.output
+
+def export_table(args: argparse.Namespace, table: str, stats: JobStats) -> None:
+    """Export one table on its own connection, so tables can be exported in parallel."""
+    output = stats.output or '-'
+    # Incremental runs append to the file; only the bytes of this run count
+    existing = os.path.getsize(output) if args.incremental and os.path.exists(output) else 0
+    handler = open_handler(args)
+    try:
+        if args.incremental:
+            from incremental_export import export_incremental
+            result = export_incremental(handler, table, output, watermark_column=args.watermark,
+                                        mode='rotate' if args.rotate else 'append',
+                                        compression=args.compression, batch_size=args.batch_size,
+                                        full=args.full)
+        elif args.resumable:
+            from resumable_export import export_resumable
+            result = export_resumable(handler, table, output, compression=args.compression,
+                                      batch_size=args.batch_size)
+        else:
+            batches = handler.iter_table(table, args.batch_size)
+            stats.rows = write_rows(batches, output, output_format(args, output), args.compression, stats,
+                                    empty_header=lambda: handler.get_columns(table))
+            return
+        stats.rows = result['rows']
+        # Rotated runs write a new file; a run without new rows writes none
+        stats.output = result['output_path']
+        if stats.output and os.path.exists(stats.output):
+            stats.bytes = os.path.getsize(stats.output) - (existing if stats.output == output else 0)
+    finally:
+        handler.close()
+
+def command_export(args: argparse.Namespace) -> List[JobStats]:
+    tables = args.tables
+    if args.all:
+        handler = open_handler(args)
+        try:
+            tables = handler.get_tables()
+        finally:
+            handler.close()
+    if not tables:
+        raise ValueError("The database has no tables to export")
+    outputs = [export_path(args, table) for table in tables]
+    jobs = [JobStats(table, None if output == '-' else output) for table, output in zip(tables, outputs)]
+    with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(jobs)))) as executor:
+        futures = [executor.submit(run_job, stats, lambda stats, table=table: export_table(args, table, stats))
+                   for stats, table in zip(jobs, tables)]
+        return [future.result() for future in futures]
+
+def command_copy(args: argparse.Namespace) -> List[JobStats]:
+    from table_copy import copy_table
+    jobs = []
+    for table in args.tables:
+        stats = JobStats(table, f'{args.to}:{args.to_table or table}')
+
+        def job(stats: JobStats, table=table) -> None:
+            source = open_handler(args)
+            destination = get_database_handler(db_path=args.to)
+            destination.connect()
+            try:
+                result = copy_table(source, table, destination, args.to_table, if_exists=args.if_exists,
+                                    batch_size=args.batch_size)
+                stats.rows = result.rows
+            finally:
+                destination.close()
+                source.close()
+        jobs.append(run_job(stats, job))
+    return jobs
+
+def command_diff(args: argparse.Namespace) -> List[JobStats]:
+    import json
+    from table_diff import diff_tables
+    key = args.key.split(',') if args.key else None
+    jobs = []
+    for table in args.tables:
+        stats = JobStats(table, f'{args.other}:{args.with_table or table}')
+
+        def job(stats: JobStats, table=table) -> None:
+            source = open_handler(args)
+            target = get_database_handler(db_path=args.other)
+            target.connect()
+            try:
+                result = diff_tables(source, table, target, args.with_table, key=key, leaf_rows=args.leaf_rows)
+            finally:
+                target.close()
+                source.close()
+            stats.rows = result.source_rows
+            stats.differences = len(result.missing) + len(result.extra) + len(result.changed)
+            # One JSON line per difference on stdout
+            lines = ([{'table': table, 'difference': 'missing', 'key': list(k)} for k in result.missing]
+                     + [{'table': table, 'difference': 'extra', 'key': list(k)} for k in result.extra]
+                     + [{'table': table, 'difference': 'changed', 'key': list(k), 'columns': columns}
+                        for k, columns in result.changed])
+            for line in lines:
+                print(json.dumps(line, default=str))
+        jobs.append(run_job(stats, job))
+    return jobs
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='cli.py', description='Run Database Browser queries, exports and copies without the GUI.')
+    add_connection_arguments(parser)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows fetched per batch')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print throughput statistics')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log progress to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('tables', help='List the tables')
+
+    def add_output_options(command, default_help):
+        command.add_argument('-o', '--output', help=default_help)
+        command.add_argument('--format', choices=sorted(FORMATS), help='Output format (default: from the file suffix, else csv)')
+        command.add_argument('--compression', choices=('auto', 'none', 'gzip', 'zstd'), default='auto',
+                             help='Output compression (default: from the .gz/.zst suffix)')
+
+    query = commands.add_parser('query', help='Run a query and write its rows')
+    query.add_argument('sql', help="SQL query, or '-' to read it from stdin")
+    query.add_argument('-p', '--param', action='append', default=[], help='Query parameter (repeatable)')
+    add_output_options(query, "Output file, or '-' for stdout (default)")
+
+    export = commands.add_parser('export', help='Export tables to files')
+    export.add_argument('tables', nargs='*', help='Tables to export')
+    export.add_argument('--all', action='store_true', help='Export every table')
+    add_output_options(export, "Output file, directory, '{table}' template, or '-' for stdout "
+                               "(default: <table>.csv in the current directory)")
+    export.add_argument('-w', '--workers', type=int, default=1, help='Tables exported in parallel')
+    modes = export.add_mutually_exclusive_group()
+    modes.add_argument('--incremental', action='store_true', help='Export only rows added since the last run')
+    modes.add_argument('--resumable', action='store_true', help='Checkpoint the export and resume an interrupted one')
+    export.add_argument('--watermark', help='Watermark column of incremental exports')
+    export.add_argument('--rotate', action='store_true', help='Write each incremental run to a new timestamped file')
+    export.add_argument('--full', action='store_true', help='Ignore the stored watermark of incremental exports')
+
+    copy = commands.add_parser('copy', help='Copy tables into a database file')
+    copy.add_argument('tables', nargs='+', help='Tables to copy')
+    copy.add_argument('--to', required=True, help='Destination database file')
+    copy.add_argument('--to-table', help='Destination table name (single table only)')
+    copy.add_argument('--if-exists', choices=('fail', 'replace', 'append'), default='fail')
+
+    diff = commands.add_parser('diff', help='Compare tables with their copies in a database file')
+    diff.add_argument('tables', nargs='+', help='Tables to compare')
+    diff.add_argument('--with', dest='other', required=True, help='Database file holding the copies')
+    diff.add_argument('--with-table', help='Name of the copy (single table only)')
+    diff.add_argument('--key', help='Comma-separated key columns (default: the primary key)')
+    diff.add_argument('--leaf-rows', type=int, default=1000,
+                      help='Compare ranges of at most this many rows row by row (default: 1000)')
+    return parser
+
+COMMANDS = {'tables': command_tables, 'query': command_query, 'export': command_export, 'copy': command_copy,
+            'diff': command_diff}
+
+def check_export_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Reject export options that cannot work together (exit status 2) before connecting."""
+    if not args.tables and not args.all:
+        parser.error('name the tables to export or pass --all')
+    if args.all:
+        # The table names are only known once connected; every table needs its own file
+        if args.output is not None and '{table}' not in args.output and not os.path.isdir(args.output):
+            parser.error("--all needs an output directory or a '{table}' template in --output")
+    elif len(args.tables) > 1:
+        outputs = [export_path(args, table) for table in args.tables]
+        if len(set(outputs)) < len(outputs):
+            parser.error("several tables need an output directory or a '{table}' template in --output")
+    if args.incremental or args.resumable:
+        if args.output == '-':
+            parser.error('incremental and resumable exports need an output file')
+        if args.format:
+            parser.error('incremental and resumable exports take their format from the output file suffix')
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.db and not args.type:
+        parser.error('one of --db or --type is required')
+    if args.command == 'copy' and args.to_table and len(args.tables) > 1:
+        parser.error('--to-table needs a single table')
+    if args.command == 'diff' and args.with_table and len(args.tables) > 1:
+        parser.error('--with-table needs a single table')
+    if args.command == 'export':
+        check_export_args(parser, args)
+    if getattr(args, 'compression', None) == 'none':
+        args.compression = None
+    console = logging.StreamHandler(sys.stderr)
+    console.setLevel(logging.INFO if args.verbose else logging.WARNING)
+    console.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    logging.getLogger().addHandler(console)
+
+    start = time.perf_counter()
+    try:
+        jobs = COMMANDS[args.command](args)
+    except BrokenPipeError:
+        # The reader of stdout went away (e.g. piped into head); nothing left to do
+        sys.stderr.close()
+        return 0
+    except Exception as e:
+        logger.error(str(e))
+        return 1
+    if jobs and not args.quiet:
+        for stats in jobs:
+            print(stats.summary(), file=sys.stderr)
+        if len(jobs) > 1:
+            total = JobStats('total')
+            total.rows = sum(stats.rows for stats in jobs)
+            total.bytes = sum(stats.bytes for stats in jobs)
+            total.seconds = time.perf_counter() - start
+            print(total.summary(), file=sys.stderr)
+    return 1 if any(stats.error or stats.differences for stats in jobs) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Parallel block compression for exports.
+
+Output is cut into independent blocks that worker threads compress
+concurrently (zlib and zstd release the GIL), pigz-style, while the caller
+keeps streaming rows. Each block becomes a complete gzip member or zstd
+frame; concatenated members/frames are valid files that ``gzip -d``,
+``zstd -d`` and Python's gzip module read as one stream.
+
+Example:
+    with open_export_file('orders.csv.gz') as f:
+        csv.writer(f).writerows(rows)
+"""
+
+import gzip
+import importlib
+import io
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from tracing import span
+
+# Uncompressed bytes per independently compressed block
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+
+# File suffix -> compression name
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+
+def compression_from_path(path: str) -> Optional[str]:
+    """Return the compression implied by a file name's suffix, or None."""
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+def _block_compressor(compression: str, level: int) -> Callable[[bytes], bytes]:
+    if compression == 'gzip':
+        return lambda block: gzip.compress(block, compresslevel=level, mtime=0)
+    if compression == 'zstd':
+        try:
+            zstandard = importlib.import_module('zstandard')
+        except ImportError as e:
+            raise ValueError(f"zstd compression requires the 'zstandard' package: {e}")
+        local = threading.local()
+
+        def compress(block: bytes) -> bytes:
+            # ZstdCompressor objects are not thread-safe; keep one per worker
+            compressor = getattr(local, 'compressor', None)
+            if compressor is None:
+                compressor = local.compressor = zstandard.ZstdCompressor(level=level)
+            return compressor.compress(block)
+        return compress
+    raise ValueError(f"Unsupported compression: {compression}")
+
+class ParallelCompressedWriter(io.RawIOBase):
+    """Binary file writer compressing fixed-size blocks in a thread pool"""
+
+    def __init__(self, path: str, compression: str = 'gzip', level: int = None,
+                 workers: int = DEFAULT_WORKERS, block_size: int = DEFAULT_BLOCK_SIZE,
+                 append: bool = False):
+        """
+        :param path: Output file
+        :param compression: 'gzip' or 'zstd'
+        :param level: Compression level (gzip 6, zstd 3 by default)
+        :param workers: Compression threads
+        :param block_size: Uncompressed bytes per block
+        :param append: Add blocks to the end of an existing file (it stays one valid stream)
+        """
+        super().__init__()
+        self.compression = compression
+        self._compress = _block_compressor(compression, level or DEFAULT_LEVELS[compression])
+        self.block_size = block_size
+        self.workers = workers
+        self._file = open(path, 'ab' if append else 'wb')
+        self._buffer = bytearray()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='compress')
+        # Futures in submission order; bounded so memory stays at a few blocks per worker
+        self._pending = deque()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block: bytes) -> None:
+        self.bytes_in += len(block)
+        self._pending.append(self._executor.submit(self._compress, block))
+        while len(self._pending) > 2 * self.workers:
+            self._write_next()
+
+    def _write_next(self) -> None:
+        compressed = self._pending.popleft().result()
+        with span('write', bytes=len(compressed)):
+            self._file.write(compressed)
+        self.bytes_out += len(compressed)
+
+    def sync(self) -> None:
+        """
+        Compress and write everything received so far to disk, ending the current block early.
+
+        Afterwards the file ends on a member/frame boundary, so it can be
+        truncated to its current size and appended to later.
+        """
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._write_next()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._write_next()
+        finally:
+            self._executor.shutdown(wait=True)
+            self._file.close()
+            super().close()
+
+def open_export_file(path: str, compression: str = None, level: int = None,
+                     workers: int = DEFAULT_WORKERS, block_size: int = DEFAULT_BLOCK_SIZE,
+                     binary: bool = False, append: bool = False):
+    """
+    Open a file for an export, compressed in parallel when requested.
+
+    :param path: Output file
+    :param compression: None, 'gzip' or 'zstd'; 'auto' picks it from the file suffix
+    :param level: Compression level
+    :param workers: Compression threads
+    :param block_size: Uncompressed bytes per block
+    :param binary: Return a binary file instead of a UTF-8 text file
+    :param append: Write to the end of an existing file instead of replacing it
+    :return: File object; text files have newline translation disabled (for csv.writer)
+    """
+    if compression == 'auto':
+        compression = compression_from_path(path)
+    if not compression or compression == 'none':
+        if binary:
+            return open(path, 'ab' if append else 'wb')
+        return open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+    raw = ParallelCompressedWriter(path, compression, level, workers, block_size, append)
+    # A write buffer in front of the block splitter avoids tiny writes per CSV row
+    buffered = io.BufferedWriter(raw, buffer_size=64 * 1024)
+    if binary:
+        return buffered
+    return io.TextIOWrapper(buffered, encoding='utf-8', newline='')
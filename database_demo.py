@@ -85,7 +85,7 @@ def demonstrate_database_handlers():
             # Display first few rows
             logger.info("First 3 rows:")
             for row in query_results[:3]:
-                logger.info(json.dumps(row, indent=2))
+                logger.info(json.dumps(dict(row), indent=2, default=str))
             
             # Export to CSV
             logger.info("💾 Step 4: Exporting Table to CSV")
@@ -181,7 +181,7 @@ def demo_database_handlers():
                 
                 # Execute query
                 query_results = handler.execute_query(f"SELECT * FROM {first_table}")
-                logger.info(f"First 3 rows: {query_results[:3]}")
+                logger.info(f"First 3 rows: {query_results[:3].to_dicts()}")
 
                 # Export to CSV
                 output_csv = f"{first_table}_export.csv"
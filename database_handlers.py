@@ -1,12 +1,21 @@
-import sqlite3
-import pyodbc
-import MySQLdb
-from mvo_db import MVOConnection, MVOError
-import json
+import contextlib
 import csv
+import functools
+import importlib
+import io
 import os
 import logging
-from typing import List, Dict, Any, Optional
+import operator
+import random
+import re
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple, Type
+from metrics import get_registry, instrument, table_from_query
+from result_set import ResultSet, as_result_set
+from statement_batch import DEFAULT_PAGE_SIZE, Statement, StatementResult, normalize_statements, pages, returns_rows
+from statement_cache import DEFAULT_CAPACITY, StatementCache, convert_placeholders, preparable
+from tracing import span, traced
 
 # Configure logging
 logging.basicConfig(
@@ -16,14 +25,186 @@ logging.basicConfig(
     filemode='a'
 )
 
+def load_driver(module_name: str):
+    """
+    Import a database driver module on first use.
+
+    Drivers are only imported when a database of that type is opened, so a
+    missing optional driver does not prevent the application from starting.
+
+    :param module_name: Importable module name, e.g. 'pyodbc'
+    :return: The imported module
+    """
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise ValueError(f"Database driver '{module_name}' is not installed: {e}")
+
+# Suffix of the table a replacing copy loads into on backends without transactional DDL
+LOAD_TABLE_SUFFIX = '_dbbrowser_load'
+
+# Filter operators understood by iter_table(); a filter is a (column, operator, value) tuple
+FILTER_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda value, options: value in options,
+}
+
+def filter_rows(rows: ResultSet, columns: Sequence[str] = None,
+                filters: Sequence[Tuple[str, str, Any]] = None) -> ResultSet:
+    """
+    Apply filters and a projection to rows in Python.
+
+    Used by handlers that cannot push them down to a query engine. As in SQL,
+    comparisons with NULL (None) never match.
+
+    :param rows: ResultSet, or row dictionaries
+    """
+    rows = as_result_set(rows)
+    if filters:
+        checks = [(column, FILTER_OPERATORS[op.lower()], value) for column, op, value in filters]
+        kept = ResultSet(rows.columns)
+        for row in rows:
+            for column, compare, value in checks:
+                if isinstance(column, tuple):
+                    # Row-value comparison, e.g. (('a', 'b'), '>', (1, 2)) for keyset seeks
+                    field = tuple(row.get(c) for c in column)
+                    if None in field:
+                        break
+                else:
+                    field = row.get(column)
+                try:
+                    if field is None or not compare(field, value):
+                        break
+                except TypeError:
+                    break
+            else:
+                kept.rows.append(row.values())
+        rows = kept
+    if columns:
+        rows = rows.project(columns)
+    return rows
+
+def write_csv(batches: Iterator[ResultSet], output_path: str, compression: str = 'auto',
+              append: bool = False, empty_header=None) -> int:
+    """
+    Stream row batches to a CSV file with a header row, optionally compressed.
+
+    :param batches: Iterable of row batches (ResultSets or row dictionaries), e.g. a handler's iter_table()
+    :param output_path: Output file
+    :param compression: None, 'gzip', 'zstd', or 'auto' to pick it from the suffix
+    :param append: Add the rows to the end of the file; the header is only written to a new file
+    :param empty_header: Callable returning the header written when there are no rows
+    :return: Number of rows written
+    """
+    from compression import open_export_file
+    write_header = not append or not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    count = 0
+    with open_export_file(output_path, compression, append=append) as csvfile:
+        writer = csv.writer(csvfile)
+        headers = None
+        for batch in batches:
+            if not batch:
+                continue
+            if headers is None:
+                headers = list(batch.columns) if isinstance(batch, ResultSet) else list(batch[0].keys())
+                if write_header:
+                    writer.writerow(headers)
+            with span('write', rows=len(batch)):
+                if isinstance(batch, ResultSet) and list(batch.columns) == headers:
+                    writer.writerows(batch.rows)
+                else:
+                    writer.writerows([[row.get(header) for header in headers] for row in batch])
+            count += len(batch)
+        if headers is None and write_header and empty_header is not None:
+            writer.writerow(empty_header())
+    return count
+
+def serve_from_cache(argument: str = 'table'):
+    """
+    Decorate a read method so it is answered from the local SQLite cache when enabled.
+
+    :param argument: 'table' if the first argument is a table name, 'query' if it is SQL
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if argument == 'query':
+                table_name = table_from_query(args[0] if args else kwargs.get('query'))
+            else:
+                table_name = args[0] if args else kwargs.get('table_name')
+            cache_handler = self._cached(table_name)
+            if cache_handler is not None:
+                return getattr(cache_handler, func.__name__)(*args, **kwargs)
+            return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+# Statements whose rows execute_query() streams under QueryLimits
+_ROW_QUERY = re.compile(r'\s*(select|with|values)\b', re.IGNORECASE)
+
+def enforce_limits(func):
+    """Decorate execute_query so queries returning rows respect ``self.limits`` (see limits.py)."""
+    @functools.wraps(func)
+    def wrapper(self, query: str = None, params: tuple = None):
+        if self.limits and query and _ROW_QUERY.match(query):
+            return self.execute_limited(query, params)
+        return func(self, query, params)
+    return wrapper
+
 class DatabaseHandler:
+    # Public methods timed and counted by the metrics registry
+    INSTRUMENTED_METHODS = ('connect', 'get_tables', 'execute_query', 'export_to_csv')
+    # Rows fetched per round trip when streaming results
+    DEFAULT_BATCH_SIZE = 1000
+    # Query parameter placeholder of the driver's paramstyle
+    PARAM_PLACEHOLDER = '?'
+    # Whether enable_cache() may copy tables into a local SQLite cache
+    CACHEABLE = False
+    # Whether execute_query() runs arbitrary SQL (aggregates, ORDER BY...)
+    SQL_QUERIES = True
+    # Kind of checksum computed by checksum_rows(); only equal kinds can be compared (see table_diff.py)
+    ROW_CHECKSUM = 'row_hash'
+    # Generic column type (see table_copy.generic_type) -> native type for CREATE TABLE;
+    # sized types map to a (with arguments, without arguments) pair. Empty: read-only backend
+    COLUMN_TYPES: Dict[str, Any] = {}
+    # Built-in row position usable as an incremental export watermark ('rowid', 'record_count')
+    ROW_WATERMARK: Optional[str] = None
+    # Whether SELECT accepts LIMIT/OFFSET, so read_page() reads only the requested rows
+    LIMIT_CLAUSE = False
+    # Statements kept prepared per connection by default (statement_cache_size); 0 leaves it off
+    STATEMENT_CACHE_SIZE = DEFAULT_CAPACITY
+    # Whether DROP/CREATE TABLE run inside a transaction and are rolled back with it; otherwise a
+    # replaced table is loaded under a temporary name and renamed once the load is committed
+    TRANSACTIONAL_DDL = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.INSTRUMENTED_METHODS:
+            if name in cls.__dict__:
+                setattr(cls, name, traced(name)(instrument(name)(cls.__dict__[name])))
+
     def __init__(self, db_path: str = None, connection_params: Dict[str, Any] = None):
         self.db_path = db_path
         self.connection_params = connection_params
         self.conn = None
         self.cursor = None
+        self.cache = None
+        self.cache_indexes: Dict[str, Sequence[str]] = {}
+        self._loading_cache = False
+        # QueryLimits applied to execute_query(); None runs queries unrestricted
+        self.limits = None
+        # Prepared statements kept per connection, set before connect(); 0 disables the cache
+        self.statement_cache_size = self.STATEMENT_CACHE_SIZE
+        self.statements: Optional[StatementCache] = None
         self.logger = logging.getLogger(self.__class__.__name__)
 
+    @traced('connect')
+    @instrument('connect')
     def connect(self):
         try:
             self._validate_connection_params()
@@ -44,48 +225,924 @@ class DatabaseHandler:
     def get_tables(self) -> List[str]:
         raise NotImplementedError("Subclasses must implement get_tables method")
 
-    def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+    def execute_query(self, query: str, params: tuple = None) -> ResultSet:
         raise NotImplementedError("Subclasses must implement execute_query method")
 
-    def export_to_csv(self, table_name: str, output_path: str):
-        raise NotImplementedError("Subclasses must implement export_to_csv method")
+    def get_columns(self, table_name: str) -> List[str]:
+        """Return the column names of a table without reading its rows."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f'SELECT * FROM {self.quote_identifier(table_name)} WHERE 1 = 0')
+            return [description[0] for description in cursor.description]
+        finally:
+            cursor.close()
+
+    @traced('export_to_csv')
+    @instrument('export_to_csv')
+    def export_to_csv(self, table_name: str, output_path: str, compression: str = 'auto',
+                      batch_size: int = DEFAULT_BATCH_SIZE, resumable: bool = False) -> int:
+        """
+        Stream a table to a CSV file, optionally compressed.
+
+        :param table_name: Table to export
+        :param output_path: Output file
+        :param compression: None, 'gzip', 'zstd', or 'auto' to pick it from the suffix (.csv.gz, .csv.zst)
+        :param batch_size: Rows fetched per batch
+        :param resumable: Checkpoint the export and resume an interrupted one (see resumable_export)
+        :return: Number of rows written
+        """
+        if resumable:
+            from resumable_export import export_resumable
+            return export_resumable(self, table_name, output_path, compression=compression,
+                                    batch_size=batch_size)['rows']
+        return write_csv(self.iter_table(table_name, batch_size), output_path, compression,
+                         empty_header=lambda: self.get_columns(table_name))
+
+    def quote_identifier(self, name: str) -> str:
+        """Quote a table or column name for use in SQL."""
+        return '"' + name.replace('"', '""') + '"'
+
+    def enable_cache(self, index_columns: Dict[str, Sequence[str]] = None,
+                     cache_dir: str = None) -> None:
+        """
+        Serve reads from a local SQLite copy of each table instead of the source.
+
+        A table is copied on first access and copied again whenever the source
+        file's modification time or size changes.
+
+        :param index_columns: Table name -> columns to index in the cached copy
+        :param cache_dir: Directory for cache files (see sqlite_cache.DEFAULT_CACHE_DIR)
+        """
+        if not self.CACHEABLE:
+            raise ValueError(f"{type(self).__name__} does not support the local cache")
+        from sqlite_cache import SQLiteCache
+        self.cache = SQLiteCache(self.db_path, cache_dir)
+        self.cache_indexes = dict(index_columns or {})
+
+    def _cached(self, table_name: Optional[str]) -> Optional['DatabaseHandler']:
+        """Return the cache's SQLite handler for a table, copying the table first if stale."""
+        # While the cache is being filled, reads must go to the source itself
+        if self.cache is None or not table_name or self._loading_cache:
+            return None
+        self._loading_cache = True
+        try:
+            if not self.cache.ensure(self, table_name, self.cache_indexes.get(table_name, ())):
+                return None
+        finally:
+            self._loading_cache = False
+        return self.cache.handler
+
+    @serve_from_cache('query')
+    def iter_batches(self, query: str, params: tuple = None,
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[ResultSet]:
+        """
+        Execute a query and yield the result in batches (ResultSets).
+
+        Uses a dedicated cursor (server-side where the driver supports it), so
+        large results are streamed instead of being fetched in one go.
+
+        :param query: SQL query to execute
+        :param params: Optional query parameters
+        :param batch_size: Maximum number of rows per batch
+        """
+        cursor = self._streaming_cursor()
+        busy = 0.0
+        total = 0
+        try:
+            start = time.perf_counter()
+            with span('execute', query=query):
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+            columns = None
+            while True:
+                with span('fetch_batch') as fetch_span:
+                    rows = cursor.fetchmany(batch_size)
+                    fetch_span.set(rows=len(rows))
+                if not rows:
+                    break
+                if columns is None:
+                    # Server-side cursors only describe the result after the first fetch
+                    columns = [description[0] for description in cursor.description]
+                with span('convert', rows=len(rows)):
+                    batch = ResultSet(columns, [tuple(row) for row in rows])
+                total += len(batch)
+                busy += time.perf_counter() - start
+                yield batch
+                start = time.perf_counter()
+            busy += time.perf_counter() - start
+        finally:
+            cursor.close()
+            get_registry().record(type(self).__name__, 'iter_batches', table_from_query(query),
+                                  busy, rows=total)
+
+    def execute_limited(self, query: str, params: tuple = None, limits=None) -> ResultSet:
+        """
+        Execute a query, stopping once a row, size or time limit is reached.
+
+        :param query: SQL query returning rows
+        :param params: Optional query parameters
+        :param limits: QueryLimits (self.limits by default)
+        :return: The rows, or a limits.PartialResult if a limit stopped the query
+        """
+        from limits import PartialResult
+        rows: Optional[ResultSet] = None
+        for batch in self.iter_limited(query, params, limits):
+            if rows is None:
+                rows = ResultSet(batch.columns)
+            rows.extend(batch)
+            if isinstance(batch, PartialResult):
+                return PartialResult(rows, batch.reason, batch.limits)
+        return rows if rows is not None else ResultSet(())
+
+    def iter_limited(self, query: str, params: tuple = None, limits=None,
+                     batch_size: int = None) -> Iterator[ResultSet]:
+        """
+        Stream a query's rows in batches, stopping once a row, size or time limit is reached.
+
+        The batch cut short by a limit is a limits.PartialResult recording which
+        limit stopped the query; it is the last batch.
+
+        :param query: SQL query returning rows
+        :param params: Optional query parameters
+        :param limits: QueryLimits (self.limits by default)
+        :param batch_size: Maximum number of rows per batch
+        """
+        from limits import PartialResult, estimate_row_bytes
+        limits = limits or self.limits
+        deadline = time.monotonic() + limits.max_seconds if limits.max_seconds else None
+        batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        if limits.max_rows:
+            # One row past the limit tells a truncated result from an exact fit
+            batch_size = min(batch_size, limits.max_rows + 1)
+        batch = ResultSet(())
+        count = 0
+        size = 0
+        reason = None
+        abandoned = False
+        try:
+            with self._statement_timeout(limits.max_seconds):
+                batches = self.iter_batches(query, params, batch_size=batch_size)
+                try:
+                    for rows in batches:
+                        rows = as_result_set(rows)
+                        batch = ResultSet(rows.columns)
+                        for values in rows.rows:
+                            if limits.max_rows and count >= limits.max_rows:
+                                reason = 'max_rows'
+                                break
+                            if limits.max_bytes:
+                                size += estimate_row_bytes(values)
+                                if size > limits.max_bytes:
+                                    reason = 'max_bytes'
+                                    break
+                            batch.rows.append(values)
+                            count += 1
+                        if reason is None and deadline and time.monotonic() > deadline:
+                            reason = 'max_seconds'
+                        if reason:
+                            break
+                        try:
+                            yield batch
+                        except GeneratorExit:
+                            abandoned = True
+                            raise
+                        batch = ResultSet(batch.columns)
+                finally:
+                    if reason or abandoned:
+                        # Stop the server producing rows nobody will read
+                        self._abort_query()
+                    try:
+                        batches.close()
+                    except Exception as e:
+                        if not ((reason or abandoned) and self._is_cancellation(e)):
+                            raise
+        except Exception as e:
+            if not self._is_cancellation(e):
+                raise
+            reason = 'max_seconds'
+        if reason is None:
+            return
+        self.logger.warning(f"Query stopped by {reason} after {count} rows: {query}")
+        get_registry().inc('query_limit_hits_total', handler=type(self).__name__, reason=reason)
+        yield PartialResult(batch, reason, limits)
+
+    @contextlib.contextmanager
+    def _statement_timeout(self, seconds: Optional[float]):
+        """Interrupt statements of this connection that run longer than ``seconds``."""
+        yield
+
+    def _abort_query(self) -> None:
+        """Cancel the statement whose rows are being streamed, before its cursor is closed."""
+        pass
+
+    def _is_cancellation(self, error: Exception) -> bool:
+        """Whether an error means a statement was interrupted by _statement_timeout()."""
+        return False
+
+    def _new_statement_cache(self, prepare=None, deallocate=None) -> Optional[StatementCache]:
+        """Create the statement cache of a new connection, or None when it is disabled."""
+        if not self.statement_cache_size:
+            return None
+        return StatementCache(type(self).__name__, self.statement_cache_size, prepare, deallocate)
+
+    def _execute(self, cursor, query: str, params: tuple = None) -> None:
+        """Execute a query on a cursor, through the prepared statement cache when it has parameters."""
+        name = None
+        if (params and self.statements is not None and isinstance(params, (tuple, list))
+                and preparable(query, params)):
+            name = self.statements.get(query)
+        if name is None:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            return
+        try:
+            self._execute_statement(cursor, name, query, params)
+        except Exception:
+            # e.g. a table changed under a prepared SELECT *; prepare it afresh next time
+            self.statements.discard(query)
+            raise
+
+    def _execute_statement(self, cursor, name: str, query: str, params: tuple) -> None:
+        """Run prepared statement ``name``; by default the driver's own cache prepares ``query``."""
+        cursor.execute(query, params)
+
+    def build_select(self, table_name: str, columns: Sequence[str] = None,
+                     filters: Sequence[Tuple[str, str, Any]] = None,
+                     order_by: Sequence[Any] = None) -> Tuple[str, tuple]:
+        """
+        Build a SELECT statement with a projection, WHERE and ORDER BY clause.
+
+        :param table_name: Table to read
+        :param columns: Columns to return (all columns if omitted)
+        :param filters: (column, operator, value) tuples combined with AND; a tuple of
+                        columns compared with a tuple of values is a row-value comparison
+        :param order_by: Column names or (column, 'asc'|'desc') tuples
+        :return: (query, params)
+        """
+        select_list = ', '.join(self.quote_identifier(c) for c in columns) if columns else '*'
+        query = f'SELECT {select_list} FROM {self.quote_identifier(table_name)}'
+        conditions = []
+        params: List[Any] = []
+        for column, op, value in filters or ():
+            op = op.lower()
+            if op not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            if op == 'in':
+                placeholders = ', '.join([self.PARAM_PLACEHOLDER] * len(value))
+                conditions.append(f'{self.quote_identifier(column)} IN ({placeholders})')
+                params.extend(value)
+            elif isinstance(column, tuple):
+                # Row-value comparison: (a, b) > (?, ?) is one index range on a composite key
+                column_list = ', '.join(self.quote_identifier(c) for c in column)
+                placeholders = ', '.join([self.PARAM_PLACEHOLDER] * len(column))
+                conditions.append(f'({column_list}) {op} ({placeholders})')
+                params.extend(value)
+            else:
+                conditions.append(f'{self.quote_identifier(column)} {op} {self.PARAM_PLACEHOLDER}')
+                params.append(value)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        if order_by:
+            from sorting import normalize_order_by
+            # Plain column terms, so the database can read an index in order instead of sorting
+            query += ' ORDER BY ' + ', '.join(f'{self.quote_identifier(column)} {direction.upper()}'
+                                              for column, direction in normalize_order_by(order_by))
+        return query, tuple(params)
+
+
+    def iter_table(self, table_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   columns: Sequence[str] = None,
+                   filters: Sequence[Tuple[str, str, Any]] = None,
+                   order_by: Sequence[Any] = None) -> Iterator[ResultSet]:
+        """
+        Stream the rows of a table in batches of row dictionaries.
+
+        Projection, filters and sort order are pushed down into the query on SQL backends.
+        """
+        query, params = self.build_select(table_name, columns, filters, order_by)
+        return self.iter_batches(query, params or None, batch_size=batch_size)
+
+    def _external_sort(self, scan, table_name: str, batch_size: int, columns: Sequence[str],
+                       filters: Sequence[Tuple[str, str, Any]],
+                       order_by: Sequence[Any]) -> Iterator[ResultSet]:
+        """Sort the batches of ``scan`` on disk for handlers that cannot sort in the database."""
+        from sorting import external_sort, normalize_order_by
+        order_by = normalize_order_by(order_by)
+        scan_columns = None
+        if columns:
+            # Sort columns are read even when not selected, and projected away afterwards
+            scan_columns = list(columns) + [c for c, _ in order_by if c not in columns]
+        batches = external_sort(scan(table_name, batch_size, scan_columns, filters), order_by,
+                                batch_size=batch_size)
+        if scan_columns is not None and len(scan_columns) > len(columns):
+            return (filter_rows(batch, columns) for batch in batches)
+        return (as_result_set(batch) for batch in batches)
+
+    def read_page(self, table_name: str, offset: int, limit: int, columns: Sequence[str] = None,
+                  order_by: Sequence[Any] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                  limits=None) -> Iterator[ResultSet]:
+        """
+        Stream ``limit`` rows of a table starting after the first ``offset``, in batches.
+
+        Backends with a LIMIT clause read only those rows; the others skip the
+        leading rows of a scan.
+
+        :param limits: QueryLimits for the page query (backends with a LIMIT clause; see iter_limited)
+        """
+        if offset < 0 or limit < 1:
+            raise ValueError("Pages need a non-negative offset and a positive limit")
+        if self.LIMIT_CLAUSE:
+            query, params = self.build_select(table_name, columns, None, order_by)
+            query += f' LIMIT {int(limit)} OFFSET {int(offset)}'
+            batch_size = min(batch_size, limit)
+            if limits:
+                return self.iter_limited(query, params or None, limits, batch_size)
+            return self.iter_batches(query, params or None, batch_size=batch_size)
+        return slice_batches(self.iter_table(table_name, batch_size, columns, order_by=order_by), offset, limit)
+
+    def sample_table(self, table_name: str, size: int = None, columns: Sequence[str] = None,
+                     seed: int = None) -> ResultSet:
+        """
+        Return a random sample of a table's rows, for a quick preview of a large table.
+
+        The base implementation streams the whole table through a reservoir;
+        backends override it to read only the sampled rows (see sampling.py).
+
+        :param size: Rows to return (sampling.DEFAULT_SAMPLE_SIZE by default); smaller tables are returned whole
+        :param columns: Columns to return (all by default)
+        :param seed: Seed for a repeatable sample
+        """
+        from sampling import check_sample_size, reservoir_sample
+        size = check_sample_size(size)
+        with span('sample', table=table_name, method='reservoir'):
+            return reservoir_sample(self.iter_table(table_name, columns=columns), size, random.Random(seed))
+
+    def _sample_by_percent(self, build, size: int, estimate: Optional[int], seed: int = None) -> ResultSet:
+        """
+        Sample with a query returning about ``percent`` % of the rows, trimmed to ``size`` rows.
+
+        :param build: Callable taking the percentage and returning (query, params)
+        :param estimate: Approximate row count of the table (None if unknown)
+        """
+        from sampling import OVERSAMPLE_FACTOR, reservoir_sample, sample_percent
+        percent = sample_percent(size, estimate)
+        while True:
+            rows = self.execute_query(*build(percent))
+            if len(rows) >= size or percent >= 100:
+                break
+            # The estimate was low or missing: scale the percentage by the shortfall
+            percent = min(100.0, percent * OVERSAMPLE_FACTOR * size / max(len(rows), 1))
+        return reservoir_sample([rows], size, random.Random(seed))
+
+    def checksum_rows(self, table_name: str, columns: Sequence[str],
+                      filters: Sequence[Tuple[str, str, Any]] = None) -> Tuple[int, int]:
+        """
+        Return the row count and an order-independent checksum of the rows matching the filters.
+
+        The base implementation streams the rows and hashes them with
+        table_diff.row_hash(); backends override it to checksum in the database.
+
+        :param columns: Columns included in the checksum, in this order
+        """
+        from table_diff import stream_checksum
+        with span('checksum', table=table_name, method='stream'):
+            return stream_checksum(self, table_name, columns, filters)
+
+    def _checksum_query(self, table_name: str, columns: Sequence[str],
+                        filters: Sequence[Tuple[str, str, Any]], checksum: str) -> Tuple[int, int]:
+        """Run a checksum_rows() aggregate over the selected rows, aliased diff_rows."""
+        from table_diff import CHECKSUM_MASK
+        query, params = self.build_select(table_name, columns, filters)
+        rows = self.execute_query(f'SELECT COUNT(*) AS row_count, {checksum} AS checksum FROM ({query}) AS diff_rows',
+                                  params or None)
+        return rows[0]['row_count'], int(rows[0]['checksum'] or 0) & CHECKSUM_MASK
+
+    def count_rows(self, table_name: str, filters: Sequence[Tuple[str, str, Any]] = None) -> int:
+        """Count the rows of a table matching the filters."""
+        query, params = self.build_select(table_name, None, filters)
+        query = query.replace('SELECT *', 'SELECT COUNT(*) AS row_count', 1)
+        rows = self.execute_query(query, params or None)
+        return list(rows[0].values())[0] if rows else 0
+
+    def search_rows(self, table_name: str, text: str, columns: Sequence[str] = None,
+                    limit: int = None) -> Optional[ResultSet]:
+        """
+        Full-text search using the backend's own index (see search.search_table).
+
+        :return: Matching rows, or None if the backend cannot run the search itself
+        """
+        return None
+
+    def row_position(self, table_name: str) -> Optional[int]:
+        """Return the position of the last stored row (see ROW_WATERMARK), None if there are no rows."""
+        raise ValueError(f"{type(self).__name__} has no row position; use a watermark column")
+
+    def iter_rows_after(self, table_name: str, start: Optional[int], end: int,
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[ResultSet]:
+        """Stream the rows whose position (see ROW_WATERMARK) is > start (any if None) and <= end."""
+        raise ValueError(f"{type(self).__name__} has no row position; use a watermark column")
+
+    def _streaming_cursor(self):
+        """Return a new cursor for iter_batches, separate from self.cursor."""
+        return self.conn.cursor()
+
+    def explain(self, query: str, params: tuple = None, analyze: bool = False):
+        """
+        Return the execution plan of a query, with full scans of large tables and big sorts flagged.
+
+        :param query: SQL query
+        :param params: Optional query parameters
+        :param analyze: Run the query to measure actual rows and time (only for queries, not writes)
+        :return: query_plan.QueryPlan
+        """
+        from query_plan import annotate
+        if analyze and not _ROW_QUERY.match(query):
+            raise ValueError("Only queries can be analyzed; EXPLAIN ANALYZE runs the statement")
+        with span('explain', query=query, analyze=analyze):
+            plan = self._explain(query, params, analyze)
+            return annotate(plan, self.estimate_row_count, query)
+
+    def _explain(self, query: str, params: Optional[tuple], analyze: bool):
+        """Run the backend's EXPLAIN and parse it into a QueryPlan."""
+        raise ValueError(f"{type(self).__name__} cannot explain queries")
+
+    def estimate_row_count(self, table_name: str) -> Optional[int]:
+        """Return a table's approximate row count from statistics, without counting; None if unknown."""
+        return None
+
+    def get_column_types(self, table_name: str) -> List[Tuple[str, str]]:
+        """
+        Return (column, type) pairs for a table, in the backend's own type names.
+
+        The base implementation infers generic types from the first rows.
+        """
+        from table_copy import infer_column_types
+        rows = next(iter(self.iter_table(table_name, batch_size=100)), [])
+        return infer_column_types(self.get_columns(table_name), rows)
+
+    def get_primary_key(self, table_name: str) -> List[str]:
+        """Return the primary key columns of a table, in key order (empty if it has none)."""
+        return []
+
+    def get_indexes(self, table_name: str) -> Dict[str, List[str]]:
+        """Return the indexes of a table as index name -> columns, in index order."""
+        return {}
+
+    def native_type(self, generic: str) -> str:
+        """Translate a generic column type such as 'varchar(40)' into this backend's type."""
+        match = re.fullmatch(r'(\w+)\s*(?:\((.*)\))?', generic.strip().lower())
+        name, args = (match.group(1), match.group(2)) if match else ('text', None)
+        native = self.COLUMN_TYPES.get(name, self.COLUMN_TYPES['text'])
+        if isinstance(native, tuple):
+            return native[0].format(args=args) if args else native[1]
+        return native
+
+    def create_table(self, table_name: str, columns: Sequence[Tuple[str, str]],
+                     if_exists: str = 'fail') -> str:
+        """
+        Create a table from (column, generic type) pairs, without committing a replaced table.
+
+        With TRANSACTIONAL_DDL the DROP and CREATE join the current transaction,
+        so a rollback restores the old table. Otherwise an existing table is
+        kept until replace_table() swaps in the loaded one.
+
+        :param table_name: Table to create
+        :param columns: (column, generic type) pairs, e.g. from table_copy.translate_schema()
+        :param if_exists: 'fail', 'replace' (drop the table first) or 'append' (keep it)
+        :return: Table to load the rows into: table_name, or a temporary table replacing it
+        """
+        if not self.COLUMN_TYPES:
+            raise ValueError(f"{type(self).__name__} cannot create tables")
+        if if_exists not in ('fail', 'replace', 'append'):
+            raise ValueError(f"Unsupported if_exists value: {if_exists}")
+        statements = []
+        load_table = table_name
+        tables = self.get_tables()
+        if table_name in tables:
+            if if_exists == 'fail':
+                raise ValueError(f"Table {table_name} already exists")
+            if if_exists == 'append':
+                return table_name
+            if self.TRANSACTIONAL_DDL:
+                statements.append(f'DROP TABLE {self.quote_identifier(table_name)}')
+            else:
+                load_table = table_name + LOAD_TABLE_SUFFIX
+                if load_table in tables:
+                    # Left behind by a copy that was interrupted
+                    statements.append(f'DROP TABLE {self.quote_identifier(load_table)}')
+        definitions = ', '.join(f'{self.quote_identifier(column)} {self.native_type(column_type)}'
+                                for column, column_type in columns)
+        statements.append(f'CREATE TABLE {self.quote_identifier(load_table)} ({definitions})')
+        if self.TRANSACTIONAL_DDL:
+            self._begin()
+        cursor = self.conn.cursor()
+        try:
+            for statement in statements:
+                with span('execute', query=statement):
+                    cursor.execute(statement)
+        finally:
+            cursor.close()
+        if not self.TRANSACTIONAL_DDL:
+            self.conn.commit()
+        return load_table
+
+    def replace_table(self, load_table: str, table_name: str) -> None:
+        """Replace ``table_name`` with the committed ``load_table`` returned by create_table()."""
+        self._execute_ddl([f'DROP TABLE {self.quote_identifier(table_name)}',
+                           f'ALTER TABLE {self.quote_identifier(load_table)} '
+                           f'RENAME TO {self.quote_identifier(table_name)}'])
+
+    def drop_table(self, table_name: str) -> None:
+        """Drop a table and commit."""
+        self._execute_ddl([f'DROP TABLE {self.quote_identifier(table_name)}'])
+
+    def _execute_ddl(self, statements: Sequence[str]) -> None:
+        cursor = self.conn.cursor()
+        try:
+            for statement in statements:
+                with span('execute', query=statement):
+                    cursor.execute(statement)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _begin(self) -> None:
+        """Make sure a transaction is open, so the following DDL can be rolled back."""
+        pass
+
+    def bulk_insert(self, table_name: str, columns: Sequence[str],
+                    rows: Sequence[Sequence[Any]]) -> int:
+        """
+        Insert rows without committing; call commit() once the whole load is done.
+
+        :param table_name: Destination table
+        :param columns: Column names, in the order of the row values
+        :param rows: Row value sequences
+        :return: Number of rows inserted
+        """
+        if not self.COLUMN_TYPES:
+            raise ValueError(f"{type(self).__name__} cannot insert rows")
+        column_list = ', '.join(self.quote_identifier(c) for c in columns)
+        placeholders = ', '.join([self.PARAM_PLACEHOLDER] * len(columns))
+        query = f'INSERT INTO {self.quote_identifier(table_name)} ({column_list}) VALUES ({placeholders})'
+        cursor = self._insert_cursor()
+        try:
+            with span('bulk_insert', table=table_name, rows=len(rows)):
+                cursor.executemany(query, rows)
+        finally:
+            cursor.close()
+        return len(rows)
+
+    def _insert_cursor(self):
+        """Return a new cursor for bulk_insert."""
+        return self.conn.cursor()
+
+    def execute_batch(self, statements: Sequence[Statement],
+                      page_size: int = DEFAULT_PAGE_SIZE) -> List[StatementResult]:
+        """
+        Run statements in one transaction, committed at the end and rolled back if one fails.
+
+        :param statements: SQL strings or (SQL, parameters) pairs
+        :param page_size: Statements sent per round trip on backends that can send several
+        :return: One StatementResult per statement, in order
+        """
+        if not self.SQL_QUERIES:
+            raise ValueError(f"{type(self).__name__} cannot run SQL statements")
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        statements = normalize_statements(statements)
+        results: List[StatementResult] = []
+        cursor = self.conn.cursor()
+        try:
+            with span('execute_batch', statements=len(statements)):
+                self._run_batch(cursor, statements, results, page_size)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise ValueError(f"Batch failed after {len(results)} of {len(statements)} statements "
+                             f"and was rolled back: {e}")
+        finally:
+            cursor.close()
+        get_registry().inc('batch_statements_total', len(statements), handler=type(self).__name__)
+        return results
+
+    def _run_batch(self, cursor, statements: List[Tuple[str, Optional[tuple]]],
+                   results: List[StatementResult], page_size: int) -> None:
+        """Execute the statements of a batch, appending a StatementResult for each."""
+        for query, params in statements:
+            with span('execute', query=query):
+                self._execute(cursor, query, params)
+            results.append(self._statement_result(cursor, query, params))
+
+    def _statement_result(self, cursor, query: str, params: Optional[tuple]) -> StatementResult:
+        """Read the outcome of the statement a cursor last executed."""
+        if cursor.description is None:
+            rowcount = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+            return StatementResult(query, params, rowcount=rowcount)
+        columns = [description[0] for description in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return StatementResult(query, params, rows=rows, rowcount=len(rows))
+
+    def commit(self) -> None:
+        if self.conn:
+            self.conn.commit()
+
+    def rollback(self) -> None:
+        if self.conn:
+            self.conn.rollback()
+
+    def set_read_only(self) -> None:
+        """Make the connection reject writes, where the backend can enforce it."""
+        pass
 
     def close(self):
         if self.cursor:
             self.cursor.close()
         if self.conn:
             self.conn.close()
+        self.statements = None
+
+def slice_batches(batches: Iterator[ResultSet], offset: int, limit: int) -> Iterator[ResultSet]:
+    """Skip the first ``offset`` rows of a batch stream and stop after ``limit`` rows."""
+    try:
+        for batch in batches:
+            if offset >= len(batch):
+                offset -= len(batch)
+                continue
+            batch = batch[offset:offset + limit]
+            offset = 0
+            limit -= len(batch)
+            yield batch
+            if not limit:
+                return
+    finally:
+        # Closes the source cursor when the page ends before the table does
+        batches.close()
+
+# SQLite virtual machine instructions between checks of a statement's time limit
+PROGRESS_HANDLER_STEPS = 10000
+# Seconds past max_seconds before a statement is cancelled from a timer thread
+CANCEL_GRACE_SECONDS = 1.0
 
 class SQLiteHandler(DatabaseHandler):
+    # Set to False when the connection is driven from a worker thread pool
+    check_same_thread = True
+    ROW_WATERMARK = 'rowid'
+    LIMIT_CLAUSE = True
+    TRANSACTIONAL_DDL = True
+    # Declared types are kept descriptive; SQLite derives the storage affinity from them
+    COLUMN_TYPES = {
+        'integer': 'INTEGER', 'bigint': 'INTEGER', 'float': 'REAL',
+        'decimal': ('NUMERIC({args})', 'NUMERIC'), 'text': 'TEXT',
+        'varchar': ('VARCHAR({args})', 'TEXT'), 'boolean': 'BOOLEAN', 'date': 'DATE',
+        'datetime': 'TIMESTAMP', 'time': 'TIME', 'blob': 'BLOB',
+    }
+
     def connect(self):
-        self.conn = sqlite3.connect(self.db_path)
+        sqlite3 = load_driver('sqlite3')
+        options = {'check_same_thread': self.check_same_thread}
+        # sqlite3 keeps its own LRU of compiled statements; the StatementCache mirrors it for hit counts
+        self.statements = self._new_statement_cache()
+        if self.statements is not None:
+            options['cached_statements'] = self.statement_cache_size
+        self.conn = sqlite3.connect(self.db_path, **options)
         self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()
+        # Plain tuples become ResultSet rows without a copy
+        self.cursor.row_factory = None
 
     def get_tables(self) -> List[str]:
         self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
         return [table[0] for table in self.cursor.fetchall()]
 
-    def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
-        if params:
-            self.cursor.execute(query, params)
-        else:
-            self.cursor.execute(query)
+    @enforce_limits
+    def execute_query(self, query: str, params: tuple = None) -> ResultSet:
+        with span('execute', query=query):
+            self._execute(self.cursor, query, params)
         
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
+        with span('fetch') as fetch_span:
+            rows = self.cursor.fetchall()
+            fetch_span.set(rows=len(rows))
+        with span('convert'):
+            return ResultSet.from_cursor(self.cursor, rows)
 
-    def export_to_csv(self, table_name: str, output_path: str):
-        query = f"SELECT * FROM {table_name}"
-        self.cursor.execute(query)
-        headers = [description[0] for description in self.cursor.description]
-        
-        with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(headers)
-            writer.writerows(self.cursor.fetchall())
+    @contextlib.contextmanager
+    def _statement_timeout(self, seconds: Optional[float]):
+        if not seconds:
+            yield
+            return
+        deadline = time.monotonic() + seconds
+        # Called every N virtual machine instructions; returning True interrupts the statement
+        self.conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_HANDLER_STEPS)
+        try:
+            yield
+        finally:
+            self.conn.set_progress_handler(None, 0)
+
+    def _is_cancellation(self, error: Exception) -> bool:
+        return isinstance(error, load_driver('sqlite3').OperationalError) and 'interrupted' in str(error)
+
+    def set_read_only(self) -> None:
+        self.cursor.execute('PRAGMA query_only = ON')
+
+    def get_column_types(self, table_name: str) -> List[Tuple[str, str]]:
+        self.cursor.execute(f'PRAGMA table_info({self.quote_identifier(table_name)})')
+        return [(row[1], row[2] or '') for row in self.cursor.fetchall()]
+
+    def get_primary_key(self, table_name: str) -> List[str]:
+        self.cursor.execute(f'PRAGMA table_info({self.quote_identifier(table_name)})')
+        key = [row[1] for row in sorted(self.cursor.fetchall(), key=lambda row: row[5]) if row[5]]
+        # Tables without a declared key are still keyed by their rowid
+        return key or ['rowid']
+
+    def get_indexes(self, table_name: str) -> Dict[str, List[str]]:
+        indexes = {}
+        self.cursor.execute(f'PRAGMA index_list({self.quote_identifier(table_name)})')
+        for index in [row[1] for row in self.cursor.fetchall()]:
+            self.cursor.execute(f'PRAGMA index_info({self.quote_identifier(index)})')
+            # Expression columns have no name
+            indexes[index] = [row[2] for row in sorted(self.cursor.fetchall()) if row[2] is not None]
+        return indexes
+
+    def row_position(self, table_name: str) -> Optional[int]:
+        # rowids can be 0 or negative (an INTEGER PRIMARY KEY set by the application)
+        rows = self.execute_query(f'SELECT MAX(rowid) AS position FROM {self.quote_identifier(table_name)}')
+        return rows[0]['position']
+
+    def _explain(self, query: str, params: Optional[tuple], analyze: bool):
+        from query_plan import parse_sqlite_plan
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('EXPLAIN QUERY PLAN ' + query, params or ())
+            plan = parse_sqlite_plan([tuple(row) for row in cursor.fetchall()])
+            if analyze:
+                # SQLite reports no per-node timings; the query as a whole is run and timed
+                start = time.perf_counter()
+                cursor.execute(query, params or ())
+                rows = 0
+                while True:
+                    batch = cursor.fetchmany(self.DEFAULT_BATCH_SIZE)
+                    if not batch:
+                        break
+                    rows += len(batch)
+                plan.execution_ms = round((time.perf_counter() - start) * 1000, 3)
+                plan.root.actual_rows, plan.root.actual_ms = rows, plan.execution_ms
+                plan.analyzed = True
+        finally:
+            cursor.close()
+        return plan
+
+    def estimate_row_count(self, table_name: str) -> Optional[int]:
+        # The largest rowid is read from the end of the table's b-tree: an upper bound, found instantly
+        try:
+            return max(self.row_position(table_name) or 0, 0)
+        except Exception:
+            # WITHOUT ROWID tables, views
+            return None
+
+    def sample_table(self, table_name: str, size: int = None, columns: Sequence[str] = None,
+                     seed: int = None) -> ResultSet:
+        # Random rowids between the smallest and largest, each found with one b-tree seek.
+        # A probe lands on the next row after a gap, so rows after large gaps are favoured
+        from sampling import MAX_PROBES_PER_ROW, check_sample_size
+        size = check_sample_size(size)
+        quoted = self.quote_identifier(table_name)
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        try:
+            try:
+                # Separate subqueries, so each is answered from one end of the b-tree
+                cursor.execute(f'SELECT (SELECT MIN(rowid) FROM {quoted}), (SELECT MAX(rowid) FROM {quoted})')
+                low, high = cursor.fetchone()
+            except load_driver('sqlite3').OperationalError:
+                # WITHOUT ROWID tables, views
+                return super().sample_table(table_name, size, columns, seed)
+            if low is None or high - low + 1 <= size * MAX_PROBES_PER_ROW:
+                # Small or empty: a full pass is as quick as probing
+                return super().sample_table(table_name, size, columns, seed)
+            select = ', '.join(self.quote_identifier(column) for column in columns) if columns else '*'
+            query = f'SELECT rowid, {select} FROM {quoted} WHERE rowid >= ? ORDER BY rowid LIMIT 1'
+            rng = random.Random(seed)
+            found: Dict[int, tuple] = {}
+            with span('sample', table=table_name, method='rowid probes') as sample_span:
+                for probe in range(size * MAX_PROBES_PER_ROW):
+                    if len(found) >= size:
+                        break
+                    cursor.execute(query, (rng.randint(low, high),))
+                    row = cursor.fetchone()
+                    if row is not None:
+                        found.setdefault(row[0], row[1:])
+                sample_span.set(probes=probe + 1, rows=len(found))
+            header = [description[0] for description in cursor.description[1:]]
+            return ResultSet(header, [found[rowid] for rowid in sorted(found)])
+        finally:
+            cursor.close()
+
+    def checksum_rows(self, table_name: str, columns: Sequence[str],
+                      filters: Sequence[Tuple[str, str, Any]] = None) -> Tuple[int, int]:
+        # The streamed checksum's row hash, run inside SQLite as an aggregate, so rows are not converted
+        from table_diff import RowChecksum
+        self.conn.create_aggregate('dbbrowser_row_checksum', -1, RowChecksum)
+        column_list = ', '.join(self.quote_identifier(column) for column in columns)
+        with span('checksum', table=table_name, method='aggregate'):
+            return self._checksum_query(table_name, columns, filters, f'dbbrowser_row_checksum({column_list})')
+
+    def iter_rows_after(self, table_name: str, start: Optional[int], end: int,
+                        batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE) -> Iterator[ResultSet]:
+        # rowid only grows for appended rows unless rows were deleted and the maximum reused
+        if start is None:
+            query = f'SELECT * FROM {self.quote_identifier(table_name)} WHERE rowid <= ?'
+            return self.iter_batches(query, (end,), batch_size=batch_size)
+        query = f'SELECT * FROM {self.quote_identifier(table_name)} WHERE rowid > ? AND rowid <= ?'
+        return self.iter_batches(query, (start, end), batch_size=batch_size)
+
+    def bulk_insert(self, table_name: str, columns: Sequence[str],
+                    rows: Sequence[Sequence[Any]]) -> int:
+        # The first INSERT opens a transaction that stays open until commit()
+        from sqlite_cache import to_sqlite_value
+        rows = [[to_sqlite_value(value) for value in row] for row in rows]
+        return super().bulk_insert(table_name, columns, rows)
+
+    def _begin(self) -> None:
+        # The sqlite3 module only opens a transaction before INSERT/UPDATE/DELETE, so DDL
+        # outside of one would be committed at once
+        if not self.conn.in_transaction:
+            self.conn.execute('BEGIN')
+
+    def fts_table(self, table_name: str) -> Optional[str]:
+        """Return the FTS5 table indexing ``table_name`` (named <table>_fts or content=<table>)."""
+        self.cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%'"
+        )
+        for name, sql in self.cursor.fetchall():
+            sql = sql.lower()
+            if 'fts5' not in sql:
+                continue
+            if name == f'{table_name}_fts' or re.search(
+                    r"content\s*=\s*['\"]?" + re.escape(table_name.lower()) + r"['\"]?\s*[,)]", sql):
+                return name
+        return None
+
+    def create_fts_index(self, table_name: str, columns: Sequence[str]) -> str:
+        """
+        Create and fill an external-content FTS5 index over text columns of a table.
+
+        The index is not updated automatically when the table changes; call this
+        again (it rebuilds the index) after bulk changes.
+        """
+        fts_name = f'{table_name}_fts'
+        column_list = ', '.join(self.quote_identifier(c) for c in columns)
+        with span('create_fts_index', table=table_name):
+            self.cursor.execute(f'DROP TABLE IF EXISTS {self.quote_identifier(fts_name)}')
+            self.cursor.execute(
+                f'CREATE VIRTUAL TABLE {self.quote_identifier(fts_name)} USING fts5('
+                f"{column_list}, content='{table_name}', content_rowid='rowid')"
+            )
+            self.cursor.execute(
+                f"INSERT INTO {self.quote_identifier(fts_name)}({self.quote_identifier(fts_name)}) "
+                f"VALUES ('rebuild')"
+            )
+            self.conn.commit()
+        return fts_name
+
+    def search_rows(self, table_name: str, text: str, columns: Sequence[str] = None,
+                    limit: int = None) -> Optional[ResultSet]:
+        from search import search_terms
+        fts_name = self.fts_table(table_name)
+        terms = search_terms(text)
+        if fts_name is None or not terms:
+            return None
+        match = ' AND '.join('"' + word + '"' + ('*' if prefix else '') for word, prefix in terms)
+        if columns:
+            match = '{' + ' '.join(columns) + '} : (' + match + ')'
+        query = (f'SELECT t.* FROM {self.quote_identifier(table_name)} t '
+                 f'JOIN {self.quote_identifier(fts_name)} f ON f.rowid = t.rowid '
+                 f'WHERE {self.quote_identifier(fts_name)} MATCH ? ORDER BY f.rank')
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        return self.execute_query(query, (match,))
 
 class MySQLHandler(DatabaseHandler):
+    PARAM_PLACEHOLDER = '%s'
+    LIMIT_CLAUSE = True
+    ROW_CHECKSUM = 'mysql_md5'
+    # Opt-in: SQL-level PREPARE costs a SET and an EXECUTE round trip per query where an
+    # interpolated execute() takes one, which outweighs the parse saved on slow links
+    STATEMENT_CACHE_SIZE = 0
+    COLUMN_TYPES = {
+        'integer': 'INT', 'bigint': 'BIGINT', 'float': 'DOUBLE',
+        'decimal': ('DECIMAL({args})', 'DECIMAL(65,30)'), 'text': 'LONGTEXT',
+        'varchar': ('VARCHAR({args})', 'LONGTEXT'), 'boolean': 'TINYINT(1)', 'date': 'DATE',
+        'datetime': 'DATETIME(6)', 'time': 'TIME(6)', 'blob': 'LONGBLOB',
+    }
+
     def __init__(self, connection_params: Dict[str, Any]):
         super().__init__(connection_params=connection_params)
         self.conn = None
@@ -97,15 +1154,21 @@ class MySQLHandler(DatabaseHandler):
             if param not in self.connection_params:
                 raise ValueError(f"Missing required MySQL connection parameter: {param}")
 
+    def _open_connection(self):
+        return load_driver('MySQLdb').connect(
+            host=self.connection_params['host'],
+            user=self.connection_params['user'],
+            passwd=self.connection_params['password'],
+            db=self.connection_params['database']
+        )
+
     def _establish_connection(self):
+        MySQLdb = load_driver('MySQLdb')
         try:
-            self.conn = MySQLdb.connect(
-                host=self.connection_params['host'],
-                user=self.connection_params['user'],
-                passwd=self.connection_params['password'],
-                db=self.connection_params['database']
-            )
-            self.cursor = self.conn.cursor(MySQLdb.cursors.DictCursor)
+            self.conn = self._open_connection()
+            # Plain tuple rows become ResultSet rows without building a dictionary per row
+            self.cursor = self.conn.cursor()
+            self.statements = self._new_statement_cache(self._prepare_statement, self._deallocate_statement)
         except MySQLdb.Error as e:
             raise ValueError(f"MySQL Connection Error: {e}")
 
@@ -113,80 +1176,342 @@ class MySQLHandler(DatabaseHandler):
         self.cursor.execute("SHOW TABLES")
         return [table[0] for table in self.cursor.fetchall()]
 
-    def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
-        if params:
-            self.cursor.execute(query, params)
-        else:
-            self.cursor.execute(query)
+    @enforce_limits
+    def execute_query(self, query: str, params: tuple = None) -> ResultSet:
+        with span('execute', query=query):
+            self._execute(self.cursor, query, params)
         
-        return self.cursor.fetchall()
+        with span('fetch'):
+            rows = self.cursor.fetchall()
+        with span('convert', rows=len(rows)):
+            return ResultSet.from_cursor(self.cursor, rows)
 
-    def export_to_csv(self, table_name: str, output_path: str):
-        query = f"SELECT * FROM {table_name}"
-        self.cursor.execute(query)
-        headers = [column[0] for column in self.cursor.description]
-        
-        with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(headers)
-            writer.writerows(self.cursor.fetchall())
+    def quote_identifier(self, name: str) -> str:
+        return '`' + name.replace('`', '``') + '`'
+
+    @contextlib.contextmanager
+    def _statement_timeout(self, seconds: Optional[float]):
+        if not seconds:
+            yield
+            return
+        MySQLdb = load_driver('MySQLdb')
+        cursor = self.conn.cursor()
+        try:
+            # Server-side limit for SELECT statements (MySQL 5.7.8+)
+            cursor.execute('SET SESSION max_execution_time = %s', (int(seconds * 1000),))
+            server_limit = True
+        except MySQLdb.OperationalError:
+            # MariaDB has no max_execution_time; the timer below still applies
+            server_limit = False
+        # Also covers time spent streaming rows after the statement started returning them
+        timer = threading.Timer(seconds + CANCEL_GRACE_SECONDS, self._abort_query)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield
+        finally:
+            timer.cancel()
+            if server_limit:
+                cursor.execute('SET SESSION max_execution_time = DEFAULT')
+            cursor.close()
+
+    def _abort_query(self) -> None:
+        # KILL QUERY must come from another connection while this one streams a result
+        connection = self._open_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f'KILL QUERY {int(self.conn.thread_id())}')
+            cursor.close()
+        finally:
+            connection.close()
+
+    # mysqlclient has no binary-protocol prepared statements, so the SQL-level PREPARE is used:
+    # parameters travel as user variables, one extra round trip per EXECUTE
+
+    def _prepare_statement(self, name: str, query: str) -> None:
+        self.cursor.execute(f'PREPARE {name} FROM %s', (convert_placeholders(query, lambda n: '?'),))
+
+    def _deallocate_statement(self, name: str) -> None:
+        self.cursor.execute(f'DEALLOCATE PREPARE {name}')
+
+    def _execute_statement(self, cursor, name: str, query: str, params: tuple) -> None:
+        variables = [f'@{name}_{n}' for n in range(1, len(params) + 1)]
+        cursor.execute('SET ' + ', '.join(f'{variable} = %s' for variable in variables), params)
+        cursor.execute(f"EXECUTE {name} USING {', '.join(variables)}")
+
+    def _run_batch(self, cursor, statements: List[Tuple[str, Optional[tuple]]],
+                   results: List[StatementResult], page_size: int) -> None:
+        # MySQLdb connects with multi_statements enabled: a page of statements travels in one
+        # packet and the server returns one result per statement, read in turn with nextset()
+        for page in pages(statements, page_size):
+            sql = b';\n'.join(self._interpolate(query, params) for query, params in page)
+            with span('execute_page', statements=len(page)):
+                cursor.execute(sql)
+                for index, (query, params) in enumerate(page):
+                    if index:
+                        cursor.nextset()
+                    results.append(self._statement_result(cursor, query, params))
+
+    def _interpolate(self, query: str, params: Optional[tuple]) -> bytes:
+        """Substitute escaped parameter values into a query, as MySQLdb's cursors do."""
+        sql = query.encode(self.conn.encoding)
+        if params is None:
+            return sql
+        return sql % tuple(self.conn.literal(value) for value in params)
+
+    def _is_cancellation(self, error: Exception) -> bool:
+        # 1317: query interrupted (KILL QUERY); 3024: max_execution_time exceeded
+        MySQLdb = load_driver('MySQLdb')
+        return isinstance(error, MySQLdb.OperationalError) and bool(error.args) and error.args[0] in (1317, 3024)
+
+    def set_read_only(self) -> None:
+        self.cursor.execute('SET SESSION TRANSACTION READ ONLY')
+
+    def replace_table(self, load_table: str, table_name: str) -> None:
+        # DDL commits implicitly; RENAME TABLE swaps both names in one atomic step
+        old_table = table_name + '_dbbrowser_old'
+        self._execute_ddl([f'DROP TABLE IF EXISTS {self.quote_identifier(old_table)}',
+                           f'RENAME TABLE {self.quote_identifier(table_name)} TO {self.quote_identifier(old_table)}, '
+                           f'{self.quote_identifier(load_table)} TO {self.quote_identifier(table_name)}',
+                           f'DROP TABLE {self.quote_identifier(old_table)}'])
+
+    def get_column_types(self, table_name: str) -> List[Tuple[str, str]]:
+        rows = self.execute_query(
+            "SELECT COLUMN_NAME AS name, COLUMN_TYPE AS type FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+            (table_name,)
+        )
+        return [(row['name'], row['type']) for row in rows]
+
+    def get_primary_key(self, table_name: str) -> List[str]:
+        rows = self.execute_query(f"SHOW KEYS FROM {self.quote_identifier(table_name)} WHERE Key_name = 'PRIMARY'")
+        return [row['Column_name'] for row in sorted(rows, key=lambda row: row['Seq_in_index'])]
+
+    def get_indexes(self, table_name: str) -> Dict[str, List[str]]:
+        indexes: Dict[str, List[str]] = {}
+        rows = self.execute_query(f'SHOW INDEX FROM {self.quote_identifier(table_name)}')
+        for row in sorted(rows, key=lambda row: (row['Key_name'], row['Seq_in_index'])):
+            if row['Column_name'] is not None:
+                indexes.setdefault(row['Key_name'], []).append(row['Column_name'])
+        return indexes
+
+    def _explain(self, query: str, params: Optional[tuple], analyze: bool):
+        from query_plan import parse_mysql_plan, parse_mysql_tree
+        cursor = self.conn.cursor()
+        try:
+            # EXPLAIN ANALYZE (MySQL 8.0.18+) only has the tree format
+            cursor.execute(('EXPLAIN ANALYZE ' if analyze else 'EXPLAIN FORMAT=JSON ') + query, params)
+            document = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        return parse_mysql_tree(document) if analyze else parse_mysql_plan(document)
+
+    def estimate_row_count(self, table_name: str) -> Optional[int]:
+        # InnoDB's estimate, refreshed by ANALYZE TABLE and as the table changes
+        rows = self.execute_query(
+            "SELECT TABLE_ROWS AS estimate FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table_name,)
+        )
+        return rows[0]['estimate'] if rows else None
+
+    def sample_table(self, table_name: str, size: int = None, columns: Sequence[str] = None,
+                     seed: int = None) -> ResultSet:
+        # MySQL has no TABLESAMPLE: the server still scans the table, but only sampled rows are sent
+        from sampling import check_sample_size
+        size = check_sample_size(size)
+        estimate = self.estimate_row_count(table_name)
+        if not estimate:
+            return super().sample_table(table_name, size, columns, seed)
+        query, _ = self.build_select(table_name, columns)
+        rand = 'RAND()' if seed is None else f'RAND({int(seed)})'
+
+        def build(percent: float):
+            return f'{query} WHERE {rand} < %s', (percent / 100.0,)
+
+        with span('sample', table=table_name, method='rand'):
+            return self._sample_by_percent(build, size, estimate, seed)
+
+    def checksum_rows(self, table_name: str, columns: Sequence[str],
+                      filters: Sequence[Tuple[str, str, Any]] = None) -> Tuple[int, int]:
+        # CONCAT_WS skips NULLs, so a NULL flag per column keeps NULL apart from ''
+        quoted = [f'diff_rows.{self.quote_identifier(column)}' for column in columns]
+        concat = ', '.join(quoted + [f'ISNULL({column})' for column in quoted])
+        row_hash = f"CAST(CONV(SUBSTRING(MD5(CONCAT_WS('#', {concat})), 1, 15), 16, 10) AS UNSIGNED)"
+        with span('checksum', table=table_name, method='md5'):
+            return self._checksum_query(table_name, columns, filters, f'COALESCE(SUM({row_hash}), 0)')
+
+    # bulk_insert: MySQLdb's executemany() rewrites INSERT ... VALUES into multi-row
+    # INSERT statements, each as large as max_allowed_packet allows
+
+    def search_rows(self, table_name: str, text: str, columns: Sequence[str] = None,
+                    limit: int = None) -> Optional[ResultSet]:
+        from search import search_terms
+        terms = search_terms(text)
+        if not terms:
+            return None
+        # MATCH() must name exactly the columns of a FULLTEXT index
+        indexes: Dict[str, List[str]] = {}
+        for row in self.execute_query(
+                f"SHOW INDEX FROM {self.quote_identifier(table_name)} WHERE Index_type = 'FULLTEXT'"):
+            indexes.setdefault(row['Key_name'], []).append(row['Column_name'])
+        index_columns = next((cols for cols in indexes.values()
+                              if not columns or set(columns) == set(cols)), None)
+        if index_columns is None:
+            return None
+        match_columns = ', '.join(self.quote_identifier(c) for c in index_columns)
+        against = ' '.join('+' + word + ('*' if prefix else '') for word, prefix in terms)
+        query = (f'SELECT * FROM {self.quote_identifier(table_name)} '
+                 f'WHERE MATCH({match_columns}) AGAINST (%s IN BOOLEAN MODE)')
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        return self.execute_query(query, (against,))
+
+    def _streaming_cursor(self):
+        # Unbuffered cursor: rows are read from the server as they are fetched
+        return self.conn.cursor(load_driver('MySQLdb.cursors').SSCursor)
 
     def close(self):
         if self.cursor:
             self.cursor.close()
         if self.conn:
             self.conn.close()
+        self.statements = None
 
 class MVOHandler(DatabaseHandler):
+    CACHEABLE = True
+    SQL_QUERIES = False
+    ROW_WATERMARK = 'record_count'
+
     def __init__(self, db_path: str):
         super().__init__(db_path=db_path)
         self.mvo_conn = None
 
     def _establish_connection(self):
+        mvo_db = load_driver('mvo_db')
         try:
-            self.mvo_conn = MVOConnection(self.db_path)
-        except MVOError as e:
+            self.mvo_conn = mvo_db.MVOConnection(self.db_path)
+        except mvo_db.MVOError as e:
             raise ValueError(f"MVO Connection Error: {e}")
 
+    def _tables(self) -> Dict[str, Any]:
+        # Files written by create_sample_mvo.py nest tables under a 'tables' key
+        data = self.mvo_conn.data
+        if isinstance(data.get('tables'), dict):
+            return data['tables']
+        return data
+
+    def _records(self, table_name: str) -> List[Dict[str, Any]]:
+        """Return a table's records as dictionaries, whichever MVO layout is used."""
+        table = self._tables().get(table_name)
+        if table is None:
+            raise ValueError(f"Table {table_name} not found")
+        if isinstance(table, list):
+            return table
+        if 'records' in table:
+            return table['records']
+        columns = table.get('columns', [])
+        return [row if isinstance(row, dict) else dict(zip(columns, row))
+                for row in table.get('rows', [])]
+
     def get_tables(self) -> List[str]:
-        return self.mvo_conn.get_tables()
+        return list(self._tables().keys())
 
-    def execute_query(self, query: str = None, params: tuple = None) -> List[Dict[str, Any]]:
+    def get_columns(self, table_name: str) -> List[str]:
+        table = self._tables().get(table_name)
+        if isinstance(table, dict) and 'columns' in table:
+            return list(table['columns'])
+        records = self._records(table_name)
+        return list(records[0].keys()) if records else []
+
+    @enforce_limits
+    @serve_from_cache('query')
+    def execute_query(self, query: str = None, params: tuple = None) -> ResultSet:
         tables = self.get_tables()
         if not tables:
-            return []
+            return ResultSet(())
         
-        # If no specific query, return first table's data
-        table_name = tables[0]
-        return [dict(record) for record in self.mvo_conn.data[table_name]]
+        # Use the table named in the query, or the first table if there is none
+        table_name = table_from_query(query)
+        if table_name not in tables:
+            table_name = tables[0]
+        with span('convert', table=table_name):
+            return ResultSet.from_dicts(self._records(table_name))
 
-    def export_to_csv(self, table_name: str, output_path: str):
-        if table_name not in self.mvo_conn.data:
-            raise ValueError(f"Table {table_name} not found")
-        
-        data = self.mvo_conn.data[table_name]
-        if not data:
-            return
-        
-        headers = list(data[0].keys())
-        
-        with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(headers)
-            for record in data:
-                writer.writerow([record.get(header, '') for header in headers])
+    @serve_from_cache('query')
+    def iter_batches(self, query: str, params: tuple = None,
+                     batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE) -> Iterator[ResultSet]:
+        # MVO only supports reading whole tables
+        return self.iter_table(table_from_query(query), batch_size)
+
+    @serve_from_cache()
+    def iter_table(self, table_name: str, batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE,
+                   columns: Sequence[str] = None,
+                   filters: Sequence[Tuple[str, str, Any]] = None,
+                   order_by: Sequence[Any] = None) -> Iterator[ResultSet]:
+        if order_by:
+            return self._external_sort(self._scan_table, table_name, batch_size, columns,
+                                       filters, order_by)
+        return self._scan_table(table_name, batch_size, columns, filters)
+
+    def _scan_table(self, table_name: str, batch_size: int, columns: Sequence[str] = None,
+                    filters: Sequence[Tuple[str, str, Any]] = None) -> Iterator[ResultSet]:
+        records = self._records(table_name)
+        for offset in range(0, len(records), batch_size):
+            batch = ResultSet.from_dicts(records[offset:offset + batch_size])
+            if columns or filters:
+                batch = filter_rows(batch, columns, filters)
+            if batch:
+                yield batch
+
+    @serve_from_cache()
+    def count_rows(self, table_name: str, filters: Sequence[Tuple[str, str, Any]] = None) -> int:
+        if filters:
+            return sum(len(batch) for batch in self.iter_table(table_name, filters=filters))
+        return len(self._records(table_name))
+
+    def sample_table(self, table_name: str, size: int = None, columns: Sequence[str] = None,
+                     seed: int = None) -> ResultSet:
+        from sampling import check_sample_size, sample_indexes
+        records = self._records(table_name)
+        picks = sample_indexes(len(records), check_sample_size(size), random.Random(seed))
+        with span('sample', table=table_name, method='record offsets', rows=len(picks)):
+            return filter_rows(ResultSet.from_dicts([records[index] for index in picks]), columns)
+
+    def row_position(self, table_name: str) -> int:
+        return len(self._records(table_name))
+
+    def estimate_row_count(self, table_name: str) -> Optional[int]:
+        # The file is already parsed into memory
+        return len(self._records(table_name))
+
+    def iter_rows_after(self, table_name: str, start: Optional[int], end: int,
+                        batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE) -> Iterator[ResultSet]:
+        records = self._records(table_name)
+        for offset in range(start or 0, min(end, len(records)), batch_size):
+            yield ResultSet.from_dicts(records[offset:min(offset + batch_size, end)])
 
     def close(self):
+        if self.cache:
+            self.cache.close()
         if self.mvo_conn:
             self.mvo_conn.close()
 
 class AccessHandler(DatabaseHandler):
+    CACHEABLE = True
+    COLUMN_TYPES = {
+        'integer': 'LONG', 'bigint': 'DECIMAL(19,0)', 'float': 'DOUBLE',
+        'decimal': ('DECIMAL({args})', 'DOUBLE'), 'text': 'MEMO',
+        'varchar': ('VARCHAR({args})', 'MEMO'), 'boolean': 'BIT', 'date': 'DATETIME',
+        'datetime': 'DATETIME', 'time': 'DATETIME', 'blob': 'LONGBINARY',
+    }
+
     def __init__(self, db_path: str):
         super().__init__(db_path=db_path)
         self.conn = None
         self.cursor = None
 
     def _establish_connection(self):
+        pyodbc = load_driver('pyodbc')
         try:
             conn_str = f'DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={self.db_path}'
             self.conn = pyodbc.connect(conn_str)
@@ -200,45 +1525,112 @@ class AccessHandler(DatabaseHandler):
             tables.append(table_info.table_name)
         return tables
 
-    def execute_query(self, query: str = None, params: tuple = None) -> List[Dict[str, Any]]:
+    @enforce_limits
+    @serve_from_cache('query')
+    def execute_query(self, query: str = None, params: tuple = None) -> ResultSet:
         if not query:
             # If no query provided, fetch first table
             tables = self.get_tables()
             if not tables:
-                return []
+                return ResultSet(())
             query = f'SELECT * FROM [{tables[0]}]'
         
-        if params:
-            self.cursor.execute(query, params)
-        else:
-            self.cursor.execute(query)
+        with span('execute', query=query):
+            if params:
+                self.cursor.execute(query, params)
+            else:
+                self.cursor.execute(query)
         
-        columns = [column[0] for column in self.cursor.description]
-        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+        with span('fetch'):
+            rows = self.cursor.fetchall()
+        with span('convert', rows=len(rows)):
+            return ResultSet.from_cursor(self.cursor, rows)
 
-    def export_to_csv(self, table_name: str, output_path: str):
-        query = f'SELECT * FROM [{table_name}]'
-        self.cursor.execute(query)
-        
-        columns = [column[0] for column in self.cursor.description]
-        
-        with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(columns)
-            writer.writerows(self.cursor.fetchall())
+    def quote_identifier(self, name: str) -> str:
+        return '[' + name.replace(']', ']]') + ']'
+
+    @contextlib.contextmanager
+    def _statement_timeout(self, seconds: Optional[float]):
+        if not seconds:
+            yield
+            return
+        # ODBC query timeout (whole seconds) for cursors created while it is set
+        previous = self.conn.timeout
+        self.conn.timeout = max(1, round(seconds))
+        try:
+            yield
+        finally:
+            self.conn.timeout = previous
+
+    def _is_cancellation(self, error: Exception) -> bool:
+        # SQLSTATE HYT00: timeout expired
+        pyodbc = load_driver('pyodbc')
+        return isinstance(error, pyodbc.OperationalError) and bool(error.args) and error.args[0] == 'HYT00'
+
+    def get_column_types(self, table_name: str) -> List[Tuple[str, str]]:
+        types = []
+        for column in self.cursor.columns(table=table_name):
+            type_name = column.type_name.upper()
+            if type_name in ('VARCHAR', 'CHAR'):
+                type_name = f'{type_name}({column.column_size})'
+            elif type_name in ('DECIMAL', 'NUMERIC'):
+                type_name = f'{type_name}({column.column_size},{column.decimal_digits or 0})'
+            types.append((column.column_name, type_name))
+        return types
+
+    def get_primary_key(self, table_name: str) -> List[str]:
+        try:
+            keys = list(self.cursor.primaryKeys(table=table_name))
+        except Exception:
+            # Not every Access ODBC driver implements SQLPrimaryKeys
+            return []
+        return [key.column_name for key in sorted(keys, key=lambda key: key.key_seq)]
+
+    def native_type(self, generic: str) -> str:
+        native = super().native_type(generic)
+        # TEXT columns hold at most 255 characters
+        match = re.fullmatch(r'VARCHAR\((\d+)\)', native)
+        if match and int(match.group(1)) > 255:
+            return self.COLUMN_TYPES['text']
+        return native
+
+    def _insert_cursor(self):
+        cursor = self.conn.cursor()
+        # Send the parameters of executemany() as one array instead of one round trip per row
+        cursor.fast_executemany = True
+        return cursor
+
+    def replace_table(self, load_table: str, table_name: str) -> None:
+        # Access SQL cannot rename a table, so the loaded rows are copied under the old name
+        self._execute_ddl([f'DROP TABLE {self.quote_identifier(table_name)}',
+                           f'SELECT * INTO {self.quote_identifier(table_name)} '
+                           f'FROM {self.quote_identifier(load_table)}',
+                           f'DROP TABLE {self.quote_identifier(load_table)}'])
 
     def close(self):
+        if self.cache:
+            self.cache.close()
         if self.cursor:
             self.cursor.close()
         if self.conn:
             self.conn.close()
 
 class DBaseHandler(DatabaseHandler):
+    CACHEABLE = True
+    SQL_QUERIES = False
+    ROW_WATERMARK = 'record_count'
+    # dBase field type code -> generic column type (C and N depend on the field size)
+    FIELD_TYPES = {
+        'F': 'float', 'B': 'float', 'Y': 'decimal(19,4)', 'I': 'integer', 'L': 'boolean',
+        'D': 'date', 'T': 'datetime', '@': 'datetime', 'M': 'text', 'G': 'blob', 'P': 'blob',
+    }
+
     def __init__(self, db_path: str):
         super().__init__(db_path=db_path)
         self.table = None
 
     def connect(self):
+        dbf = load_driver('dbf')
         try:
             self.table = dbf.Table(self.db_path)
             self.table.open()
@@ -249,46 +1641,145 @@ class DBaseHandler(DatabaseHandler):
         # For dBase, we return the single table name
         return [os.path.splitext(os.path.basename(self.db_path))[0]]
 
-    def execute_query(self, query: str = None, params: tuple = None) -> List[Dict[str, Any]]:
+    def get_columns(self, table_name: str) -> List[str]:
         if not self.table:
             raise ValueError("Database not connected")
-        
-        # Convert dBase records to dictionaries
-        return [dict(record) for record in self.table]
+        return list(self.table.field_names)
 
-    def export_to_csv(self, table_name: str, output_path: str):
+    def get_column_types(self, table_name: str) -> List[Tuple[str, str]]:
+        if not self.table:
+            raise ValueError("Database not connected")
+        types = []
+        for field in self.table.field_names:
+            field_type, length, decimals, _ = self.table.field_info(field)
+            code = chr(field_type)
+            if code == 'C':
+                column_type = f'varchar({length})'
+            elif code == 'N':
+                if decimals:
+                    column_type = f'decimal({length},{decimals})'
+                else:
+                    column_type = 'integer' if length < 10 else 'bigint'
+            else:
+                column_type = self.FIELD_TYPES.get(code, 'text')
+            types.append((field, column_type))
+        return types
+
+    @enforce_limits
+    @serve_from_cache('query')
+    def execute_query(self, query: str = None, params: tuple = None) -> ResultSet:
         if not self.table:
             raise ValueError("Database not connected")
         
-        with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Write headers
-            headers = self.table.field_names
-            writer.writerow(headers)
-            
-            # Write data
-            for record in self.table:
-                writer.writerow([getattr(record, field) for field in headers])
+        fields = self.table.field_names
+        with span('convert'):
+            return ResultSet(fields, [tuple(getattr(record, field) for field in fields) for record in self.table])
+
+    @serve_from_cache('query')
+    def iter_batches(self, query: str, params: tuple = None,
+                     batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE) -> Iterator[ResultSet]:
+        # A dBase file holds a single table, so every query reads it
+        return self.iter_table(self.get_tables()[0], batch_size)
+
+    @serve_from_cache()
+    def iter_table(self, table_name: str, batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE,
+                   columns: Sequence[str] = None,
+                   filters: Sequence[Tuple[str, str, Any]] = None,
+                   order_by: Sequence[Any] = None) -> Iterator[ResultSet]:
+        if order_by:
+            return self._external_sort(self._scan_table, table_name, batch_size, columns,
+                                       filters, order_by)
+        return self._scan_table(table_name, batch_size, columns, filters)
+
+    def _scan_table(self, table_name: str, batch_size: int, columns: Sequence[str] = None,
+                    filters: Sequence[Tuple[str, str, Any]] = None) -> Iterator[ResultSet]:
+        if not self.table:
+            raise ValueError("Database not connected")
+        fields = self.table.field_names
+        batch = ResultSet(fields)
+        for record in self.table:
+            batch.rows.append(tuple(getattr(record, field) for field in fields))
+            if len(batch) >= batch_size:
+                batch = filter_rows(batch, columns, filters)
+                if batch:
+                    yield batch
+                batch = ResultSet(fields)
+        batch = filter_rows(batch, columns, filters)
+        if batch:
+            yield batch
+
+    @serve_from_cache()
+    def count_rows(self, table_name: str, filters: Sequence[Tuple[str, str, Any]] = None) -> int:
+        if filters:
+            return sum(len(batch) for batch in self.iter_table(table_name, filters=filters))
+        return len(self.table)
+
+    def sample_table(self, table_name: str, size: int = None, columns: Sequence[str] = None,
+                     seed: int = None) -> ResultSet:
+        from sampling import check_sample_size, sample_indexes
+        if not self.table:
+            raise ValueError("Database not connected")
+        # Records are fixed-size, so each sampled record number is one seek
+        fields = self.table.field_names
+        picks = sample_indexes(len(self.table), check_sample_size(size), random.Random(seed))
+        with span('sample', table=table_name, method='record offsets', rows=len(picks)):
+            rows = ResultSet(fields, [tuple(getattr(self.table[index], field) for field in fields)
+                                      for index in picks])
+            return filter_rows(rows, columns)
+
+    def row_position(self, table_name: str) -> int:
+        if not self.table:
+            raise ValueError("Database not connected")
+        return len(self.table)
+
+    def estimate_row_count(self, table_name: str) -> Optional[int]:
+        # The record count is stored in the file header
+        return self.row_position(table_name)
+
+    def iter_rows_after(self, table_name: str, start: Optional[int], end: int,
+                        batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE) -> Iterator[ResultSet]:
+        if not self.table:
+            raise ValueError("Database not connected")
+        # Records are fixed-size, so reading from a record number seeks straight to it
+        fields = self.table.field_names
+        end = min(end, len(self.table))
+        for offset in range(start or 0, end, batch_size):
+            records = (self.table[index] for index in range(offset, min(offset + batch_size, end)))
+            yield ResultSet(fields, [tuple(getattr(record, field) for field in fields) for record in records])
 
     def close(self):
+        if self.cache:
+            self.cache.close()
         if self.table:
             self.table.close()
 
 class PostgreSQLHandler(DatabaseHandler):
+    PARAM_PLACEHOLDER = '%s'
+    LIMIT_CLAUSE = True
+    ROW_CHECKSUM = 'postgresql_md5'
+    # psycopg2 opens a transaction before the first statement, DDL included
+    TRANSACTIONAL_DDL = True
+    COLUMN_TYPES = {
+        'integer': 'INTEGER', 'bigint': 'BIGINT', 'float': 'DOUBLE PRECISION',
+        'decimal': ('NUMERIC({args})', 'NUMERIC'), 'text': 'TEXT',
+        'varchar': ('VARCHAR({args})', 'TEXT'), 'boolean': 'BOOLEAN', 'date': 'DATE',
+        'datetime': 'TIMESTAMP', 'time': 'TIME', 'blob': 'BYTEA',
+    }
+
     def __init__(self, connection_params: Dict[str, Any]):
         super().__init__(connection_params=connection_params)
-        import psycopg2
-        import psycopg2.extras
 
     def connect(self):
+        psycopg2 = load_driver('psycopg2')
         self.conn = psycopg2.connect(
             host=self.connection_params.get('host', 'localhost'),
             user=self.connection_params.get('user', ''),
             password=self.connection_params.get('password', ''),
             database=self.connection_params.get('database', '')
         )
-        self.cursor = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        # Plain tuple rows become ResultSet rows without building a dictionary per row
+        self.cursor = self.conn.cursor()
+        self.statements = self._new_statement_cache(self._prepare_statement, self._deallocate_statement)
 
     def get_tables(self) -> List[str]:
         self.cursor.execute("""
@@ -298,23 +1789,295 @@ class PostgreSQLHandler(DatabaseHandler):
         """)
         return [table[0] for table in self.cursor.fetchall()]
 
-    def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
-        if params:
-            self.cursor.execute(query, params)
-        else:
-            self.cursor.execute(query)
+    @enforce_limits
+    def execute_query(self, query: str, params: tuple = None) -> ResultSet:
+        with span('execute', query=query):
+            self._execute(self.cursor, query, params)
         
-        return [dict(row) for row in self.cursor.fetchall()]
+        with span('fetch'):
+            rows = self.cursor.fetchall()
+        with span('convert', rows=len(rows)):
+            return ResultSet.from_cursor(self.cursor, rows)
 
-    def export_to_csv(self, table_name: str, output_path: str):
-        query = f"SELECT * FROM {table_name}"
-        self.cursor.execute(query)
-        headers = [desc.name for desc in self.cursor.description]
-        
-        with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(headers)
-            writer.writerows(self.cursor.fetchall())
+    def search_rows(self, table_name: str, text: str, columns: Sequence[str] = None,
+                    limit: int = None) -> Optional[ResultSet]:
+        # Matches on the fly; a GIN index on the same expression makes this an index scan:
+        # CREATE INDEX ON t USING gin (to_tsvector('simple', concat_ws(' ', col1::text, ...)))
+        from search import search_terms
+        terms = search_terms(text)
+        if not terms:
+            return None
+        columns = columns or self.get_columns(table_name)
+        document = ', '.join(f'{self.quote_identifier(c)}::text' for c in columns)
+        tsquery = ' & '.join(word + (':*' if prefix else '') for word, prefix in terms)
+        query = (f'SELECT * FROM {self.quote_identifier(table_name)} '
+                 f"WHERE to_tsvector('simple', concat_ws(' ', {document})) @@ to_tsquery('simple', %s)")
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        return self.execute_query(query, (tsquery,))
+
+    @contextlib.contextmanager
+    def _statement_timeout(self, seconds: Optional[float]):
+        if not seconds:
+            yield
+            return
+        extensions = load_driver('psycopg2.extensions')
+        cursor = self.conn.cursor()
+        # statement_timeout applies to each statement, including each FETCH of a named cursor;
+        # the timer cancels the backend once the query as a whole runs over
+        cursor.execute('SET statement_timeout = %s', (int(seconds * 1000),))
+        timer = threading.Timer(seconds + CANCEL_GRACE_SECONDS, self.conn.cancel)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield
+        finally:
+            timer.cancel()
+            if self.conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR:
+                self.conn.rollback()
+            cursor.execute('SET statement_timeout = DEFAULT')
+            cursor.close()
+
+    def _is_cancellation(self, error: Exception) -> bool:
+        return isinstance(error, load_driver('psycopg2.extensions').QueryCanceledError)
+
+    def set_read_only(self) -> None:
+        # Every later transaction of the connection is READ ONLY
+        self.conn.set_session(readonly=True)
+
+    # Prepared statements outlive transactions (a ROLLBACK does not drop them) until DEALLOCATE
+
+    def _prepare_statement(self, name: str, query: str) -> None:
+        # Parameter types are inferred from the query when it is prepared. A failed PREPARE
+        # would abort the caller's transaction, so it runs inside a savepoint
+        prepare = f'PREPARE {name} AS {convert_placeholders(query, lambda n: f"${n}")}'
+        with self.conn.cursor() as cursor:
+            if self.conn.autocommit:
+                cursor.execute(prepare)
+                return
+            cursor.execute('SAVEPOINT dbbrowser_prepare')
+            try:
+                cursor.execute(prepare)
+            except Exception:
+                cursor.execute('ROLLBACK TO SAVEPOINT dbbrowser_prepare')
+                raise
+            finally:
+                cursor.execute('RELEASE SAVEPOINT dbbrowser_prepare')
+
+    def _deallocate_statement(self, name: str) -> None:
+        with self.conn.cursor() as cursor:
+            cursor.execute(f'DEALLOCATE {name}')
+
+    def _execute_statement(self, cursor, name: str, query: str, params: tuple) -> None:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+
+    def _run_batch(self, cursor, statements: List[Tuple[str, Optional[tuple]]],
+                   results: List[StatementResult], page_size: int) -> None:
+        # psycopg2 has no pipeline mode; like psycopg2.extras.execute_batch(), statements are
+        # interpolated client-side and sent as one multi-statement query per page. Only the
+        # last statement of such a query reports a row count, so packed statements report None
+        codec = load_driver('psycopg2.extensions').encodings[self.conn.encoding]
+        pending: List[Tuple[str, Optional[tuple]]] = []
+
+        def flush() -> None:
+            if not pending:
+                return
+            sql = ';\n'.join(cursor.mogrify(query, params).decode(codec) if params else query
+                              for query, params in pending)
+            with span('execute_page', statements=len(pending)):
+                cursor.execute(sql)
+            rowcount = cursor.rowcount if len(pending) == 1 else None
+            results.extend(StatementResult(query, params, rowcount=rowcount) for query, params in pending)
+            pending.clear()
+
+        for query, params in statements:
+            if returns_rows(query):
+                flush()
+                with span('execute', query=query):
+                    self._execute(cursor, query, params)
+                results.append(self._statement_result(cursor, query, params))
+            else:
+                pending.append((query, params))
+                if len(pending) >= page_size:
+                    flush()
+        flush()
+
+    def _streaming_cursor(self):
+        # Named cursors are server-side: rows are transferred as they are fetched
+        self._stream_counter = getattr(self, '_stream_counter', 0) + 1
+        return self.conn.cursor(name=f'dbbrowser_stream_{self._stream_counter}')
+
+    def export_to_csv(self, table_name: str, output_path: str, compression: str = 'auto',
+                      batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE, resumable: bool = False) -> int:
+        if resumable:
+            # A COPY cannot be resumed part-way; resumable exports read keyset batches instead
+            from resumable_export import export_resumable
+            return export_resumable(self, table_name, output_path, compression=compression,
+                                    batch_size=batch_size)['rows']
+        # COPY streams CSV from the server straight into the (compressing) writer
+        from compression import open_export_file
+        query = f'COPY (SELECT * FROM {self.quote_identifier(table_name)}) TO STDOUT WITH CSV HEADER'
+        with open_export_file(output_path, compression) as csvfile, span('copy', query=query):
+            self.cursor.copy_expert(query, csvfile)
+        return max(self.cursor.rowcount, 0)
+
+    def get_column_types(self, table_name: str) -> List[Tuple[str, str]]:
+        # format_type() includes the length/precision, e.g. 'character varying(40)'
+        self.cursor.execute("""
+            SELECT attname, format_type(atttypid, atttypmod)
+            FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+        """, (self.quote_identifier(table_name),))
+        return [(row[0], row[1]) for row in self.cursor.fetchall()]
+
+    def get_primary_key(self, table_name: str) -> List[str]:
+        self.cursor.execute("""
+            SELECT a.attname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass AND i.indisprimary
+            ORDER BY array_position(i.indkey::int2[], a.attnum)
+        """, (self.quote_identifier(table_name),))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def get_indexes(self, table_name: str) -> Dict[str, List[str]]:
+        # Expression columns (attnum 0) have no pg_attribute row and are left out
+        self.cursor.execute("""
+            SELECT c.relname, a.attname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            CROSS JOIN LATERAL unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, position)
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+            WHERE i.indrelid = %s::regclass
+            ORDER BY c.relname, k.position
+        """, (self.quote_identifier(table_name),))
+        indexes: Dict[str, List[str]] = {}
+        for index, column in self.cursor.fetchall():
+            indexes.setdefault(index, []).append(column)
+        return indexes
+
+    def _explain(self, query: str, params: Optional[tuple], analyze: bool):
+        from query_plan import parse_postgres_plan
+        options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+        cursor = self.conn.cursor()
+        try:
+            if not analyze:
+                cursor.execute(f'EXPLAIN ({options}) {query}', params)
+                return parse_postgres_plan(cursor.fetchone()[0])
+            # EXPLAIN ANALYZE runs the query; anything it changed (data-modifying CTEs) is undone
+            # by rolling back to a savepoint, which keeps the caller's uncommitted writes
+            cursor.execute('BEGIN' if self.conn.autocommit else 'SAVEPOINT dbbrowser_explain')
+            try:
+                cursor.execute(f'EXPLAIN ({options}) {query}', params)
+                document = cursor.fetchone()[0]
+            finally:
+                if self.conn.autocommit:
+                    cursor.execute('ROLLBACK')
+                else:
+                    cursor.execute('ROLLBACK TO SAVEPOINT dbbrowser_explain')
+                    cursor.execute('RELEASE SAVEPOINT dbbrowser_explain')
+        finally:
+            cursor.close()
+        return parse_postgres_plan(document)
+
+    def estimate_row_count(self, table_name: str) -> Optional[int]:
+        # reltuples is maintained by VACUUM and ANALYZE; -1 means the table was never analyzed
+        rows = self.execute_query('SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = to_regclass(%s)',
+                                  (self.quote_identifier(table_name),))
+        if not rows or rows[0]['estimate'] is None or rows[0]['estimate'] < 0:
+            return None
+        return rows[0]['estimate']
+
+    def sample_table(self, table_name: str, size: int = None, columns: Sequence[str] = None,
+                     seed: int = None) -> ResultSet:
+        # SYSTEM reads whole random pages (fast, but rows of a page come together); BERNOULLI
+        # picks rows independently but visits every page, so it is kept for smaller tables
+        from sampling import BLOCK_SAMPLE_MIN_ROWS, check_sample_size
+        size = check_sample_size(size)
+        estimate = self.estimate_row_count(table_name)
+        method = 'BERNOULLI' if estimate is not None and estimate < BLOCK_SAMPLE_MIN_ROWS else 'SYSTEM'
+        query, _ = self.build_select(table_name, columns)
+        repeatable = '' if seed is None else f' REPEATABLE ({int(seed)})'
+
+        def build(percent: float):
+            return f'{query} TABLESAMPLE {method} (%s){repeatable}', (percent,)
+
+        with span('sample', table=table_name, method=method):
+            return self._sample_by_percent(build, size, estimate, seed)
+
+    def checksum_rows(self, table_name: str, columns: Sequence[str],
+                      filters: Sequence[Tuple[str, str, Any]] = None) -> Tuple[int, int]:
+        # The first 60 bits of the md5 of each row's text form, summed
+        row_hash = "('x' || substr(md5(diff_rows::text), 1, 15))::bit(60)::bigint"
+        with span('checksum', table=table_name, method='md5'):
+            return self._checksum_query(table_name, columns, filters, f'COALESCE(SUM({row_hash}), 0)')
+
+    def bulk_insert(self, table_name: str, columns: Sequence[str],
+                    rows: Sequence[Sequence[Any]]) -> int:
+        # COPY FROM STDIN in text format: one tab-separated line per row, \N for NULL
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_text(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        column_list = ', '.join(self.quote_identifier(c) for c in columns)
+        query = f'COPY {self.quote_identifier(table_name)} ({column_list}) FROM STDIN'
+        cursor = self.conn.cursor()
+        try:
+            with span('copy', query=query, rows=len(rows)):
+                cursor.copy_expert(query, buffer)
+        finally:
+            cursor.close()
+        return len(rows)
+
+# Characters escaped in COPY text format
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def _copy_text(value: Any) -> str:
+    """Format a value for PostgreSQL's COPY text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea hex input; the backslash itself is escaped in COPY text
+        return '\\\\x' + bytes(value).hex()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+# Handler registry: file extension or network type -> handler class.
+# Handler classes import their driver lazily in connect(), so registering
+# a handler costs nothing until a database of that type is opened.
+FILE_HANDLERS: Dict[str, Type[DatabaseHandler]] = {}
+NETWORK_HANDLERS: Dict[str, Type[DatabaseHandler]] = {}
+
+def register_handler(handler_class: Type[DatabaseHandler], extensions=(), db_type: str = None):
+    """
+    Register a handler class for file extensions and/or a network database type.
+
+    :param handler_class: DatabaseHandler subclass
+    :param extensions: File extensions handled, including the dot (e.g. '.db')
+    :param db_type: Value of connection_params['type'] handled (e.g. 'mysql')
+    """
+    for extension in extensions:
+        FILE_HANDLERS[extension.lower()] = handler_class
+    if db_type:
+        NETWORK_HANDLERS[db_type.lower()] = handler_class
+
+register_handler(SQLiteHandler, extensions=('.db',))
+register_handler(DBaseHandler, extensions=('.dbf', '.db3'))
+register_handler(AccessHandler, extensions=('.mdb', '.accdb'))
+register_handler(MVOHandler, extensions=('.mvo',))
+register_handler(MySQLHandler, db_type='mysql')
+register_handler(PostgreSQLHandler, db_type='postgresql')
+
+def __getattr__(name):
+    # Backwards compatibility: MVOError used to be imported at module level
+    if name == 'MVOError':
+        return load_driver('mvo_db').MVOError
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_database_handler(db_path: str = None, connection_params: Dict[str, Any] = None) -> Optional[DatabaseHandler]:
     """
@@ -329,28 +2092,19 @@ def get_database_handler(db_path: str = None, connection_params: Dict[str, Any]
     try:
         if db_path:
             # File-based databases
-            if db_path.endswith('.db'):
-                logger.info(f"Creating SQLite handler for {db_path}")
-                return SQLiteHandler(db_path)
-            elif db_path.endswith(('.dbf', '.db3')):
-                logger.info(f"Creating dBase handler for {db_path}")
-                return DBaseHandler(db_path)
-            elif db_path.endswith(('.mdb', '.accdb')):
-                logger.info(f"Creating Access handler for {db_path}")
-                return AccessHandler(db_path)
-            elif db_path.endswith('.mvo'):
-                logger.info(f"Creating MVO handler for {db_path}")
-                return MVOHandler(db_path)
+            extension = os.path.splitext(db_path)[1].lower()
+            handler_class = FILE_HANDLERS.get(extension)
+            if handler_class:
+                logger.info(f"Creating {handler_class.__name__} for {db_path}")
+                return handler_class(db_path)
         
         # Network databases
         if connection_params:
             db_type = connection_params.get('type', '').lower()
-            if db_type == 'mysql':
-                logger.info(f"Creating MySQL handler for {connection_params.get('database', 'unknown')}")
-                return MySQLHandler(connection_params)
-            elif db_type == 'postgresql':
-                logger.info(f"Creating PostgreSQL handler for {connection_params.get('database', 'unknown')}")
-                return PostgreSQLHandler(connection_params)
+            handler_class = NETWORK_HANDLERS.get(db_type)
+            if handler_class:
+                logger.info(f"Creating {handler_class.__name__} for {connection_params.get('database', 'unknown')}")
+                return handler_class(connection_params)
         
         logger.error("No suitable database handler found")
         raise ValueError("Unsupported database type or insufficient connection information")
@@ -0,0 +1,396 @@
+"""
+Federated queries across several open database handlers.
+
+Tables from different handlers (e.g. a dBase extract and a PostgreSQL table)
+are joined client-side with a streaming hash join: the smaller input is built
+into a hash table and the larger one is streamed past it. When the build side
+exceeds the memory budget both inputs are hash-partitioned to temporary files
+(Grace hash join) and joined one partition at a time. Filters and projections
+are pushed down to each source handler, so only the needed rows and columns
+are transferred.
+
+Example:
+    engine = FederatedEngine()
+    engine.register('hr', get_database_handler(db_path='staff.dbf'))
+    engine.register('erp', get_database_handler(connection_params=pg_params))
+    for row in engine.query(
+            "SELECT s.name, d.title FROM hr.staff s "
+            "JOIN erp.departments d ON s.dept_id = d.id WHERE d.active = 1"):
+        print(row)
+"""
+
+import logging
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from database_handlers import DatabaseHandler, FILTER_OPERATORS
+from tracing import span
+
+# Default memory budget for the in-memory build side of a hash join
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+# Number of partitions used once a join spills to disk
+DEFAULT_PARTITIONS = 32
+
+logger = logging.getLogger('FederatedEngine')
+
+class TableRef:
+    """A table on a registered source, with pushed-down columns and filters"""
+
+    def __init__(self, source: str, table: str, alias: str = None,
+                 columns: Sequence[str] = None, filters: Sequence[Tuple[str, str, Any]] = None):
+        self.source = source
+        self.table = table
+        self.alias = alias or table
+        self.columns = list(columns) if columns else None
+        self.filters = list(filters) if filters else []
+
+    def __repr__(self):
+        return f'TableRef({self.source}.{self.table} AS {self.alias})'
+
+# A join input: a table on a source, or an iterable of already-qualified row dictionaries
+Relation = Union[TableRef, Iterable[Dict[str, Any]]]
+
+def _estimate_row_size(row: Dict[str, Any]) -> int:
+    return sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row.values())
+
+class _SpillFile:
+    """Append-only pickle stream of rows for one partition"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.count = 0
+
+    def write(self, row) -> None:
+        pickle.dump(row, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.count += 1
+
+    def read(self) -> Iterator[Any]:
+        self.file.close()
+        with open(self.path, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+
+class FederatedEngine:
+    """Joins tables from multiple DatabaseHandler instances"""
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 partitions: int = DEFAULT_PARTITIONS, spill_dir: str = None,
+                 batch_size: int = DatabaseHandler.DEFAULT_BATCH_SIZE):
+        """
+        :param memory_budget: Approximate bytes the build side may hold before spilling
+        :param partitions: Number of hash partitions written when spilling
+        :param spill_dir: Directory for temporary partition files (system temp dir by default)
+        :param batch_size: Rows fetched per batch from each source
+        """
+        self.sources: Dict[str, DatabaseHandler] = {}
+        self.memory_budget = memory_budget
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.spilled_joins = 0
+
+    def register(self, name: str, handler: DatabaseHandler) -> None:
+        """Register a connected handler under a source name used in queries."""
+        self.sources[name] = handler
+
+    def _handler(self, source: str) -> DatabaseHandler:
+        try:
+            return self.sources[source]
+        except KeyError:
+            raise ValueError(f"Unknown federated source: {source}")
+
+    def scan(self, ref: TableRef) -> Iterator[Dict[str, Any]]:
+        """Stream a table's rows with keys qualified as 'alias.column'."""
+        handler = self._handler(ref.source)
+        prefix = ref.alias + '.'
+        with span('federated_scan', source=ref.source, table=ref.table):
+            for batch in handler.iter_table(ref.table, self.batch_size,
+                                            columns=ref.columns, filters=ref.filters):
+                for row in batch:
+                    yield {prefix + column: value for column, value in row.items()}
+
+    def estimate_rows(self, relation: Relation) -> Optional[int]:
+        """
+        Approximate row count of a table reference from statistics, or None if there are none.
+
+        Filters are not taken into account: counting matching rows would cost a scan.
+        """
+        if not isinstance(relation, TableRef):
+            return None
+        try:
+            return self._handler(relation.source).estimate_row_count(relation.table)
+        except Exception as e:
+            logger.warning(f"Could not estimate size of {relation}: {e}")
+            return None
+
+    def _rows(self, relation: Relation) -> Iterable[Dict[str, Any]]:
+        return self.scan(relation) if isinstance(relation, TableRef) else relation
+
+    def join(self, left: Relation, right: Relation, on: Sequence[Tuple[str, str]],
+             how: str = 'inner') -> Iterator[Dict[str, Any]]:
+        """
+        Hash-join two relations.
+
+        :param left: Left input
+        :param right: Right input
+        :param on: (left_key, right_key) pairs of qualified column names, e.g. ('e.dept', 'd.id')
+        :param how: 'inner' or 'left'
+        :return: Iterator of merged row dictionaries
+        """
+        if how not in ('inner', 'left'):
+            raise ValueError(f"Unsupported join type: {how}")
+        left_keys = [pair[0] for pair in on]
+        right_keys = [pair[1] for pair in on]
+
+        # Build on the smaller side; a left join must probe with the left side
+        build_left = False
+        if how == 'inner':
+            left_size, right_size = self.estimate_rows(left), self.estimate_rows(right)
+            build_left = left_size is not None and (right_size is None or left_size < right_size)
+
+        if build_left:
+            build, build_keys, probe, probe_keys = left, left_keys, right, right_keys
+        else:
+            build, build_keys, probe, probe_keys = right, right_keys, left, left_keys
+        return self._hash_join(self._rows(build), build_keys, self._rows(probe), probe_keys,
+                               outer=(how == 'left'))
+
+    def _hash_join(self, build_rows, build_keys, probe_rows, probe_keys, outer):
+        table: Dict[tuple, List[Dict[str, Any]]] = {}
+        used = 0
+        build_columns: List[str] = []
+        build_iter = iter(build_rows)
+        with span('hash_join_build'):
+            for row in build_iter:
+                if not build_columns:
+                    build_columns = list(row.keys())
+                key = tuple(row.get(k) for k in build_keys)
+                if None in key:
+                    continue
+                table.setdefault(key, []).append(row)
+                used += _estimate_row_size(row)
+                if used > self.memory_budget:
+                    break
+            else:
+                build_iter = None
+
+        if build_iter is None:
+            yield from self._probe(table, build_columns, probe_rows, probe_keys, outer)
+            return
+
+        # Over budget: fall back to a partitioned (Grace) hash join on disk
+        self.spilled_joins += 1
+        logger.info(f"Hash join build side exceeded {self.memory_budget} bytes; spilling to disk")
+        spill_root = tempfile.mkdtemp(prefix='dbbrowser_join_', dir=self.spill_dir)
+        build_parts: List[_SpillFile] = []
+        probe_parts: List[_SpillFile] = []
+        try:
+            build_parts = [_SpillFile(os.path.join(spill_root, f'build_{i}.pkl'))
+                           for i in range(self.partitions)]
+            probe_parts = [_SpillFile(os.path.join(spill_root, f'probe_{i}.pkl'))
+                           for i in range(self.partitions)]
+            with span('hash_join_partition'):
+                for key, rows in table.items():
+                    part = build_parts[hash(key) % self.partitions]
+                    for row in rows:
+                        part.write((key, row))
+                table.clear()
+                for row in build_iter:
+                    key = tuple(row.get(k) for k in build_keys)
+                    if None not in key:
+                        build_parts[hash(key) % self.partitions].write((key, row))
+                for row in probe_rows:
+                    key = tuple(row.get(k) for k in probe_keys)
+                    # Unmatchable probe rows only matter for outer joins
+                    index = hash(key) % self.partitions if None not in key else 0
+                    probe_parts[index].write(row)
+
+            for build_part, probe_part in zip(build_parts, probe_parts):
+                partition: Dict[tuple, List[Dict[str, Any]]] = {}
+                with span('hash_join_load_partition', rows=build_part.count):
+                    for key, row in build_part.read():
+                        partition.setdefault(key, []).append(row)
+                yield from self._probe(partition, build_columns, probe_part.read(), probe_keys, outer)
+                probe_part.close()
+        finally:
+            for part in build_parts + probe_parts:
+                part.close()
+            shutil.rmtree(spill_root, ignore_errors=True)
+
+    @staticmethod
+    def _probe(table, build_columns, probe_rows, probe_keys, outer):
+        empty = dict.fromkeys(build_columns)
+        for row in probe_rows:
+            matches = table.get(tuple(row.get(k) for k in probe_keys))
+            if matches:
+                for match in matches:
+                    merged = dict(row)
+                    merged.update(match)
+                    yield merged
+            elif outer:
+                merged = dict(row)
+                merged.update(empty)
+                yield merged
+
+    def query(self, sql: str) -> Iterator[Dict[str, Any]]:
+        """
+        Run a federated SELECT.
+
+        Supported grammar::
+
+            SELECT * | alias.column [AS name], ...
+            FROM source.table [AS] alias
+            [[INNER | LEFT] JOIN source.table [AS] alias ON a.x = b.y [AND ...]] ...
+            [WHERE alias.column <op> literal [AND ...]]
+
+        WHERE conditions and referenced columns are pushed down to each source.
+        """
+        plan = parse_federated_query(sql)
+        refs = {ref.alias: ref for ref in plan['tables']}
+
+        # Push WHERE conditions down to the table they reference. Tables on the
+        # nullable side of a LEFT JOIN are filtered after the join instead, as
+        # pushing the condition down would turn it into part of the ON clause.
+        nullable = {plan['tables'][index].alias
+                    for index, (how, _) in enumerate(plan['joins'], start=1) if how == 'left'}
+        post_filters = []
+        for alias, column, op, value in plan['where']:
+            if alias in nullable:
+                post_filters.append((f'{alias}.{column}', FILTER_OPERATORS[op], value))
+            else:
+                refs[alias].filters.append((column, op, value))
+
+        # Push the projection down: selected columns, join keys and post-join filter columns
+        if plan['select'] is not None:
+            needed: Dict[str, set] = {alias: set() for alias in refs}
+            for alias, column, _ in plan['select']:
+                needed[alias].add(column)
+            for alias, column, op, _ in plan['where']:
+                if alias in nullable:
+                    needed[alias].add(column)
+            for _, conditions in plan['joins']:
+                for (a1, c1), (a2, c2) in conditions:
+                    needed[a1].add(c1)
+                    needed[a2].add(c2)
+            for alias, columns in needed.items():
+                refs[alias].columns = sorted(columns) if columns else None
+
+        relation: Relation = plan['tables'][0]
+        for index, (how, conditions) in enumerate(plan['joins'], start=1):
+            right = plan['tables'][index]
+            on = []
+            for (a1, c1), (a2, c2) in conditions:
+                # Orient each condition as (left side, right side)
+                if a1 == right.alias:
+                    (a1, c1), (a2, c2) = (a2, c2), (a1, c1)
+                if a2 != right.alias or a1 == right.alias:
+                    raise ValueError(f"Join condition {a1}.{c1} = {a2}.{c2} must link {right.alias} "
+                                     "to a table joined before it")
+                on.append((f'{a1}.{c1}', f'{a2}.{c2}'))
+            relation = self.join(relation, right, on, how=how)
+
+        rows = self._rows(relation)
+        if post_filters:
+            rows = (row for row in rows if all(
+                row.get(key) is not None and compare(row.get(key), value)
+                for key, compare, value in post_filters))
+        if plan['select'] is None:
+            yield from rows
+            return
+        output = [(f'{alias}.{column}', name) for alias, column, name in plan['select']]
+        for row in rows:
+            yield {name: row.get(key) for key, name in output}
+
+_IDENT = r'[A-Za-z_][\w$]*'
+_LITERAL = r"'(?:[^']|'')*'|-?\d+(?:\.\d+)?|NULL|TRUE|FALSE"
+_TABLE_RE = re.compile(rf'^({_IDENT})\.({_IDENT})(?:\s+(?:AS\s+)?({_IDENT}))?$', re.IGNORECASE)
+_COLUMN_RE = re.compile(rf'^({_IDENT})\.({_IDENT}|\*)(?:\s+AS\s+({_IDENT}))?$', re.IGNORECASE)
+_EQ_RE = re.compile(rf'^({_IDENT})\.({_IDENT})\s*=\s*({_IDENT})\.({_IDENT})$')
+_COND_RE = re.compile(rf'^({_IDENT})\.({_IDENT})\s*(<=|>=|!=|<>|=|<|>)\s*({_LITERAL})$', re.IGNORECASE)
+_JOIN_SPLIT = re.compile(r'\s+((?:INNER\s+|LEFT\s+(?:OUTER\s+)?)?JOIN)\s+', re.IGNORECASE)
+
+def _parse_literal(text: str) -> Any:
+    upper = text.upper()
+    if upper == 'NULL':
+        return None
+    if upper in ('TRUE', 'FALSE'):
+        return upper == 'TRUE'
+    if text.startswith("'"):
+        return text[1:-1].replace("''", "'")
+    return float(text) if '.' in text else int(text)
+
+def parse_federated_query(sql: str) -> Dict[str, Any]:
+    """Parse the restricted federated SELECT grammar into a plan dictionary."""
+    match = re.match(r'^\s*SELECT\s+(.+?)\s+FROM\s+(.+?)(?:\s+WHERE\s+(.+?))?\s*;?\s*$',
+                     sql, re.IGNORECASE | re.DOTALL)
+    if not match:
+        raise ValueError("Federated query must be of the form SELECT ... FROM ... [WHERE ...]")
+    select_text, from_text, where_text = match.groups()
+
+    parts = _JOIN_SPLIT.split(from_text.strip())
+    tables: List[TableRef] = []
+    joins: List[Tuple[str, list]] = []
+    for index in range(0, len(parts), 2):
+        text = parts[index].strip()
+        conditions = []
+        if index:
+            how = 'left' if parts[index - 1].upper().startswith('LEFT') else 'inner'
+            pieces = re.split(r'\s+ON\s+', text, maxsplit=1, flags=re.IGNORECASE)
+            if len(pieces) != 2:
+                raise ValueError(f"JOIN without ON clause: {parts[index]}")
+            text, on_text = pieces
+            for condition in re.split(r'\s+AND\s+', on_text.strip(), flags=re.IGNORECASE):
+                eq = _EQ_RE.match(condition.strip())
+                if not eq:
+                    raise ValueError(f"Join conditions must be alias.column = alias.column: {condition}")
+                conditions.append(((eq.group(1), eq.group(2)), (eq.group(3), eq.group(4))))
+            joins.append((how, conditions))
+        table = _TABLE_RE.match(text.strip())
+        if not table:
+            raise ValueError(f"Tables must be written as source.table [alias]: {text}")
+        tables.append(TableRef(table.group(1), table.group(2), alias=table.group(3)))
+
+    aliases = {ref.alias for ref in tables}
+    if len(aliases) != len(tables):
+        raise ValueError("Each table in a federated query needs a distinct alias")
+
+    select = None
+    if select_text.strip() != '*':
+        select = []
+        for item in select_text.split(','):
+            column = _COLUMN_RE.match(item.strip())
+            if not column or column.group(1) not in aliases or column.group(2) == '*':
+                raise ValueError(f"Select items must be alias.column [AS name]: {item.strip()}")
+            alias, name, output = column.groups()
+            select.append((alias, name, output or f'{alias}.{name}'))
+
+    where = []
+    if where_text:
+        for condition in re.split(r'\s+AND\s+', where_text.strip(), flags=re.IGNORECASE):
+            cond = _COND_RE.match(condition.strip())
+            if not cond or cond.group(1) not in aliases:
+                raise ValueError(f"WHERE conditions must be alias.column <op> literal: {condition}")
+            op = '!=' if cond.group(3) == '<>' else cond.group(3)
+            if op not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported operator: {op}")
+            where.append((cond.group(1), cond.group(2), op, _parse_literal(cond.group(4))))
+
+    for _, conditions in joins:
+        for (a1, _), (a2, _) in conditions:
+            if a1 not in aliases or a2 not in aliases:
+                raise ValueError(f"Unknown alias in join condition: {a1} / {a2}")
+
+    return {'select': select, 'tables': tables, 'joins': joins, 'where': where}
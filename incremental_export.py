@@ -0,0 +1,231 @@
+"""
+Incremental exports driven by a watermark.
+
+export_incremental() remembers, per table, how far the previous export got
+and writes only the rows added or changed since then. The watermark is one of:
+
+- a column whose values only grow: an auto-increment key, or an updated-at
+  timestamp (changed rows are then exported again with their new values).
+  Several rows can share the highest value, including rows committed after
+  a run, so each run reads that value again (``>=``) and skips the rows it
+  already exported by their hash, kept in the state as ``boundary_rows``
+- SQLite's rowid, for tables without such a column
+- the record count of dBase and MVO files, which grow by appending records
+
+Watermarks are kept in a JSON state file (``<output>.state.json`` by
+default) that is only updated after the rows are written, so an interrupted
+run exports its rows again rather than skipping them.
+
+Each run either appends to the output file (CSV or JSON Lines; gzip and
+zstd files stay valid streams) or rotates, writing a new timestamped file.
+
+Example:
+    result = export_incremental(handler, 'orders', 'orders.csv.gz', watermark_column='updated_at')
+"""
+
+import datetime
+import decimal
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from compression import COMPRESSION_SUFFIXES, compression_from_path
+from metrics import get_registry
+from result_set import ResultSet, as_result_set
+from table_diff import row_hash
+from tracing import span
+
+DEFAULT_BATCH_SIZE = 1000
+STATE_SUFFIX = '.state.json'
+# Output file suffix -> format; anything else is written as CSV
+EXPORT_FORMATS = {'.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'json', '.csv': 'csv'}
+
+logger = logging.getLogger('IncrementalExport')
+
+def encode_value(value: Any) -> Any:
+    """Make a watermark value JSON-serializable, keeping its type."""
+    if isinstance(value, datetime.datetime):
+        return {'type': 'datetime', 'value': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'type': 'date', 'value': value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {'type': 'decimal', 'value': str(value)}
+    return value
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if value['type'] == 'datetime':
+            return datetime.datetime.fromisoformat(value['value'])
+        if value['type'] == 'date':
+            return datetime.date.fromisoformat(value['value'])
+        if value['type'] == 'decimal':
+            return decimal.Decimal(value['value'])
+    return value
+
+def load_state(state_path: str) -> Dict[str, Any]:
+    """Read a watermark state file; a missing file is an empty state."""
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_state(state_path: str, state: Dict[str, Any]) -> None:
+    """Write a watermark state file atomically."""
+    temp_path = state_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, state_path)
+
+def split_suffix(path: str):
+    """Split 'orders.csv.gz' into ('orders', '.csv.gz'), keeping a compression suffix."""
+    root, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSION_SUFFIXES:
+        root, inner = os.path.splitext(root)
+        ext = inner + ext
+    return root, ext
+
+def export_format(path: str) -> str:
+    """Return 'csv', 'ndjson' or 'json' for an output file name."""
+    if compression_from_path(path):
+        path = os.path.splitext(path)[0]
+    return EXPORT_FORMATS.get(os.path.splitext(path)[1].lower(), 'csv')
+
+def rotated_path(output_path: str, timestamp: float = None) -> str:
+    """Return the file name of one rotated run, e.g. orders-20261019T020000.csv.gz."""
+    root, ext = split_suffix(output_path)
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.localtime(timestamp))
+    path = f'{root}-{stamp}{ext}'
+    counter = 1
+    while os.path.exists(path):
+        counter += 1
+        path = f'{root}-{stamp}-{counter}{ext}'
+    return path
+
+def _write(batches, path: str, fmt: str, compression: Optional[str], append: bool) -> int:
+    if fmt == 'csv':
+        from database_handlers import write_csv
+        return write_csv(batches, path, compression, append=append)
+    from serializer import write_json
+    return write_json(batches, path, fmt, compression, append=append)
+
+def export_incremental(handler, table_name: str, output_path: str, watermark_column: str = None,
+                       mode: str = 'append', state_path: str = None, compression: str = 'auto',
+                       batch_size: int = DEFAULT_BATCH_SIZE, full: bool = False) -> Dict[str, Any]:
+    """
+    Export the rows of a table added or changed since the previous export.
+
+    :param handler: Connected DatabaseHandler
+    :param table_name: Table to export
+    :param output_path: Output file; the format follows the suffix (.csv, .ndjson, .json, plus .gz/.zst)
+    :param watermark_column: Column whose values only grow; if omitted, the handler's
+                             ROW_WATERMARK (SQLite rowid, dBase/MVO record count) is used
+    :param mode: 'append' to add to output_path, 'rotate' to write a new timestamped file
+    :param state_path: Watermark state file (``<output_path>.state.json`` by default)
+    :param compression: None, 'gzip', 'zstd', or 'auto' to pick it from the suffix
+    :param batch_size: Rows per batch
+    :param full: Ignore the stored watermark and export every row
+    :return: Dictionary with the rows written, the file written and the old and new watermark
+    """
+    if mode not in ('append', 'rotate'):
+        raise ValueError(f"Unsupported incremental export mode: {mode}")
+    kind = 'column' if watermark_column else handler.ROW_WATERMARK
+    if kind is None:
+        raise ValueError(f"{type(handler).__name__} needs a watermark column for incremental exports")
+    state_path = state_path or output_path + STATE_SUFFIX
+    state = load_state(state_path)
+    entry = state.get(table_name)
+    previous = None
+    if entry and not full:
+        if entry['kind'] != kind or entry.get('column') != watermark_column:
+            used = entry.get('column') or entry['kind']
+            raise ValueError(f"{table_name} was exported with the {used} watermark; "
+                             f"run a full export to change it")
+        previous = decode_value(entry['value'])
+
+    if kind == 'column':
+        # Rows committed after the last run can share its highest value (updated_at), so the
+        # boundary value is read again and the rows exported with it are skipped by their hash
+        filters = [(watermark_column, '>=', previous)] if previous is not None else None
+        exported = set(entry.get('boundary_rows', ())) if previous is not None else set()
+        high = [previous]
+        # Rows exported with the highest value so far (hashed once the run is done)
+        at_high: List[tuple] = []
+
+        def tracked(batches):
+            for batch in batches:
+                batch = as_result_set(batch)
+                if not batch.rows:
+                    continue
+                position = batch.index[watermark_column]
+                rows = []
+                for values in batch.rows:
+                    value = values[position]
+                    if value is not None:
+                        if previous is not None and value == previous and row_hash(values) in exported:
+                            continue
+                        if high[0] is None or value > high[0]:
+                            high[0] = value
+                            at_high.clear()
+                        if value == high[0]:
+                            at_high.append(values)
+                    rows.append(values)
+                if rows:
+                    yield ResultSet(batch.columns, rows)
+        batches = tracked(handler.iter_table(table_name, batch_size, filters=filters))
+    else:
+        # Rows up to the current position are exported; rows added meanwhile wait for the next run.
+        # Without a previous watermark every row is exported: positions are not always positive
+        end = handler.row_position(table_name)
+        start = previous
+        if start is not None and (end is None or end < start):
+            logger.warning(f"{table_name} has fewer rows than at the last export; exporting all rows")
+            start = None
+        high = [end]
+        batches = handler.iter_rows_after(table_name, start, end, batch_size) if end is not None else ()
+
+    fmt = export_format(output_path)
+    if compression == 'auto':
+        compression = compression_from_path(output_path)
+    with span('export_incremental', table=table_name, kind=kind):
+        if mode == 'append':
+            written_path = output_path
+            rows = _write(batches, output_path, fmt, compression, append=True)
+        else:
+            written_path = rotated_path(output_path)
+            temp_path = written_path + '.tmp'
+            try:
+                rows = _write(batches, temp_path, fmt, compression, append=False)
+                if rows:
+                    os.replace(temp_path, written_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            if not rows:
+                written_path = None
+
+    state[table_name] = {
+        'kind': kind,
+        'column': watermark_column,
+        'value': encode_value(high[0]),
+        'exported_at': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    if kind == 'column':
+        boundary = {row_hash(values) for values in at_high}
+        if high[0] == previous:
+            boundary |= exported
+        state[table_name]['boundary_rows'] = sorted(boundary)
+    save_state(state_path, state)
+    get_registry().inc('incremental_export_rows_total', rows, table=table_name)
+    logger.info(f"Exported {rows} new rows of {table_name} (watermark {previous!r} -> {high[0]!r})")
+    return {
+        'table': table_name,
+        'rows': rows,
+        'output_path': written_path,
+        'watermark_kind': kind,
+        'previous_watermark': previous,
+        'watermark': high[0],
+    }
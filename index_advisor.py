@@ -0,0 +1,355 @@
+"""
+Index recommendations from the logged query workload.
+
+advise_indexes() reads the query log (query_log.py), finds the columns each
+query filters, joins and sorts on, and proposes one index per table and
+query shape, ordered equality columns first, then sort columns, then one
+range column. Candidates are dropped when an existing index (or the primary
+key) already starts with the same columns, when the table is small, or when
+a longer candidate on the same table covers them.
+
+Where the backend can plan with indexes that do not exist, each candidate is
+checked against the logged queries before it is recommended:
+
+- PostgreSQL with the HypoPG extension: ``hypopg_create_index()`` makes the
+  index visible to EXPLAIN only; the drop in planner cost is the estimated benefit
+- SQLite: the schema (without data) and its statistics are copied into an
+  in-memory database where the index is created; it is kept if the
+  queries' plans use it
+- Other backends: candidates are ranked by the time spent in the queries
+  they serve
+
+Example:
+    recommendations = advise_indexes(handler)
+    print(recommendations_ddl(recommendations))
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from query_log import QueryLog, QueryLogEntry, get_query_log
+from query_plan import table_references
+
+# Tables with fewer rows are read faster by a scan than through an index
+SMALL_TABLE_ROWS = 1000
+# Columns per recommended index at most
+MAX_INDEX_COLUMNS = 3
+# Planner cost reduction below which a hypothetical index is not recommended
+MIN_BENEFIT = 0.1
+# Longest index name most backends accept
+MAX_NAME_LENGTH = 63
+
+logger = logging.getLogger('IndexAdvisor')
+
+_IDENT = r'[`"\[]?(\w+)[`"\]]?'
+_COLUMN = rf'(?:{_IDENT}\.)?{_IDENT}'
+_CLAUSE_END = r'(?=\b(?:group\s+by|order\s+by|limit|offset|having|union|window|returning|for)\b|\)|$)'
+_WHERE = re.compile(r'\bwhere\b(.*?)' + _CLAUSE_END, re.IGNORECASE | re.DOTALL)
+_JOIN_ON = re.compile(r'\bon\b(.*?)(?=\b(?:join|where|group\s+by|order\s+by|limit|left|right|inner|full|cross)\b|$)',
+                      re.IGNORECASE | re.DOTALL)
+_ORDER_BY = re.compile(r'\b(order|group)\s+by\b(.*?)(?=\b(?:limit|offset|having|union|window|for)\b|\)|$)',
+                       re.IGNORECASE | re.DOTALL)
+_PREDICATE = re.compile(rf'{_COLUMN}\s*(=|<=|>=|<|>|\bin\b|\bis\b|\bbetween\b|\blike\b)\s*(\?|\(|null|not)',
+                        re.IGNORECASE)
+_JOIN_PAIR = re.compile(rf'{_COLUMN}\s*=\s*{_COLUMN}')
+_SORT_ITEM = re.compile(rf'^\s*{_COLUMN}(?:\s+(?:asc|desc))?(?:\s+nulls\s+(?:first|last))?\s*$', re.IGNORECASE)
+_EQUALITY_OPERATORS = ('=', 'in', 'is')
+
+class IndexRecommendation:
+    """A proposed index and the logged queries it serves"""
+
+    def __init__(self, table: str, columns: Sequence[str]):
+        self.table = table
+        self.columns = list(columns)
+        self.ddl = ''
+        # Fingerprints of the logged queries the index serves
+        self.queries: List[str] = []
+        self.calls = 0
+        self.workload_seconds = 0.0
+        # Fraction of the planner cost saved (hypothetical planning only)
+        self.estimated_benefit: Optional[float] = None
+        # Queries whose what-if plan used the index
+        self.used_by = 0
+        # 'hypopg', 'schema_copy' or 'workload'
+        self.method = 'workload'
+        self._entries: List[QueryLogEntry] = []
+
+    def add(self, entry: QueryLogEntry) -> None:
+        if entry.fingerprint in self.queries:
+            return
+        self.queries.append(entry.fingerprint)
+        self._entries.append(entry)
+        self.calls += entry.calls
+        self.workload_seconds += entry.total_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'table': self.table,
+            'columns': self.columns,
+            'ddl': self.ddl,
+            'queries': self.queries,
+            'calls': self.calls,
+            'workload_seconds': round(self.workload_seconds, 6),
+            'estimated_benefit': self.estimated_benefit,
+            'used_by': self.used_by,
+            'method': self.method,
+        }
+
+def index_name(table: str, columns: Sequence[str]) -> str:
+    """Return a name such as idx_orders_customer_id_created_at, shortened to MAX_NAME_LENGTH."""
+    name = re.sub(r'\W+', '_', '_'.join(['idx', table.split('.')[-1]] + list(columns))).lower()
+    return name[:MAX_NAME_LENGTH]
+
+def index_ddl(handler, table: str, columns: Sequence[str]) -> str:
+    quote = handler.quote_identifier
+    return (f'CREATE INDEX {quote(index_name(table, columns))} ON {quote(table)} '
+            f"({', '.join(quote(column) for column in columns)})")
+
+def _split_items(text: str) -> List[str]:
+    """Split an ORDER BY / GROUP BY list on top-level commas."""
+    items, depth, current = [], 0, ''
+    for char in text:
+        if char == ',' and depth == 0:
+            items.append(current)
+            current = ''
+            continue
+        depth += (char == '(') - (char == ')')
+        current += char
+    items.append(current)
+    return items
+
+def query_columns(query: str) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Find the columns a query filters, joins and sorts on.
+
+    :return: Qualifier ('' when unqualified) -> {'equality': [...], 'range': [...], 'sort': [...]}
+    """
+    usage: Dict[str, Dict[str, List[str]]] = {}
+
+    def add(qualifier: Optional[str], column: str, role: str) -> None:
+        columns = usage.setdefault(qualifier or '', {'equality': [], 'range': [], 'sort': []})[role]
+        if column not in columns:
+            columns.append(column)
+
+    for clause in _WHERE.findall(query):
+        for qualifier, column, operator, _ in _PREDICATE.findall(clause):
+            add(qualifier, column, 'equality' if operator.lower() in _EQUALITY_OPERATORS else 'range')
+    for clause in _JOIN_ON.findall(query):
+        for left_qualifier, left, right_qualifier, right in _JOIN_PAIR.findall(clause):
+            add(left_qualifier, left, 'equality')
+            add(right_qualifier, right, 'equality')
+    order = [match for match in _ORDER_BY.finditer(query)]
+    # ORDER BY decides the index order; GROUP BY only when there is no ORDER BY
+    order.sort(key=lambda match: match.group(1).lower() != 'order')
+    if order:
+        for item in _split_items(order[0].group(2)):
+            match = _SORT_ITEM.match(item)
+            if not match:
+                # Expressions cannot use a plain column index
+                break
+            add(match.group(1), match.group(2), 'sort')
+    return usage
+
+def _candidates(handler, entries: Sequence[QueryLogEntry]) -> Dict[Tuple[str, Tuple[str, ...]], IndexRecommendation]:
+    """Build a candidate index for each table of each logged query."""
+    tables = set(handler.get_tables())
+    table_columns: Dict[str, List[str]] = {}
+    candidates: Dict[Tuple[str, Tuple[str, ...]], IndexRecommendation] = {}
+    for entry in entries:
+        references = [(table, alias) for table, alias in table_references(entry.fingerprint) if table in tables]
+        if not references:
+            continue
+        for table, _ in references:
+            if table not in table_columns:
+                table_columns[table] = handler.get_columns(table)
+        by_table: Dict[str, Dict[str, List[str]]] = {}
+        sort_tables = set()
+        for qualifier, roles in query_columns(entry.fingerprint).items():
+            for role, columns in roles.items():
+                for column in columns:
+                    if qualifier:
+                        owners = [table for table, alias in references if qualifier in (alias, table)]
+                    else:
+                        # Unqualified columns belong to whichever referenced table has them
+                        owners = [table for table, _ in references if column in table_columns[table]]
+                    if len(owners) != 1 or column not in table_columns[owners[0]]:
+                        continue
+                    roles_of_table = by_table.setdefault(owners[0], {'equality': [], 'range': [], 'sort': []})
+                    if column not in roles_of_table[role]:
+                        roles_of_table[role].append(column)
+                    if role == 'sort':
+                        sort_tables.add(owners[0])
+        for table, roles in by_table.items():
+            columns = list(roles['equality'])
+            # An index only delivers the order when all sort columns are in the same table
+            if sort_tables == {table}:
+                columns += [column for column in roles['sort'] if column not in columns]
+            columns += [column for column in roles['range'][:1] if column not in columns]
+            columns = columns[:MAX_INDEX_COLUMNS]
+            if not columns:
+                continue
+            key = (table, tuple(columns))
+            if key not in candidates:
+                candidates[key] = IndexRecommendation(table, columns)
+            candidates[key].add(entry)
+    return candidates
+
+def _prune(handler, candidates: Dict[Tuple[str, Tuple[str, ...]], IndexRecommendation]) -> List[IndexRecommendation]:
+    """Drop candidates served by existing indexes, on small tables, or covered by a longer candidate."""
+    existing: Dict[str, List[List[str]]] = {}
+    sizes: Dict[str, Optional[int]] = {}
+    kept = []
+    for (table, columns), candidate in candidates.items():
+        if table not in existing:
+            existing[table] = list(handler.get_indexes(table).values()) + [handler.get_primary_key(table)]
+            sizes[table] = handler.estimate_row_count(table)
+        if sizes[table] is not None and sizes[table] < SMALL_TABLE_ROWS:
+            continue
+        if any(list(index[:len(columns)]) == list(columns) for index in existing[table]):
+            continue
+        kept.append(candidate)
+    # Queries served by a prefix of a longer candidate move to the longer one
+    kept.sort(key=lambda candidate: -len(candidate.columns))
+    result: List[IndexRecommendation] = []
+    for candidate in kept:
+        longer = next((other for other in result if other.table == candidate.table
+                       and other.columns[:len(candidate.columns)] == candidate.columns), None)
+        if longer is None:
+            result.append(candidate)
+        else:
+            for entry in candidate._entries:
+                longer.add(entry)
+    return result
+
+def _plan_cost(handler, entry: QueryLogEntry) -> Optional[float]:
+    try:
+        return handler.explain(entry.sample_query, entry.sample_params).root.cost
+    except Exception as e:
+        logger.debug(f"Cannot explain {entry.fingerprint}: {e}")
+        handler.rollback()
+        return None
+
+def _check_with_hypopg(handler, candidates: List[IndexRecommendation]) -> List[IndexRecommendation]:
+    """Estimate each candidate's benefit with HypoPG; keep those that cut the planner cost."""
+    kept = []
+    for candidate in candidates:
+        before = [(entry, _plan_cost(handler, entry)) for entry in candidate._entries]
+        handler.execute_query('SELECT indexrelid FROM hypopg_create_index(%s)', (candidate.ddl,))
+        try:
+            after = [_plan_cost(handler, entry) for entry in candidate._entries]
+        finally:
+            handler.execute_query('SELECT hypopg_reset()')
+        pairs = [(entry.calls * cost_before, entry.calls * cost_after)
+                 for (entry, cost_before), cost_after in zip(before, after)
+                 if cost_before and cost_after is not None]
+        if not pairs:
+            continue
+        total_before = sum(cost_before for cost_before, _ in pairs)
+        candidate.estimated_benefit = round(1 - sum(cost_after for _, cost_after in pairs) / total_before, 4)
+        candidate.used_by = sum(1 for cost_before, cost_after in pairs if cost_after < cost_before)
+        candidate.method = 'hypopg'
+        if candidate.estimated_benefit >= MIN_BENEFIT:
+            kept.append(candidate)
+    return kept
+
+def _schema_copy(handler):
+    """Copy a SQLite database's schema and statistics, without data, into memory."""
+    from database_handlers import load_driver
+    sqlite3 = load_driver('sqlite3')
+    copy = sqlite3.connect(':memory:')
+    source = handler.conn.cursor()
+    try:
+        source.execute("SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL "
+                       "AND name NOT LIKE 'sqlite_%' ORDER BY type = 'view', type = 'index'")
+        for _, name, sql in source.fetchall():
+            try:
+                copy.execute(sql)
+            except sqlite3.Error as e:
+                # e.g. virtual tables of modules this build lacks
+                logger.debug(f"Not copying {name}: {e}")
+        # Without statistics the planner assumes every table is large; tell it the real sizes
+        copy.execute('ANALYZE')
+        copy.execute('DELETE FROM sqlite_stat1')
+        source.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if source.fetchone():
+            source.execute('SELECT tbl, idx, stat FROM sqlite_stat1')
+            copy.executemany('INSERT INTO sqlite_stat1 VALUES (?, ?, ?)', source.fetchall())
+        analyzed = {row[0] for row in copy.execute('SELECT tbl FROM sqlite_stat1')}
+        for (table,) in copy.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                     "AND name NOT LIKE 'sqlite_%'").fetchall():
+            rows = handler.estimate_row_count(table) if table not in analyzed else None
+            if rows:
+                copy.execute('INSERT INTO sqlite_stat1 VALUES (?, NULL, ?)', (table, str(rows)))
+        # Reload the statistics
+        copy.execute('ANALYZE sqlite_schema')
+    finally:
+        source.close()
+    return copy
+
+def _check_with_schema_copy(handler, candidates: List[IndexRecommendation]) -> List[IndexRecommendation]:
+    """Keep the candidates that the SQLite planner uses for at least one logged query."""
+    copy = _schema_copy(handler)
+    kept = []
+    try:
+        for candidate in candidates:
+            name = index_name(candidate.table, candidate.columns)
+            copy.execute(candidate.ddl)
+            for entry in candidate._entries:
+                try:
+                    plan = copy.execute('EXPLAIN QUERY PLAN ' + entry.sample_query, entry.sample_params or ()).fetchall()
+                except Exception as e:
+                    logger.debug(f"Cannot explain {entry.fingerprint}: {e}")
+                    continue
+                if any(re.search(rf'\bINDEX {re.escape(name)}\b', row[3]) for row in plan):
+                    candidate.used_by += 1
+            copy.execute(f'DROP INDEX {handler.quote_identifier(name)}')
+            candidate.method = 'schema_copy'
+            if candidate.used_by:
+                kept.append(candidate)
+    finally:
+        copy.close()
+    return kept
+
+def advise_indexes(handler, log: QueryLog = None, limit: int = 10,
+                   min_calls: int = 1) -> List[IndexRecommendation]:
+    """
+    Recommend indexes for the queries logged for a handler's backend.
+
+    :param handler: Connected DatabaseHandler running SQL (SQLite, MySQL, PostgreSQL, Access)
+    :param log: Query log to analyze (the process-wide log by default)
+    :param limit: Recommendations returned at most
+    :param min_calls: Ignore queries run fewer times
+    :return: Recommendations, most valuable first
+    """
+    if not handler.SQL_QUERIES:
+        raise ValueError(f"{type(handler).__name__} does not run SQL queries")
+    log = log or get_query_log()
+    entries = [entry for entry in log.entries(type(handler).__name__)
+               if entry.calls >= min_calls and entry.sample_query]
+    candidates = _prune(handler, _candidates(handler, entries))
+    for candidate in candidates:
+        candidate.ddl = index_ddl(handler, candidate.table, candidate.columns)
+    backend = type(handler).__name__
+    if backend == 'PostgreSQLHandler' and handler.execute_query(
+            "SELECT 1 AS present FROM pg_extension WHERE extname = 'hypopg'"):
+        candidates = _check_with_hypopg(handler, candidates)
+    elif backend == 'SQLiteHandler':
+        candidates = _check_with_schema_copy(handler, candidates)
+    candidates.sort(key=lambda candidate: (candidate.workload_seconds * (candidate.estimated_benefit or 1),
+                                           candidate.calls), reverse=True)
+    logger.info(f"{len(candidates)} index recommendations from {len(entries)} logged queries")
+    return candidates[:limit]
+
+def recommendations_ddl(recommendations: Sequence[IndexRecommendation]) -> str:
+    """Return the recommendations as an SQL script, each index with a comment on what it serves."""
+    lines = []
+    for recommendation in recommendations:
+        comment = (f'-- {len(recommendation.queries)} queries, {recommendation.calls} calls, '
+                   f'{recommendation.workload_seconds:.3f}s logged')
+        if recommendation.estimated_benefit is not None:
+            comment += f', estimated cost -{recommendation.estimated_benefit:.0%} (HypoPG)'
+        elif recommendation.method == 'schema_copy':
+            comment += f', used in the plans of {recommendation.used_by} queries'
+        lines.extend([comment, recommendation.ddl + ';', ''])
+    return '\n'.join(lines)
@@ -0,0 +1,87 @@
+"""
+Result-size guard rails for queries.
+
+A handler with ``limits`` set (a QueryLimits) streams the result of
+execute_query() instead of fetching it whole, and stops as soon as a limit
+is reached:
+
+- max_rows: rows returned
+- max_bytes: approximate memory held by the returned rows
+- max_seconds: wall time; besides the check between batches, the statement
+  itself is interrupted by the backend (SQLite progress handler, PostgreSQL
+  ``statement_timeout`` and backend cancel, MySQL ``max_execution_time``
+  and ``KILL QUERY``, the ODBC query timeout on Access)
+
+A stopped query returns a PartialResult, a ResultSet of the rows read so far
+that records which limit stopped it, rather than raising or exhausting memory.
+
+Example:
+    handler.limits = QueryLimits(max_rows=100000, max_seconds=30)
+    rows = handler.execute_query('SELECT * FROM events')
+    if isinstance(rows, PartialResult):
+        print(f'Showing the first {len(rows)} rows ({rows.reason})')
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Optional, Sequence, Union
+
+from result_set import ResultSet, as_result_set
+
+class QueryLimits:
+    """Maximum rows, bytes and seconds for one query; None means unlimited"""
+
+    def __init__(self, max_rows: Optional[int] = None, max_bytes: Optional[int] = None,
+                 max_seconds: Optional[float] = None):
+        """
+        :param max_rows: Rows returned at most
+        :param max_bytes: Approximate bytes of row data held in memory at most
+        :param max_seconds: Wall time allowed for running the query and fetching its rows
+        """
+        for name, value in (('max_rows', max_rows), ('max_bytes', max_bytes), ('max_seconds', max_seconds)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive")
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+
+    def __bool__(self) -> bool:
+        return any(value is not None for value in (self.max_rows, self.max_bytes, self.max_seconds))
+
+    def __repr__(self) -> str:
+        return (f'QueryLimits(max_rows={self.max_rows}, max_bytes={self.max_bytes}, '
+                f'max_seconds={self.max_seconds})')
+
+class PartialResult(ResultSet):
+    """Rows of a query that was stopped by a QueryLimits limit"""
+
+    __slots__ = ('reason', 'limits')
+    truncated = True
+
+    def __init__(self, rows: Union[ResultSet, Iterable[Dict[str, Any]]], reason: str, limits: QueryLimits):
+        """
+        :param rows: Rows read before the query was stopped (a ResultSet or row dictionaries)
+        :param reason: 'max_rows', 'max_bytes' or 'max_seconds'
+        :param limits: The limits in force
+        """
+        rows = as_result_set(rows)
+        super().__init__(rows.columns, rows.rows)
+        self.reason = reason
+        self.limits = limits
+
+    def describe(self) -> str:
+        """Return a short message such as 'row limit of 100000 reached'."""
+        if self.reason == 'max_rows':
+            return f'row limit of {self.limits.max_rows} reached'
+        if self.reason == 'max_bytes':
+            megabytes = self.limits.max_bytes / (1024 * 1024)
+            return f'size limit of {megabytes:.3g} MB reached'
+        return f'time limit of {self.limits.max_seconds:g}s reached'
+
+def estimate_row_bytes(row: Union[Dict[str, Any], Sequence[Any]]) -> int:
+    """Approximate memory held by a row (a dictionary or a ResultSet tuple) and its values."""
+    values = row.values() if isinstance(row, Mapping) else row
+    if isinstance(row, Mapping) and not isinstance(row, dict):
+        # Row views share their tuple with the ResultSet
+        row = values
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in values)
@@ -1,22 +1,15 @@
 from app import SQLiteApp
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import sqlite3
-import json
-import os
-from datetime import datetime
-from database_handlers import get_database_handler
-from database_handlers import MVOError
-from version import get_version, get_version_info
-from plugins.plugin_manager import PluginManager
-from create_sample_dbase import create_sample_dbase
-from create_sample_sqlite import create_sample_sqlite
-from create_sample_access import create_sample_access
-from create_sample_mvo import create_sample_mvo
-from create_sample_mysql import create_sample_mysql
-from create_sample_sql import create_sample_sql
+from version import get_version_info
 from sponsor import Sponsor
 
+def init_plugins(root, app):
+    """Discover plugins once the main window is up and health-check them in the background"""
+    from plugins.plugin_manager import PluginManager
+    app.plugin_manager = PluginManager(root)
+    app.plugin_manager.discover_plugins()
+    app.plugin_manager.run_health_checks_async(callback=app.show_plugin_status)
+
 def main():
     root = tk.Tk()
     version_info = get_version_info()
@@ -26,12 +19,11 @@ def main():
     # Initialize Sponsor
     sponsor = Sponsor(root)
     
-    # Initialize Plugin Manager
-    plugin_manager = PluginManager(root)
-    
     # Initialize the app
     app = SQLiteApp(root, sponsor)
-    app.plugin_manager = plugin_manager
+    
+    # Initialize Plugin Manager after the first frame has been drawn
+    root.after_idle(init_plugins, root, app)
     
     root.protocol('WM_DELETE_WINDOW', app.close)
     root.mainloop()
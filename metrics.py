@@ -0,0 +1,339 @@
+"""
+Query metrics registry for Database Browser.
+
+Records per-operation latency histograms and row/byte counters for the
+database handlers and renders snapshots as Prometheus text or JSON.
+"""
+
+import bisect
+import functools
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from query_log import get_query_log
+from result_set import ResultSet
+
+# Latency bucket upper bounds in seconds (Prometheus-style, +Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = 'dbbrowser'
+
+_TABLE_PATTERN = re.compile(r'\bFROM\s+([\[\]`"\w.]+)', re.IGNORECASE)
+
+
+def is_coroutine_function(func) -> bool:
+    # Same test as inspect.iscoroutinefunction without importing asyncio/inspect at startup
+    return bool(getattr(getattr(func, '__code__', None), 'co_flags', 0) & 0x80)
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside the matching bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if bucket_count and seen + bucket_count >= rank:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of operation histograms and labelled counters"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._last: Optional[Dict[str, Any]] = None
+        self._started = time.time()
+
+    def record(self, handler: str, operation: str, table: str, seconds: float,
+               rows: int = 0, nbytes: int = 0, error: bool = False) -> None:
+        """
+        Record a single handler operation.
+
+        :param handler: Handler class name
+        :param operation: Operation name (connect, execute_query, ...)
+        :param table: Table the operation touched, or '' if unknown
+        :param seconds: Wall time spent in the operation
+        :param rows: Rows fetched or written
+        :param nbytes: Bytes written
+        :param error: Whether the operation raised
+        """
+        if not self.enabled:
+            return
+        key = (handler, operation, table)
+        labels = (('handler', handler), ('operation', operation), ('table', table))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if rows:
+                self._add('rows_total', labels, rows)
+            if nbytes:
+                self._add('bytes_written_total', labels, nbytes)
+            if error:
+                self._add('errors_total', labels, 1)
+            self._last = {'handler': handler, 'operation': operation, 'table': table,
+                          'seconds': seconds, 'rows': rows, 'bytes': nbytes}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Increment a free-form counter such as ``cache_hits_total``."""
+        if not self.enabled:
+            return
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self._add(name, key, value)
+
+    def _add(self, name, labels, value):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels: Any) -> float:
+        """Sum a counter over every label set matching ``labels``."""
+        wanted = {k: str(v) for k, v in labels.items()}
+        with self._lock:
+            return sum(value for (counter_name, label_set), value in self._counters.items()
+                       if counter_name == name
+                       and all(dict(label_set).get(k) == v for k, v in wanted.items()))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._last = None
+            self._started = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate totals across all handlers, used by the status bar."""
+        with self._lock:
+            queries = Histogram(self.buckets)
+            for (_, operation, _), histogram in self._histograms.items():
+                if operation == 'execute_query':
+                    queries.count += histogram.count
+                    queries.sum += histogram.sum
+                    queries.counts = [a + b for a, b in zip(queries.counts, histogram.counts)]
+            rows = sum(v for (name, _), v in self._counters.items() if name == 'rows_total')
+            nbytes = sum(v for (name, _), v in self._counters.items()
+                         if name == 'bytes_written_total')
+            hits = sum(v for (name, _), v in self._counters.items() if name == 'cache_hits_total')
+            elapsed = max(time.time() - self._started, 1e-9)
+            return {
+                'queries': queries.count,
+                'rows': int(rows),
+                'bytes': int(nbytes),
+                'cache_hits': int(hits),
+                'p50': queries.quantile(0.5),
+                'p95': queries.quantile(0.95),
+                'rows_per_second': rows / elapsed,
+                'last': dict(self._last) if self._last else None,
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable snapshot of every metric."""
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'operations': [
+                    dict(handler=h, operation=o, table=t, **histogram.to_dict())
+                    for (h, o, t), histogram in sorted(self._histograms.items())
+                ],
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+            }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format."""
+        histogram_name = f'{METRIC_PREFIX}_operation_duration_seconds'
+        lines = [f'# HELP {histogram_name} Database handler operation latency.',
+                 f'# TYPE {histogram_name} histogram']
+        with self._lock:
+            for (h, o, t), histogram in sorted(self._histograms.items()):
+                labels = _format_labels((('handler', h), ('operation', o), ('table', t)))
+                cumulative = 0
+                for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], histogram.counts):
+                    cumulative += bucket_count
+                    le = _format_labels((('handler', h), ('operation', o), ('table', t),
+                                         ('le', str(bound))))
+                    lines.append(f'{histogram_name}_bucket{le} {cumulative}')
+                lines.append(f'{histogram_name}_sum{labels} {histogram.sum:.9f}')
+                lines.append(f'{histogram_name}_count{labels} {histogram.count}')
+
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                full_name = f'{METRIC_PREFIX}_{name}'
+                if full_name not in typed:
+                    lines.append(f'# TYPE {full_name} counter')
+                    typed.add(full_name)
+                lines.append(f'{full_name}{_format_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, output_path: str) -> None:
+        """Write a snapshot to ``output_path``; ``.json`` files get JSON, others Prometheus text."""
+        if output_path.lower().endswith('.json'):
+            content = self.to_json()
+        else:
+            content = self.to_prometheus()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return REGISTRY
+
+
+def table_from_query(query: Optional[str]) -> str:
+    """Best-effort extraction of the first table referenced by a query."""
+    if not query:
+        return ''
+    match = _TABLE_PATTERN.search(query)
+    return match.group(1).strip('[]`"') if match else ''
+
+
+def instrument(operation: str) -> Callable:
+    """
+    Decorate a handler method so each call is timed and recorded.
+
+    Rows are taken from the length of a returned list (queries) or from an
+    integer return value (exports); bytes from the size of an export's output file.
+    Queries are also added to the query log (see query_log.py).
+    """
+    def decorator(func):
+        if getattr(func, '__instrumented__', False):
+            return func
+
+        def record(self, args, kwargs, result, start, error):
+            elapsed = time.perf_counter() - start
+            table, rows, nbytes = _describe_call(operation, args, kwargs, result)
+            REGISTRY.record(type(self).__name__, operation, table, elapsed,
+                            rows=rows, nbytes=nbytes, error=error)
+            if operation == 'execute_query':
+                query = args[0] if args else kwargs.get('query')
+                params = args[1] if len(args) > 1 else kwargs.get('params')
+                get_query_log().record(type(self).__name__, query, params, elapsed, rows=rows, error=error)
+
+        if is_coroutine_function(func):
+            @functools.wraps(func)
+            async def wrapper(self, *args, **kwargs):
+                if not REGISTRY.enabled:
+                    return await func(self, *args, **kwargs)
+                start = time.perf_counter()
+                error = False
+                result = None
+                try:
+                    result = await func(self, *args, **kwargs)
+                    return result
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    record(self, args, kwargs, result, start, error)
+        else:
+            @functools.wraps(func)
+            def wrapper(self, *args, **kwargs):
+                if not REGISTRY.enabled:
+                    return func(self, *args, **kwargs)
+                start = time.perf_counter()
+                error = False
+                result = None
+                try:
+                    result = func(self, *args, **kwargs)
+                    return result
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    record(self, args, kwargs, result, start, error)
+
+        wrapper.__instrumented__ = True
+        return wrapper
+    return decorator
+
+
+def _describe_call(operation, args, kwargs, result):
+    table = ''
+    rows = 0
+    nbytes = 0
+    if operation == 'execute_query':
+        table = table_from_query(args[0] if args else kwargs.get('query'))
+    elif operation == 'export_to_csv':
+        table = args[0] if args else kwargs.get('table_name', '')
+        output_path = args[1] if len(args) > 1 else kwargs.get('output_path')
+        if output_path and os.path.exists(output_path):
+            nbytes = os.path.getsize(output_path)
+    if operation in ('execute_query', 'export_to_csv'):
+        if isinstance(result, (list, ResultSet)):
+            rows = len(result)
+        elif isinstance(result, int) and not isinstance(result, bool):
+            rows = result
+    return table or '', rows, nbytes
+
+
+def format_status(summary: Dict[str, Any]) -> str:
+    """Format a registry summary as a compact status bar string."""
+    text = (f"Queries: {summary['queries']}  Rows: {summary['rows']:,}  "
+            f"p50: {summary['p50'] * 1000:.1f} ms  p95: {summary['p95'] * 1000:.1f} ms")
+    if summary['cache_hits']:
+        text += f"  Cache hits: {summary['cache_hits']:,}"
+    last = summary.get('last')
+    if last:
+        text += f"  Last: {last['operation']} {last['seconds'] * 1000:.1f} ms"
+    return text
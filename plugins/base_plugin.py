@@ -27,6 +27,15 @@ class BasePlugin(ABC):
     def get_metadata(self) -> Dict[str, Any]:
         """Get plugin metadata"""
         pass
+    
+    def health_check(self, timeout: float) -> bool:
+        """
+        Check that the plugin's external dependencies are reachable.
+        
+        Runs in a worker thread; keep initialize() cheap and do slow probes
+        (network connections, driver loading) here instead.
+        """
+        return True
 
 class BaseDatabasePlugin(BasePlugin):
     """Base class for database handler plugins"""
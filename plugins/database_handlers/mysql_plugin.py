@@ -2,10 +2,17 @@
 MySQL database plugin for DB Browser
 """
 
-from .base_plugin import BaseDatabasePlugin
-import mysql.connector
+from plugins.base_plugin import BaseDatabasePlugin
 from typing import Dict, List, Any
 
+PLUGIN_MANIFEST = {
+    'name': 'MySQL',
+    'type': 'database',
+    'version': '1.0.0',
+    'supports': ['mysql', 'mariadb'],
+    'entry_point': 'MySQLPlugin',
+}
+
 class MySQLPlugin(BaseDatabasePlugin):
     """MySQL database handler plugin"""
     
@@ -15,12 +22,18 @@ class MySQLPlugin(BaseDatabasePlugin):
         
     def initialize(self) -> bool:
         """Initialize the MySQL plugin"""
+        return True
+    
+    def health_check(self, timeout: float) -> bool:
+        """Test connection to ensure MySQL is available"""
         try:
-            # Test connection to ensure MySQL is available
-            mysql.connector.connect(host='localhost', user='root', password='root')
+            import mysql.connector
+            conn = mysql.connector.connect(host='localhost', user='root', password='root',
+                                           connection_timeout=max(1, int(timeout)))
+            conn.close()
             return True
         except Exception as e:
-            print(f"Error initializing MySQL plugin: {str(e)}")
+            print(f"MySQL plugin health check failed: {str(e)}")
             return False
     
     def shutdown(self) -> None:
@@ -30,12 +43,7 @@ class MySQLPlugin(BaseDatabasePlugin):
     
     def get_metadata(self) -> Dict[str, Any]:
         """Get plugin metadata"""
-        return {
-            'name': self.name,
-            'version': self.version,
-            'type': 'database',
-            'supports': ['mysql', 'mariadb']
-        }
+        return dict(PLUGIN_MANIFEST)
     
     def connect(self, connection_string: str) -> bool:
         """Connect to MySQL database"""
@@ -48,6 +56,7 @@ class MySQLPlugin(BaseDatabasePlugin):
                     conn_params[key.lower()] = value
             
             # Connect to database
+            import mysql.connector
             self.connection = mysql.connector.connect(
                 host=conn_params.get('host', 'localhost'),
                 user=conn_params.get('user', 'root'),
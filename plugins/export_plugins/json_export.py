@@ -0,0 +1,74 @@
+"""
+JSON export plugin for DB Browser
+
+Writes tables as JSON Lines (one object per line) or as a JSON array,
+streaming batches from the handler so the result is never held in memory.
+"""
+
+from plugins.base_plugin import BaseExportPlugin
+from typing import Dict, List, Any
+
+PLUGIN_MANIFEST = {
+    'name': 'JSON Export',
+    'type': 'export',
+    'version': '1.0.0',
+    'supports': ['ndjson', 'jsonl', 'json'],
+    'entry_point': 'JSONExportPlugin',
+}
+
+class JSONExportPlugin(BaseExportPlugin):
+    """JSON and JSON Lines export plugin"""
+
+    def __init__(self):
+        super().__init__("JSON Export", "1.0.0")
+
+    def initialize(self) -> bool:
+        """Initialize the JSON export plugin"""
+        return True
+
+    def shutdown(self) -> None:
+        """Shutdown the JSON export plugin"""
+        pass
+
+    def get_metadata(self) -> Dict[str, Any]:
+        """Get plugin metadata"""
+        return dict(PLUGIN_MANIFEST)
+
+    def get_supported_formats(self) -> List[str]:
+        """Get list of supported export formats"""
+        return list(PLUGIN_MANIFEST['supports'])
+
+    def export_table(self, handler, table_name: str, output_path: str, format: str = 'ndjson',
+                     compression: str = 'auto') -> int:
+        """
+        Stream a table to a JSON file.
+
+        :param handler: Connected DatabaseHandler
+        :param table_name: Table to export
+        :param output_path: Output file (.gz or .zst suffixes compress it)
+        :param format: 'ndjson', 'jsonl' or 'json'
+        :param compression: None, 'gzip', 'zstd', or 'auto' to pick it from the suffix
+        :return: Number of rows written
+        """
+        from serializer import write_json
+        return write_json(handler.iter_table(table_name), output_path, format, compression)
+
+    def export_data(self, data: Any, format: str) -> bool:
+        """
+        Export data to specified format
+
+        :param data: Dictionary with 'output_path' and either 'handler' and 'table'
+                     or 'batches' (an iterable of row batches); optional 'compression'
+        :param format: 'ndjson', 'jsonl' or 'json'
+        """
+        from serializer import write_json
+        try:
+            if 'handler' in data:
+                batches = data['handler'].iter_table(data['table'])
+            else:
+                batches = data['batches']
+            write_json(batches, data['output_path'], format, data.get('compression', 'auto'))
+            return True
+        except Exception as e:
+            print(f"Error exporting JSON: {str(e)}")
+            return False
@@ -1,89 +1,300 @@
 """
 Plugin manager for DB Browser
+
+Plugins are discovered from a lightweight manifest declared at the top of each
+plugin module::
+
+    PLUGIN_MANIFEST = {
+        'name': 'MySQL',
+        'type': 'database',
+        'version': '1.0.0',
+        'supports': ['mysql', 'mariadb'],
+        'entry_point': 'MySQLPlugin',
+    }
+
+Manifests are read with ``ast`` without importing the module and cached by file
+modification time. A plugin module is only imported and initialized the first
+time the plugin is requested; health checks run concurrently in worker threads
+with a timeout so they never block the UI thread.
 """
 
+import ast
 import importlib
+import json
+import logging
 import os
-from typing import Dict, List, Type
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Type
 from .base_plugin import BasePlugin, BaseDatabasePlugin, BaseUIPlugin, BaseExportPlugin
 
+PLUGINS_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_CACHE_PATH = os.path.join(PLUGINS_DIR, '.manifest_cache.json')
+
+# Plugin directory -> (manifest type, base class)
+PLUGIN_DIRECTORIES = {
+    'database_handlers': ('database', BaseDatabasePlugin),
+    'ui_plugins': ('ui', BaseUIPlugin),
+    'export_plugins': ('export', BaseExportPlugin),
+}
+
+# Default timeout in seconds for a single plugin health check
+HEALTH_CHECK_TIMEOUT = 5.0
+# Milliseconds between polls of the Tk thread for finished health check results
+HEALTH_CHECK_POLL_MS = 100
+
+logger = logging.getLogger('PluginManager')
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the PLUGIN_MANIFEST literal from a plugin source file without importing it.
+
+    :param path: Path to the plugin module
+    :return: Manifest dictionary, or None if the module declares no manifest
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == 'PLUGIN_MANIFEST'
+                for target in node.targets):
+            return ast.literal_eval(node.value)
+    return None
+
 class PluginManager:
     """Manages plugins for DB Browser"""
-    
-    def __init__(self, root):
+
+    def __init__(self, root, cache_path: str = MANIFEST_CACHE_PATH):
         self.root = root
+        self.cache_path = cache_path
+        self.manifests: Dict[str, Dict[str, Any]] = {}
         self.plugins: Dict[str, BasePlugin] = {}
         self.database_plugins: Dict[str, BaseDatabasePlugin] = {}
         self.ui_plugins: Dict[str, BaseUIPlugin] = {}
         self.export_plugins: Dict[str, BaseExportPlugin] = {}
-        
+        self.health: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._plugin_locks: Dict[str, threading.Lock] = {}
+
+    def discover_plugins(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Collect plugin manifests without importing any plugin module.
+
+        :return: Manifests keyed by plugin name
+        """
+        cache = self._read_cache()
+        fresh_cache = {}
+        manifests = {}
+        for directory, (plugin_type, _) in PLUGIN_DIRECTORIES.items():
+            plugins_dir = os.path.join(PLUGINS_DIR, directory)
+            if not os.path.isdir(plugins_dir):
+                continue
+            for plugin_file in sorted(os.listdir(plugins_dir)):
+                if not plugin_file.endswith('.py') or plugin_file == '__init__.py':
+                    continue
+                path = os.path.join(plugins_dir, plugin_file)
+                module = f'plugins.{directory}.{plugin_file[:-3]}'
+                stat = os.stat(path)
+                entry = cache.get(module)
+                if not entry or entry.get('mtime') != stat.st_mtime or entry.get('size') != stat.st_size:
+                    try:
+                        manifest = read_manifest(path)
+                    except (SyntaxError, ValueError) as e:
+                        logger.error(f"Invalid manifest in {path}: {e}")
+                        continue
+                    entry = {'mtime': stat.st_mtime, 'size': stat.st_size, 'manifest': manifest}
+                fresh_cache[module] = entry
+                manifest = entry['manifest']
+                if manifest is None:
+                    # Empty or legacy modules without a manifest are skipped
+                    continue
+                manifest = dict(manifest, module=module)
+                manifest.setdefault('type', plugin_type)
+                manifests[manifest['name']] = manifest
+        self._write_cache(fresh_cache)
+        with self._lock:
+            self.manifests = manifests
+        return manifests
+
+    def _read_cache(self) -> Dict[str, Any]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, cache: Dict[str, Any]) -> None:
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Could not write plugin manifest cache: {e}")
+
     def load_plugins(self) -> None:
         """Load all available plugins"""
-        # Load database handler plugins
-        self._load_plugins_from_directory('database_handlers', BaseDatabasePlugin)
-        # Load UI plugins
-        self._load_plugins_from_directory('ui_plugins', BaseUIPlugin)
-        # Load export plugins
-        self._load_plugins_from_directory('export_plugins', BaseExportPlugin)
-        
-    def _load_plugins_from_directory(self, directory: str, base_class: Type) -> None:
-        """Load plugins from a specific directory"""
-        plugins_dir = os.path.join('plugins', directory)
-        if not os.path.exists(plugins_dir):
-            return
-            
-        for plugin_file in os.listdir(plugins_dir):
-            if plugin_file.endswith('.py') and plugin_file != '__init__.py':
-                module_name = plugin_file[:-3]
-                try:
-                    module = importlib.import_module(f'plugins.{directory}.{module_name}')
-                    for attr_name in dir(module):
-                        attr = getattr(module, attr_name)
-                        if isinstance(attr, type) and issubclass(attr, base_class):
-                            plugin = attr()
-                            if plugin.initialize():
-                                self.plugins[plugin.name] = plugin
-                                if issubclass(attr, BaseDatabasePlugin):
-                                    self.database_plugins[plugin.name] = plugin
-                                elif issubclass(attr, BaseUIPlugin):
-                                    self.ui_plugins[plugin.name] = plugin
-                                elif issubclass(attr, BaseExportPlugin):
-                                    self.export_plugins[plugin.name] = plugin
-                except Exception as e:
-                    print(f"Error loading plugin {module_name}: {str(e)}")
-    
+        if not self.manifests:
+            self.discover_plugins()
+        for name in list(self.manifests):
+            self._load_plugin(name)
+
+    def _load_plugin(self, name: str) -> Optional[BasePlugin]:
+        """Import and initialize a plugin from its manifest on first use"""
+        with self._lock:
+            if name in self.plugins:
+                return self.plugins[name]
+            manifest = self.manifests.get(name)
+            if manifest is None:
+                return None
+            plugin_lock = self._plugin_locks.setdefault(name, threading.Lock())
+
+        # Plugins initialize in parallel; the per-plugin lock only stops a
+        # plugin from being initialized twice
+        with plugin_lock:
+            if name in self.plugins:
+                return self.plugins[name]
+            try:
+                module = importlib.import_module(manifest['module'])
+                plugin_class = getattr(module, manifest['entry_point'])
+                plugin = plugin_class()
+                if not plugin.initialize():
+                    self.health[name] = 'failed'
+                    return None
+            except Exception as e:
+                logger.error(f"Error loading plugin {name}: {str(e)}")
+                self.health[name] = f'error: {e}'
+                return None
+            with self._lock:
+                self._register(name, plugin, plugin_class)
+            return plugin
+
+    def _register(self, name: str, plugin: BasePlugin, plugin_class: Type) -> None:
+        self.plugins[name] = plugin
+        if issubclass(plugin_class, BaseDatabasePlugin):
+            self.database_plugins[name] = plugin
+        elif issubclass(plugin_class, BaseUIPlugin):
+            self.ui_plugins[name] = plugin
+        elif issubclass(plugin_class, BaseExportPlugin):
+            self.export_plugins[name] = plugin
+
+    def get_manifests(self, plugin_type: str = None) -> List[Dict[str, Any]]:
+        """Get discovered plugin manifests, optionally filtered by type"""
+        return [m for m in self.manifests.values() if plugin_type is None or m['type'] == plugin_type]
+
+    def find_plugin_for(self, fmt: str, plugin_type: str = None) -> Optional[BasePlugin]:
+        """Load the first plugin whose manifest lists ``fmt`` in 'supports'"""
+        for manifest in self.get_manifests(plugin_type):
+            if fmt.lower() in [s.lower() for s in manifest.get('supports', [])]:
+                plugin = self._load_plugin(manifest['name'])
+                if plugin:
+                    return plugin
+        return None
+
     def get_plugin(self, name: str) -> BasePlugin:
         """Get a plugin by name"""
-        return self.plugins.get(name)
-    
+        return self._load_plugin(name)
+
     def get_database_plugin(self, name: str) -> BaseDatabasePlugin:
         """Get a database plugin by name"""
+        self._load_plugin(name)
         return self.database_plugins.get(name)
-    
+
     def get_ui_plugin(self, name: str) -> BaseUIPlugin:
         """Get a UI plugin by name"""
+        self._load_plugin(name)
         return self.ui_plugins.get(name)
-    
+
     def get_export_plugin(self, name: str) -> BaseExportPlugin:
         """Get an export plugin by name"""
+        self._load_plugin(name)
         return self.export_plugins.get(name)
-    
+
     def get_all_plugins(self) -> List[BasePlugin]:
         """Get all loaded plugins"""
         return list(self.plugins.values())
-    
+
     def get_all_database_plugins(self) -> List[BaseDatabasePlugin]:
         """Get all database plugins"""
         return list(self.database_plugins.values())
-    
+
     def get_all_ui_plugins(self) -> List[BaseUIPlugin]:
         """Get all UI plugins"""
         return list(self.ui_plugins.values())
-    
+
     def get_all_export_plugins(self) -> List[BaseExportPlugin]:
         """Get all export plugins"""
         return list(self.export_plugins.values())
-    
+
+    def run_health_checks(self, timeout: float = HEALTH_CHECK_TIMEOUT) -> Dict[str, str]:
+        """
+        Load every discovered plugin and run its health check concurrently.
+
+        :param timeout: Seconds to wait for all checks before marking stragglers as timed out
+        :return: Plugin name -> 'ok', 'failed', 'timeout' or 'error: ...'
+        """
+        def check(name):
+            plugin = self._load_plugin(name)
+            if plugin is None:
+                return self.health.get(name, 'failed')
+            return 'ok' if plugin.health_check(timeout) else 'failed'
+
+        names = list(self.manifests)
+        results: Dict[str, str] = {}
+        if not names:
+            return results
+        executor = ThreadPoolExecutor(max_workers=min(8, len(names)), thread_name_prefix='plugin-health')
+        futures = {executor.submit(check, name): name for name in names}
+        done, _ = wait(futures, timeout=timeout)
+        for future, name in futures.items():
+            if future not in done:
+                results[name] = 'timeout'
+            elif future.exception() is not None:
+                results[name] = f'error: {future.exception()}'
+            else:
+                results[name] = future.result()
+        # Do not wait for stragglers; their threads finish in the background
+        executor.shutdown(wait=False)
+        with self._lock:
+            self.health.update(results)
+        return results
+
+    def run_health_checks_async(self, callback: Callable[[Dict[str, str]], None] = None,
+                                timeout: float = HEALTH_CHECK_TIMEOUT) -> threading.Thread:
+        """
+        Run health checks in a background thread.
+
+        Call it from the Tk thread: with a root window, the results are handed
+        over through a queue that the Tk thread polls, since Tk calls from
+        other threads are only safe on threaded Tcl builds.
+
+        :param callback: Called with the results on the Tk thread (or the worker thread without a root)
+        :param timeout: Per-run timeout passed to run_health_checks
+        """
+        results_queue: 'queue.Queue[Dict[str, str]]' = queue.Queue()
+
+        def worker():
+            results = self.run_health_checks(timeout)
+            if callback is None:
+                return
+            if self.root is not None:
+                results_queue.put(results)
+            else:
+                callback(results)
+
+        def poll():
+            try:
+                results = results_queue.get_nowait()
+            except queue.Empty:
+                self.root.after(HEALTH_CHECK_POLL_MS, poll)
+                return
+            callback(results)
+
+        thread = threading.Thread(target=worker, name='plugin-health-checks', daemon=True)
+        thread.start()
+        if callback is not None and self.root is not None:
+            self.root.after(HEALTH_CHECK_POLL_MS, poll)
+        return thread
+
     def shutdown(self) -> None:
         """Shutdown all plugins"""
         for plugin in self.plugins.values():
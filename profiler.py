@@ -0,0 +1,332 @@
+"""
+Streaming column profiler.
+
+Computes per-column statistics in a single pass over a handler's
+``iter_table()`` batches, using fixed-size sketches so memory does not grow
+with the number of rows:
+
+- null count, min and max
+- mean and standard deviation (Welford's online algorithm)
+- top-k values (SpaceSaving)
+- approximate distinct count (HyperLogLog)
+- histogram of numeric values (Ben-Haim & Tom-Tov streaming histogram)
+
+On SQL backends the exact statistics (counts, min/max, mean/stddev) are pushed
+down to aggregate queries, so the sketches are the only part that needs the rows.
+
+Example:
+    profiles = profile_table(handler, 'Employees')
+    print(profiles['salary']['mean'], profiles['dept']['top'])
+"""
+
+import bisect
+import decimal
+import heapq
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from tracing import span
+
+DEFAULT_TOP_K = 10
+# Registers of the HyperLogLog sketch are 2 ** precision (standard error ~1.04 / sqrt(2 ** p))
+DEFAULT_HLL_PRECISION = 12
+DEFAULT_HISTOGRAM_BINS = 20
+
+# Native type names with no MIN()/MAX() on some backend (PostgreSQL); such columns get COUNT() only
+_UNORDERED_TYPES = ('bool', 'uuid', 'json', 'bytea', 'xml', 'tsvector', 'hstore',
+                    'point', 'line', 'box', 'path', 'polygon', 'circle')
+
+_MASK64 = (1 << 64) - 1
+
+def _mix64(value: int) -> int:
+    """splitmix64 finalizer, spreading Python's hash() over all 64 bits."""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool)
+
+class HyperLogLog:
+    """Approximate distinct counter using 2 ** precision one-byte registers"""
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: Any) -> None:
+        hashed = _mix64(hash(value) & _MASK64)
+        index = hashed >> (64 - self.precision)
+        remaining = (hashed << self.precision) & _MASK64
+        # Position of the leftmost 1-bit in the remaining 64 - p bits
+        rank = 65 - remaining.bit_length() if remaining else 65 - self.precision
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+class SpaceSaving:
+    """Top-k frequent values with a fixed number of counters"""
+
+    def __init__(self, k: int = DEFAULT_TOP_K, capacity: int = None):
+        """
+        :param k: Number of values reported by top()
+        :param capacity: Counters kept; more counters give more accurate counts (default 10 * k)
+        """
+        self.k = k
+        self.capacity = capacity or 10 * k
+        self.counts: Dict[Any, int] = {}
+        self.errors: Dict[Any, int] = {}
+        # Min-heap of (count, sequence, value), one entry per counter. Increments leave the
+        # entry stale; evictions refresh stale entries as they reach the top (lazy invalidation)
+        self._heap: List[Tuple[int, int, Any]] = []
+        self._sequence = 0
+
+    def _push(self, count: int, value: Any) -> None:
+        # The sequence number breaks ties, so values themselves are never compared
+        self._sequence += 1
+        heapq.heappush(self._heap, (count, self._sequence, value))
+
+    def add(self, value: Any) -> None:
+        counts = self.counts
+        if value in counts:
+            counts[value] += 1
+        elif len(counts) < self.capacity:
+            counts[value] = 1
+            self.errors[value] = 0
+            self._push(1, value)
+        else:
+            # Replace the least frequent value; its count is an upper bound for the newcomer
+            heap = self._heap
+            while heap[0][0] != counts[heap[0][2]]:
+                _, _, stale = heapq.heappop(heap)
+                self._push(counts[stale], stale)
+            floor, _, victim = heapq.heappop(heap)
+            del counts[victim]
+            del self.errors[victim]
+            counts[value] = floor + 1
+            self.errors[value] = floor
+            self._push(floor + 1, value)
+
+    def top(self) -> List[Tuple[Any, int, int]]:
+        """Return up to k (value, count, maximum overestimate) tuples, most frequent first."""
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:self.k]
+        return [(value, count, self.errors[value]) for value, count in ranked]
+
+class StreamingHistogram:
+    """Histogram of at most ``max_bins`` (centroid, count) bins, merged as values arrive"""
+
+    def __init__(self, max_bins: int = DEFAULT_HISTOGRAM_BINS):
+        self.max_bins = max_bins
+        self.centroids: List[float] = []
+        self.counts: List[int] = []
+
+    def add(self, value: float) -> None:
+        index = bisect.bisect_left(self.centroids, value)
+        if index < len(self.centroids) and self.centroids[index] == value:
+            self.counts[index] += 1
+            return
+        self.centroids.insert(index, value)
+        self.counts.insert(index, 1)
+        if len(self.centroids) > self.max_bins:
+            self._merge_closest()
+
+    def _merge_closest(self) -> None:
+        centroids, counts = self.centroids, self.counts
+        i = min(range(len(centroids) - 1), key=lambda j: centroids[j + 1] - centroids[j])
+        total = counts[i] + counts[i + 1]
+        centroids[i] = (centroids[i] * counts[i] + centroids[i + 1] * counts[i + 1]) / total
+        counts[i] = total
+        del centroids[i + 1]
+        del counts[i + 1]
+
+    def bins(self) -> List[Tuple[float, int]]:
+        return list(zip(self.centroids, self.counts))
+
+class ColumnProfile:
+    """Running statistics for one column"""
+
+    def __init__(self, name: str, top_k: int = DEFAULT_TOP_K,
+                 hll_precision: int = DEFAULT_HLL_PRECISION,
+                 histogram_bins: int = DEFAULT_HISTOGRAM_BINS):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.numeric_count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.top_values = SpaceSaving(top_k)
+        self.distinct = HyperLogLog(hll_precision)
+        self.histogram = StreamingHistogram(histogram_bins)
+
+    def update(self, values: Sequence[Any], exact: bool = True) -> None:
+        """
+        Add a batch of values.
+
+        :param values: Column values, None for NULL
+        :param exact: Also update counts, min/max and moments (False when they came from SQL)
+        """
+        top_values, distinct, histogram = self.top_values, self.distinct, self.histogram
+        for value in values:
+            if exact:
+                self.count += 1
+            if value is None:
+                if exact:
+                    self.nulls += 1
+                continue
+            try:
+                top_values.add(value)
+                distinct.add(value)
+            except TypeError:
+                # Unhashable values (e.g. lists from MVO files) are only counted
+                pass
+            if _is_number(value):
+                number = float(value)
+                histogram.add(number)
+                if exact:
+                    self._add_number(number)
+            if exact:
+                self._add_extreme(value)
+
+    def _add_number(self, number: float) -> None:
+        # Welford's online mean and variance
+        self.numeric_count += 1
+        delta = number - self.mean
+        self.mean += delta / self.numeric_count
+        self._m2 += delta * (number - self.mean)
+
+    def _add_extreme(self, value: Any) -> None:
+        try:
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+        except TypeError:
+            # Values of a different type than the first one cannot be ordered
+            pass
+
+    def set_aggregates(self, count: int, non_null: int, minimum: Any, maximum: Any,
+                       total: Optional[float] = None, total_squares: Optional[float] = None) -> None:
+        """Fill the exact statistics from SQL aggregates."""
+        self.count = count
+        self.nulls = count - non_null
+        self.minimum = minimum
+        self.maximum = maximum
+        if total is not None and non_null:
+            self.numeric_count = non_null
+            self.mean = float(total) / non_null
+            # Sum of squared deviations from the sums; clamp rounding noise below zero
+            self._m2 = max(0.0, float(total_squares) - float(total) * float(total) / non_null)
+
+    @property
+    def stddev(self) -> Optional[float]:
+        if self.numeric_count < 2:
+            return None
+        return math.sqrt(self._m2 / (self.numeric_count - 1))
+
+    def to_dict(self) -> Dict[str, Any]:
+        numeric = self.numeric_count > 0
+        return {
+            'column': self.name,
+            'count': self.count,
+            'nulls': self.nulls,
+            'null_fraction': self.nulls / self.count if self.count else 0.0,
+            'min': self.minimum,
+            'max': self.maximum,
+            'mean': self.mean if numeric else None,
+            'stddev': self.stddev,
+            'distinct': self.distinct.count(),
+            'top': self.top_values.top(),
+            'histogram': self.histogram.bins() if numeric else [],
+        }
+
+def _run_aggregates(handler, expressions: List[str], table_name: str) -> List[Any]:
+    # Aliases keep the result keys unique (PostgreSQL names every COUNT() "count")
+    select = ', '.join(f'{expression} AS a{i}' for i, expression in enumerate(expressions))
+    row = handler.execute_query(f'SELECT {select} FROM {handler.quote_identifier(table_name)}')[0]
+    return [row[f'a{i}'] for i in range(len(expressions))]
+
+def _orderable(native_type: str) -> bool:
+    native_type = native_type.lower()
+    return not any(keyword in native_type for keyword in _UNORDERED_TYPES)
+
+def _aggregate_pushdown(handler, table_name: str, profiles: Dict[str, ColumnProfile]) -> None:
+    """Compute counts, min/max and sums for every column with aggregate queries."""
+    quote = handler.quote_identifier
+    columns = list(profiles)
+    types = dict(handler.get_column_types(table_name))
+    select = ['COUNT(*)']
+    for column in columns:
+        if _orderable(types.get(column) or ''):
+            select += [f'COUNT({quote(column)})', f'MIN({quote(column)})', f'MAX({quote(column)})']
+        else:
+            select += [f'COUNT({quote(column)})', 'NULL', 'NULL']
+    with span('profile_aggregates', table=table_name):
+        row = _run_aggregates(handler, select, table_name)
+    count = row[0]
+    numeric = []
+    for i, column in enumerate(columns):
+        non_null, minimum, maximum = row[1 + 3 * i:4 + 3 * i]
+        profiles[column].set_aggregates(count, non_null, minimum, maximum)
+        if _is_number(minimum):
+            numeric.append(column)
+    if not numeric:
+        return
+    # Sums for mean/stddev; "* 1.0" avoids integer overflow of the squares
+    select = []
+    for column in numeric:
+        select += [f'SUM({quote(column)} * 1.0)', f'SUM({quote(column)} * 1.0 * {quote(column)})']
+    with span('profile_moments', table=table_name):
+        row = _run_aggregates(handler, select, table_name)
+    for i, column in enumerate(numeric):
+        profile = profiles[column]
+        profile.set_aggregates(profile.count, profile.count - profile.nulls,
+                               profile.minimum, profile.maximum, row[2 * i], row[2 * i + 1])
+
+def profile_table(handler, table_name: str, columns: Sequence[str] = None,
+                  top_k: int = DEFAULT_TOP_K, hll_precision: int = DEFAULT_HLL_PRECISION,
+                  histogram_bins: int = DEFAULT_HISTOGRAM_BINS, pushdown: bool = True,
+                  sketches: bool = True, batch_size: int = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Profile the columns of a table in one streaming pass.
+
+    :param handler: Connected DatabaseHandler
+    :param table_name: Table to profile
+    :param columns: Columns to profile (all columns if omitted)
+    :param top_k: Number of most frequent values to report
+    :param hll_precision: HyperLogLog precision (registers = 2 ** precision)
+    :param histogram_bins: Maximum number of histogram bins
+    :param pushdown: Compute exact statistics with SQL aggregates where the backend supports SQL
+    :param sketches: Stream the rows for top-k, distinct counts and histograms; with
+        pushdown and sketches=False no rows are transferred at all
+    :param batch_size: Rows per batch (the handler's default if omitted)
+    :return: Column name -> statistics dictionary (see ColumnProfile.to_dict)
+    """
+    columns = list(columns or handler.get_columns(table_name))
+    profiles = {column: ColumnProfile(column, top_k, hll_precision, histogram_bins)
+                for column in columns}
+    use_sql = pushdown and (handler.SQL_QUERIES or handler.cache is not None)
+    if use_sql:
+        _aggregate_pushdown(handler, table_name, profiles)
+    if sketches or not use_sql:
+        exact = not use_sql
+        batches = handler.iter_table(table_name, batch_size or handler.DEFAULT_BATCH_SIZE,
+                                     columns=columns)
+        for batch in batches:
+            with span('profile_batch', rows=len(batch)):
+                for column, profile in profiles.items():
+                    profile.update([row.get(column) for row in batch], exact=exact)
+    return {column: profile.to_dict() for column, profile in profiles.items()}
@@ -0,0 +1,133 @@
+"""
+Log of the queries run through the handlers, grouped by normalized form.
+
+Every execute_query() call is recorded by the metrics
+instrumentation: literals and placeholders are replaced with ``?`` so the
+same query with different values is one entry (a fingerprint), which keeps
+the call count, total and maximum time, rows returned and the latest
+concrete query with its parameters. index_advisor.py turns this workload
+into index recommendations.
+
+The log keeps at most ``capacity`` fingerprints; when it is full, the entry
+with the least total time makes room.
+
+Example:
+    for entry in get_query_log().entries()[:10]:
+        print(entry.calls, f'{entry.total_seconds:.2f}s', entry.fingerprint)
+"""
+
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+# Distinct normalized queries kept
+DEFAULT_CAPACITY = 1000
+
+_NORMALIZE_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),                    # string literals
+    (re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.IGNORECASE), '?'),  # numbers
+    (re.compile(r'%\(\w+\)s|%s|\$\d+|(?<!:):\w+'), '?'),     # driver placeholders
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?)'),       # IN lists of any length
+    (re.compile(r'\s+'), ' '),
+)
+
+def normalize_query(query: str) -> str:
+    """Return a query with its literal values and placeholders replaced by ``?``."""
+    for pattern, replacement in _NORMALIZE_PATTERNS:
+        query = pattern.sub(replacement, query)
+    return query.strip().rstrip(';').strip()
+
+class QueryLogEntry:
+    """Statistics of one normalized query"""
+
+    def __init__(self, handler: str, fingerprint: str):
+        self.handler = handler
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.errors = 0
+        # Latest concrete query and parameters, for EXPLAIN
+        self.sample_query = ''
+        self.sample_params: Optional[tuple] = None
+        self.last_seen = 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'handler': self.handler,
+            'fingerprint': self.fingerprint,
+            'calls': self.calls,
+            'total_seconds': round(self.total_seconds, 6),
+            'mean_seconds': round(self.mean_seconds, 6),
+            'max_seconds': round(self.max_seconds, 6),
+            'rows': self.rows,
+            'errors': self.errors,
+            'sample_query': self.sample_query,
+        }
+
+class QueryLog:
+    """Thread-safe, bounded log of normalized queries"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._entries: Dict[tuple, QueryLogEntry] = {}
+
+    def record(self, handler: str, query: Optional[str], params: Optional[Sequence[Any]],
+               seconds: float, rows: int = 0, error: bool = False) -> None:
+        """
+        Record one run of a query.
+
+        :param handler: Handler class name
+        :param query: SQL as run
+        :param params: Its parameters
+        :param seconds: Wall time
+        :param rows: Rows returned
+        :param error: Whether the query failed
+        """
+        if not self.enabled or not query:
+            return
+        fingerprint = normalize_query(query)
+        key = (handler, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.capacity:
+                    cheapest = min(self._entries, key=lambda k: self._entries[k].total_seconds)
+                    del self._entries[cheapest]
+                entry = self._entries[key] = QueryLogEntry(handler, fingerprint)
+            entry.calls += 1
+            entry.total_seconds += seconds
+            entry.max_seconds = max(entry.max_seconds, seconds)
+            entry.rows += rows
+            entry.errors += int(error)
+            if not error:
+                entry.sample_query = query
+                entry.sample_params = tuple(params) if isinstance(params, (list, tuple)) else None
+            entry.last_seen = time.time()
+
+    def entries(self, handler: str = None) -> List[QueryLogEntry]:
+        """Return the entries, optionally of one handler class, by total time descending."""
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if handler is None or entry.handler == handler]
+        return sorted(entries, key=lambda entry: entry.total_seconds, reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'queries': [entry.to_dict() for entry in self.entries()]}
+
+QUERY_LOG = QueryLog()
+
+def get_query_log() -> QueryLog:
+    """Return the process-wide query log."""
+    return QUERY_LOG
@@ -0,0 +1,361 @@
+"""
+Query plans: parsing the backends' EXPLAIN output into one tree format.
+
+DatabaseHandler.explain() runs the backend's EXPLAIN and returns a QueryPlan
+of PlanNodes:
+
+- SQLite: ``EXPLAIN QUERY PLAN`` (no row estimates; with analyze=True the
+  query is run and timed as a whole)
+- PostgreSQL: ``EXPLAIN (FORMAT JSON)``, or ``EXPLAIN (ANALYZE, BUFFERS,
+  FORMAT JSON)`` for actual rows and time per node
+- MySQL: ``EXPLAIN FORMAT=JSON``, or ``EXPLAIN ANALYZE`` (8.0.18+, tree
+  format) for actual rows and time per node
+
+annotate() then flags the nodes that usually explain a slow query: full
+scans of large tables and sorts of many rows (and sorts spilled to disk).
+Table sizes come from the handler's estimate_row_count(), which reads
+statistics instead of counting.
+
+Example:
+    plan = handler.explain('SELECT * FROM orders WHERE customer = %s', ('ACME',), analyze=True)
+    for node, depth in plan.walk_with_depth():
+        print('  ' * depth + node.label(), node.warnings)
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Tables with at least this many rows are "large": full scans and sorts of them are flagged
+LARGE_TABLE_ROWS = 10000
+
+# MySQL access types -> operation names
+MYSQL_ACCESS_TYPES = {
+    'ALL': 'Full table scan', 'index': 'Full index scan', 'range': 'Index range scan',
+    'ref': 'Index lookup', 'eq_ref': 'Unique index lookup', 'ref_or_null': 'Index lookup',
+    'const': 'Constant lookup', 'system': 'Constant lookup', 'fulltext': 'Fulltext search',
+    'index_merge': 'Index merge', 'unique_subquery': 'Unique subquery', 'index_subquery': 'Index subquery',
+}
+
+# MySQL JSON plan keys holding lists of subqueries
+_MYSQL_SUBQUERY_KEYS = ('attached_subqueries', 'optimized_away_subqueries', 'order_by_subqueries',
+                        'group_by_subqueries', 'having_subqueries', 'select_list_subqueries')
+
+_SQL_KEYWORDS = {'where', 'on', 'using', 'join', 'inner', 'left', 'right', 'full', 'outer', 'cross',
+                 'natural', 'group', 'order', 'limit', 'having', 'union', 'window', 'offset',
+                 'straight_join', 'lateral', 'set', 'values', 'select'}
+_TABLE_REFERENCE = re.compile(
+    r'\b(?:from|join)\s+([`"\[]?[\w.]+[`"\]]?)(?:\s+(?:as\s+)?([A-Za-z_]\w*))?', re.IGNORECASE)
+_IDENTIFIER = re.compile(r'^[\w.]+$')
+_MYSQL_TREE_LINE = re.compile(r'^(\s*)-> (.*)$')
+_MYSQL_ESTIMATE = re.compile(r'\(cost=([\d.e+]+)(?:\.\.[\d.e+]+)? rows=([\d.e+]+)\)')
+_MYSQL_ACTUAL = re.compile(r'\(actual time=[\d.]+\.\.([\d.]+) rows=([\d.e+]+) loops=(\d+)\)')
+_MYSQL_TREE_RELATION = re.compile(r'\b(?:scan|lookup|search) on (\S+)', re.IGNORECASE)
+
+class PlanNode:
+    """One operation of a query plan"""
+
+    def __init__(self, operation: str, detail: str = '', relation: str = None, kind: str = None,
+                 estimated_rows: float = None, actual_rows: float = None, actual_ms: float = None,
+                 cost: float = None, spilled: bool = False):
+        """
+        :param operation: Operation name, e.g. 'Seq Scan', 'Sort', 'SEARCH'
+        :param detail: Backend-specific detail (index used, filter, sort key)
+        :param relation: Table (or alias) the operation reads
+        :param kind: 'full_scan' or 'sort' for operations that are flagged on large inputs
+        :param estimated_rows: Rows the planner expects the operation to return
+        :param actual_rows: Rows it returned, over all loops (analyzed plans)
+        :param actual_ms: Milliseconds it took including its children, over all loops (analyzed plans)
+        :param cost: Planner cost, in the backend's own units
+        :param spilled: Whether a sort or hash went to disk
+        """
+        self.operation = operation
+        self.detail = detail
+        self.relation = relation
+        self.kind = kind
+        self.estimated_rows = estimated_rows
+        self.actual_rows = actual_rows
+        self.actual_ms = actual_ms
+        self.cost = cost
+        self.spilled = spilled
+        # Table the relation resolves to, and its approximate size (set by annotate())
+        self.table: Optional[str] = None
+        self.table_rows: Optional[int] = None
+        self.children: List['PlanNode'] = []
+        self.warnings: List[str] = []
+
+    def label(self) -> str:
+        """Return the operation with its relation, e.g. 'Seq Scan on orders'."""
+        if self.relation and not re.search(r'\b' + re.escape(self.relation) + r'\b', self.operation):
+            return f'{self.operation} on {self.relation}'
+        return self.operation
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'operation': self.operation,
+            'detail': self.detail,
+            'relation': self.relation,
+            'table_rows': self.table_rows,
+            'estimated_rows': self.estimated_rows,
+            'actual_rows': self.actual_rows,
+            'actual_ms': self.actual_ms,
+            'cost': self.cost,
+            'warnings': self.warnings,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+class QueryPlan:
+    """Plan tree of a query, as returned by DatabaseHandler.explain()"""
+
+    def __init__(self, root: PlanNode, analyzed: bool = False, planning_ms: float = None,
+                 execution_ms: float = None):
+        self.root = root
+        self.analyzed = analyzed
+        self.planning_ms = planning_ms
+        self.execution_ms = execution_ms
+
+    def walk(self) -> Iterator[PlanNode]:
+        for node, _ in self.walk_with_depth():
+            yield node
+
+    def walk_with_depth(self) -> Iterator[Tuple[PlanNode, int]]:
+        """Yield (node, depth) pairs, parents before children."""
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            stack.extend((child, depth + 1) for child in reversed(node.children))
+
+    @property
+    def warnings(self) -> List[str]:
+        return [warning for node in self.walk() for warning in node.warnings]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'analyzed': self.analyzed,
+            'planning_ms': self.planning_ms,
+            'execution_ms': self.execution_ms,
+            'warnings': self.warnings,
+            'plan': self.root.to_dict(),
+        }
+
+def _number(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+def table_references(query: str) -> List[Tuple[str, Optional[str]]]:
+    """Return (table, alias or None) for the tables in a query's FROM and JOIN clauses."""
+    references = []
+    for match in _TABLE_REFERENCE.finditer(query):
+        alias = match.group(2)
+        if alias and alias.lower() in _SQL_KEYWORDS:
+            alias = None
+        references.append((match.group(1).strip('`"[]'), alias))
+    return references
+
+def table_aliases(query: str) -> Dict[str, str]:
+    """Map the aliases of the tables in a query's FROM and JOIN clauses to the table names."""
+    return {alias: table for table, alias in table_references(query) if alias}
+
+def parse_sqlite_plan(rows: List[Tuple[int, int, int, str]]) -> QueryPlan:
+    """Build a plan from ``EXPLAIN QUERY PLAN`` rows (id, parent, notused, detail)."""
+    root = PlanNode('Query')
+    nodes = {0: root}
+    for node_id, parent, _, detail in rows:
+        words = detail.split()
+        operation, relation, kind = words[0] if words else '', None, None
+        if (operation in ('SCAN', 'SEARCH') and len(words) > 1
+                and not words[1].startswith('(') and detail != 'SCAN CONSTANT ROW'):
+            relation = words[1]
+            if operation == 'SCAN':
+                # SCAN reads the whole table, or a whole index when followed by USING ... INDEX
+                kind = 'full_scan'
+        elif detail.startswith('USE TEMP B-TREE'):
+            kind = 'sort'
+        # The detail line ('SEARCH d USING INDEX ...') reads better than any shorter name
+        node = PlanNode(detail, detail, relation=relation, kind=kind)
+        nodes[node_id] = node
+        nodes.get(parent, root).children.append(node)
+    return QueryPlan(root)
+
+def _postgres_node(plan: Dict[str, Any]) -> PlanNode:
+    details = []
+    for key in ('Index Name', 'Join Type', 'Strategy', 'Sort Key', 'Index Cond', 'Hash Cond',
+                'Filter', 'Join Filter', 'Sort Method'):
+        value = plan.get(key)
+        if value:
+            details.append(f"{key}: {', '.join(value) if isinstance(value, list) else value}")
+    node_type = plan['Node Type']
+    kind = None
+    if node_type == 'Seq Scan':
+        kind = 'full_scan'
+    elif node_type in ('Sort', 'Incremental Sort'):
+        kind = 'sort'
+    loops = plan.get('Actual Loops') or 1
+    actual_rows = plan.get('Actual Rows')
+    actual_ms = plan.get('Actual Total Time')
+    node = PlanNode(
+        node_type, '; '.join(details), relation=plan.get('Relation Name'), kind=kind,
+        estimated_rows=_number(plan.get('Plan Rows')),
+        # Actual rows and time are averages per loop
+        actual_rows=_number(actual_rows * loops) if actual_rows is not None else None,
+        actual_ms=round(actual_ms * loops, 3) if actual_ms is not None else None,
+        cost=_number(plan.get('Total Cost')),
+        spilled=plan.get('Sort Space Type') == 'Disk' or bool(plan.get('Hash Batches', 1) > 1),
+    )
+    node.children = [_postgres_node(child) for child in plan.get('Plans', [])]
+    return node
+
+def parse_postgres_plan(document: Any) -> QueryPlan:
+    """Build a plan from ``EXPLAIN (FORMAT JSON)`` output (parsed or as text)."""
+    if isinstance(document, str):
+        document = json.loads(document)
+    top = document[0]
+    return QueryPlan(_postgres_node(top['Plan']), analyzed='Actual Rows' in top['Plan'],
+                     planning_ms=top.get('Planning Time'), execution_ms=top.get('Execution Time'))
+
+def _mysql_table(table: Dict[str, Any]) -> PlanNode:
+    access_type = table.get('access_type', '')
+    details = []
+    for key in ('key', 'ref', 'attached_condition'):
+        value = table.get(key)
+        if value:
+            details.append(f"{key}: {', '.join(value) if isinstance(value, list) else value}")
+    if table.get('using_index'):
+        details.append('covering index')
+    node = PlanNode(MYSQL_ACCESS_TYPES.get(access_type, access_type or 'Table'), '; '.join(details),
+                    relation=table.get('table_name'),
+                    kind='full_scan' if access_type in ('ALL', 'index') else None,
+                    estimated_rows=_number(table.get('rows_examined_per_scan')),
+                    cost=_number(table.get('cost_info', {}).get('prefix_cost')))
+    node.children = _mysql_children(table)
+    return node
+
+def _mysql_block(block: Dict[str, Any]) -> PlanNode:
+    node = PlanNode(f"Query block #{block.get('select_id', 1)}",
+                    cost=_number(block.get('cost_info', {}).get('query_cost')))
+    node.children = _mysql_children(block)
+    return node
+
+def _mysql_children(item: Dict[str, Any]) -> List[PlanNode]:
+    """Plan nodes for the operations nested in a MySQL JSON plan object."""
+    children = []
+    if 'table' in item:
+        children.append(_mysql_table(item['table']))
+    if 'nested_loop' in item:
+        node = PlanNode('Nested loop')
+        for step in item['nested_loop']:
+            node.children.extend(_mysql_children(step))
+        children.append(node)
+    if 'query_block' in item:
+        children.append(_mysql_block(item['query_block']))
+    if 'materialized_from_subquery' in item:
+        node = PlanNode('Materialize')
+        node.children = _mysql_children(item['materialized_from_subquery'])
+        children.append(node)
+    for key, operation in (('ordering_operation', 'Order'), ('grouping_operation', 'Group'),
+                           ('duplicates_removal', 'Distinct'), ('windowing', 'Window')):
+        if key not in item:
+            continue
+        value = item[key]
+        filesort = bool(value.get('using_filesort'))
+        details = [text for flag, text in ((filesort, 'filesort'),
+                                           (value.get('using_temporary_table'), 'temporary table'))
+                   if flag]
+        node = PlanNode(operation + (' (filesort)' if filesort else ''), ', '.join(details),
+                        kind='sort' if filesort else None)
+        node.children = _mysql_children(value)
+        children.append(node)
+    if 'union_result' in item:
+        node = PlanNode('Union')
+        for spec in item['union_result'].get('query_specifications', []):
+            node.children.extend(_mysql_children(spec))
+        children.append(node)
+    for key in _MYSQL_SUBQUERY_KEYS:
+        for subquery in item.get(key, []):
+            children.extend(_mysql_children(subquery))
+    return children
+
+def parse_mysql_plan(document: Any) -> QueryPlan:
+    """Build a plan from ``EXPLAIN FORMAT=JSON`` output (parsed or as text)."""
+    if isinstance(document, str):
+        document = json.loads(document)
+    return QueryPlan(_mysql_block(document['query_block']))
+
+def parse_mysql_tree(text: str) -> QueryPlan:
+    """Build a plan from ``EXPLAIN ANALYZE`` (tree format) output."""
+    root = PlanNode('Query')
+    # (indent, node) of the current line's ancestors
+    parents: List[Tuple[int, PlanNode]] = [(-1, root)]
+    for line in text.splitlines():
+        match = _MYSQL_TREE_LINE.match(line)
+        if not match:
+            continue
+        indent, description = len(match.group(1)), match.group(2)
+        operation = re.split(r'\s{2}\(|:', description, maxsplit=1)[0].strip()
+        relation = _MYSQL_TREE_RELATION.search(operation)
+        kind = None
+        if operation.startswith(('Table scan', 'Index scan', 'Covering index scan')):
+            kind = 'full_scan'
+        elif operation.startswith('Sort'):
+            kind = 'sort'
+        node = PlanNode(operation, description, relation=relation.group(1) if relation else None, kind=kind)
+        estimate = _MYSQL_ESTIMATE.search(description)
+        if estimate:
+            node.cost, node.estimated_rows = _number(estimate.group(1)), _number(estimate.group(2))
+        actual = _MYSQL_ACTUAL.search(description)
+        if actual:
+            loops = int(actual.group(3))
+            node.actual_ms = round(float(actual.group(1)) * loops, 3)
+            node.actual_rows = _number(float(actual.group(2)) * loops)
+        while parents[-1][0] >= indent:
+            parents.pop()
+        parents[-1][1].children.append(node)
+        parents.append((indent, node))
+    plan = QueryPlan(root, analyzed=True)
+    if len(root.children) == 1:
+        plan.root = root.children[0]
+        plan.execution_ms = plan.root.actual_ms
+    return plan
+
+def annotate(plan: QueryPlan, row_count: Callable[[str], Optional[int]], query: str = None,
+             large_rows: int = LARGE_TABLE_ROWS) -> QueryPlan:
+    """
+    Flag full scans of large tables and sorts of many rows.
+
+    :param plan: Plan to annotate in place
+    :param row_count: Returns the approximate row count of a table, or None
+    :param query: The explained query, to resolve table aliases
+    :param large_rows: Row count from which a table or sort counts as large
+    :return: The plan
+    """
+    aliases = table_aliases(query) if query else {}
+    sizes: Dict[str, Optional[int]] = {}
+    for node in plan.walk():
+        if not node.relation:
+            continue
+        node.table = aliases.get(node.relation, node.relation)
+        if node.table not in sizes:
+            sizes[node.table] = row_count(node.table) if _IDENTIFIER.match(node.table) else None
+        node.table_rows = sizes[node.table]
+    largest = max((size for size in sizes.values() if size is not None), default=None)
+    for node in plan.walk():
+        if node.kind == 'full_scan':
+            rows = next((count for count in (node.table_rows, node.actual_rows, node.estimated_rows)
+                         if count is not None), None)
+            if rows is not None and rows >= large_rows:
+                node.warnings.append(f'Full scan of {node.table} (~{rows:,} rows)')
+        elif node.kind == 'sort':
+            # SQLite and MySQL's JSON plans give no row counts for sorts; assume the largest table
+            rows = next((count for count in (node.actual_rows, node.estimated_rows, largest)
+                         if count is not None), None)
+            if rows is not None and rows >= large_rows:
+                node.warnings.append(f'Sort of ~{rows:,} rows')
+        if node.spilled:
+            node.warnings.append('Spilled to disk')
+    return plan
@@ -0,0 +1,170 @@
+"""
+Compact query results: one column header plus a tuple per row.
+
+A list of dictionaries repeats every column name in every row and pays for
+a hash table per row; a million-row result costs several hundred MB. A
+ResultSet stores the column names once and the values of each row as a
+tuple. Indexing or iterating it returns Row views: read-only mappings over
+the row's tuple that answer ``row['name']``, ``row.get()``, ``keys()``,
+``values()``, ``items()`` and ``dict(row)`` like the dictionaries handlers
+used to return. A view holds only two references and is made on access.
+
+Code that handles whole batches (CSV and JSON writers, bulk inserts, the
+grid) reads ``columns`` and the tuples in ``rows`` directly.
+
+Example:
+    result = handler.execute_query('SELECT id, name FROM customers')
+    print(result.columns)            # ('id', 'name')
+    print(result[0]['name'])         # row view
+    for customer_id, name in result.rows:
+        ...
+"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+class Row(Mapping):
+    """Read-only mapping view of one row of a ResultSet"""
+
+    __slots__ = ('_values', '_index')
+
+    def __init__(self, values: tuple, index: Dict[str, int]):
+        """
+        :param values: The row's values, in column order
+        :param index: Column name -> position, shared by all rows of a result
+        """
+        self._values = values
+        self._index = index
+
+    def __getitem__(self, column: str) -> Any:
+        return self._values[self._index[column]]
+
+    def get(self, column: str, default: Any = None) -> Any:
+        position = self._index.get(column)
+        return default if position is None else self._values[position]
+
+    def __contains__(self, column: object) -> bool:
+        return column in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def values(self) -> tuple:
+        """Return the row's values as a tuple, in column order."""
+        return self._values
+
+    def __repr__(self) -> str:
+        return repr(dict(zip(self._index, self._values)))
+
+    def __reduce__(self):
+        # Unpickled (sort run files, federated spill files) as a plain dictionary
+        return dict, (list(zip(self._index, self._values)),)
+
+class ResultSet:
+    """Rows of a query as a column header and one tuple per row"""
+
+    __slots__ = ('columns', 'index', 'rows')
+
+    def __init__(self, columns: Sequence[str], rows: List[tuple] = None):
+        """
+        :param columns: Column names
+        :param rows: Row values as tuples in column order (kept, not copied)
+        """
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.index: Dict[str, int] = {column: position for position, column in enumerate(self.columns)}
+        self.rows: List[tuple] = rows if rows is not None else []
+
+    @classmethod
+    def from_cursor(cls, cursor, rows: Sequence[Sequence[Any]]) -> 'ResultSet':
+        """Build a result from a DB-API cursor's description and the rows it fetched."""
+        columns = [description[0] for description in cursor.description or ()]
+        if rows and isinstance(rows[0], dict):
+            # Dictionary cursors
+            return cls.from_dicts(rows)
+        if rows and not isinstance(rows[0], tuple):
+            # e.g. pyodbc.Row
+            rows = [tuple(row) for row in rows]
+        return cls(columns, rows if isinstance(rows, list) else list(rows))
+
+    @classmethod
+    def from_dicts(cls, rows: Iterable[Dict[str, Any]], columns: Sequence[str] = None) -> 'ResultSet':
+        """
+        Build a result from row dictionaries (or other mappings).
+
+        :param columns: Column order; by default the keys of the rows in the order first seen.
+                        Keys a row lacks are None in its tuple.
+        """
+        rows = list(rows)
+        if columns is None:
+            columns = list(rows[0].keys()) if rows else []
+            known = set(columns)
+            for row in rows:
+                if len(row) != len(columns) or any(key not in known for key in row):
+                    # Rows with other keys (possible in MVO files) extend the header
+                    for key in row:
+                        if key not in known:
+                            known.add(key)
+                            columns.append(key)
+        return cls(columns, [tuple(row.get(column) for column in columns) for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[Row, 'ResultSet']:
+        if isinstance(item, slice):
+            return ResultSet(self.columns, self.rows[item])
+        return Row(self.rows[item], self.index)
+
+    def __iter__(self) -> Iterator[Row]:
+        index = self.index
+        for values in self.rows:
+            yield Row(values, index)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ResultSet):
+            return self.columns == other.columns and self.rows == other.rows
+        if isinstance(other, list):
+            return len(self) == len(other) and all(row == item for row, item in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'ResultSet(columns={list(self.columns)}, rows={len(self.rows)})'
+
+    def append(self, values: Sequence[Any]) -> None:
+        self.rows.append(tuple(values))
+
+    def extend(self, other: Union['ResultSet', Iterable[Dict[str, Any]]]) -> None:
+        """Add the rows of another result with the same or other columns, or of row mappings."""
+        if isinstance(other, ResultSet) and other.columns == self.columns:
+            self.rows.extend(other.rows)
+        else:
+            self.rows.extend(tuple(row.get(column) for column in self.columns) for row in other)
+
+    def column(self, name: str) -> List[Any]:
+        """Return the values of one column."""
+        position = self.index[name]
+        return [values[position] for values in self.rows]
+
+    def project(self, columns: Sequence[str]) -> 'ResultSet':
+        """Return the given columns only, in that order; unknown columns are None."""
+        positions = [self.index.get(column) for column in columns]
+        rows = [tuple(None if position is None else values[position] for position in positions)
+                for values in self.rows]
+        return ResultSet(columns, rows)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Return the rows as dictionaries."""
+        columns = self.columns
+        return [dict(zip(columns, values)) for values in self.rows]
+
+def as_result_set(rows: Union[ResultSet, Iterable[Dict[str, Any]]], columns: Optional[Sequence[str]] = None) -> ResultSet:
+    """Return rows as a ResultSet, converting row dictionaries (e.g. from plugins or a sort)."""
+    if isinstance(rows, ResultSet):
+        return rows
+    return ResultSet.from_dicts(rows, columns)
@@ -0,0 +1,236 @@
+"""
+Resumable, checkpointed CSV exports.
+
+export_resumable() writes the export to ``<output>.part`` and regularly
+records a checkpoint in ``<output>.checkpoint.json``: the key of the last
+row written, the size of the part file and the SHA-256 of its contents.
+
+Started again after a crash or a cancel, the export checks the part file
+against the checkpoint, truncates it to the checkpointed size (dropping rows
+written after the checkpoint) and continues after the last key with a
+keyset seek, ``WHERE key > last ORDER BY key``, which an index on the key
+answers without reading the rows already exported. dBase and MVO files
+continue at the next record number. Once every row is written, the part
+file is renamed over the output file, so the output is never left half-written.
+
+Compressed exports work too: the compressor is flushed at each checkpoint so
+the part file ends on a complete gzip member or zstd frame.
+
+Example:
+    export_resumable(handler, 'orders', 'orders.csv.gz')   # run again to resume
+"""
+
+import csv
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from compression import ParallelCompressedWriter, compression_from_path, open_export_file
+from incremental_export import decode_value, encode_value
+from tracing import span
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHECKPOINT_ROWS = 100000
+DEFAULT_CHECKPOINT_SECONDS = 30.0
+PART_SUFFIX = '.part'
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger('ResumableExport')
+
+def checkpoint_path(output_path: str) -> str:
+    return output_path + CHECKPOINT_SUFFIX
+
+def part_path(output_path: str) -> str:
+    return output_path + PART_SUFFIX
+
+def discard_checkpoint(output_path: str) -> None:
+    """Delete the part file and checkpoint of an interrupted export."""
+    for path in (part_path(output_path), checkpoint_path(output_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def resume_key(handler, table_name: str, key_columns: Sequence[str] = None) -> Optional[List[str]]:
+    """
+    Return the columns an export of the table can resume from.
+
+    :return: Key columns for a keyset seek, an empty list when the export resumes
+             at a record number (dBase, MVO), or None when it cannot be resumed
+    """
+    if key_columns:
+        return list(key_columns)
+    if handler.ROW_WATERMARK == 'record_count':
+        return []
+    return handler.get_primary_key(table_name) or None
+
+def _hash_file(path: str, start: int, end: int, hasher) -> None:
+    """Add bytes [start, end) of a file to a running hash."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+
+def _sync(f, path: str, offset: int, hasher) -> int:
+    """Push everything written to disk; return the new file size, updating the hash."""
+    f.flush()
+    raw = getattr(getattr(f, 'buffer', None), 'raw', None)
+    if isinstance(raw, ParallelCompressedWriter):
+        raw.sync()
+    else:
+        os.fsync(f.fileno())
+    size = os.path.getsize(path)
+    _hash_file(path, offset, size, hasher)
+    return size
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def _load_checkpoint(output_path: str, table_name: str, key: List[str],
+                     compression: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Return a checkpoint matching this export and its part file, or None."""
+    path = checkpoint_path(output_path)
+    part = part_path(output_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if (checkpoint.get('table') != table_name or checkpoint.get('key') != key
+            or checkpoint.get('compression') != compression):
+        logger.warning(f"Checkpoint {path} belongs to another export; starting over")
+        return None
+    if not os.path.exists(part) or os.path.getsize(part) < checkpoint['bytes']:
+        logger.warning(f"{part} is shorter than its checkpoint; starting over")
+        return None
+    # Rows written after the checkpoint are dropped and exported again
+    with open(part, 'r+b') as f:
+        f.truncate(checkpoint['bytes'])
+    hasher = hashlib.sha256()
+    _hash_file(part, 0, checkpoint['bytes'], hasher)
+    if hasher.hexdigest() != checkpoint['sha256']:
+        logger.warning(f"{part} does not match its checkpoint checksum; starting over")
+        return None
+    checkpoint['hasher'] = hasher
+    return checkpoint
+
+def export_resumable(handler, table_name: str, output_path: str, key_columns: Sequence[str] = None,
+                     compression: str = 'auto', batch_size: int = DEFAULT_BATCH_SIZE,
+                     checkpoint_rows: int = DEFAULT_CHECKPOINT_ROWS,
+                     checkpoint_seconds: float = DEFAULT_CHECKPOINT_SECONDS,
+                     cancel_event=None) -> Dict[str, Any]:
+    """
+    Export a table to CSV, resuming an interrupted export of the same file.
+
+    :param handler: Connected DatabaseHandler
+    :param table_name: Table to export
+    :param output_path: Output file (.gz or .zst suffixes compress it)
+    :param key_columns: Unique, non-NULL columns to order and resume by (the primary key by default)
+    :param compression: None, 'gzip', 'zstd', or 'auto' to pick it from the suffix
+    :param batch_size: Rows per batch
+    :param checkpoint_rows: Rows written between checkpoints
+    :param checkpoint_seconds: Seconds between checkpoints
+    :param cancel_event: threading.Event; when set, the export checkpoints and stops
+    :return: Dictionary with the rows written in total, whether the export is complete,
+             and the row count it resumed from
+    """
+    if compression == 'auto':
+        compression = compression_from_path(output_path)
+    key = resume_key(handler, table_name, key_columns)
+    if key is None:
+        raise ValueError(f"{table_name} has no primary key; pass key_columns to export it resumably")
+    part = part_path(output_path)
+    checkpoint = _load_checkpoint(output_path, table_name, key, compression)
+    if checkpoint:
+        hasher = checkpoint.pop('hasher')
+        offset, rows, last = checkpoint['bytes'], checkpoint['rows'], checkpoint['last']
+        last = tuple(decode_value(value) for value in last) if len(key) > 1 else decode_value(last)
+        logger.info(f"Resuming export of {table_name} after {rows} rows")
+    else:
+        discard_checkpoint(output_path)
+        hasher = hashlib.sha256()
+        offset, rows, last = 0, 0, None
+    resumed_from = rows
+
+    columns = handler.get_columns(table_name)
+    extra = [column for column in key if column not in columns]
+    if key:
+        seek = key[0] if len(key) == 1 else tuple(key)
+        filters = [(seek, '>', last)] if last is not None else None
+        batches = handler.iter_table(table_name, batch_size, columns=columns + extra if extra else None,
+                                     filters=filters, order_by=key)
+    else:
+        start = last
+        end = handler.row_position(table_name)
+        if start is not None and end < start:
+            raise ValueError(f"{table_name} has fewer records than when the export was checkpointed; "
+                             f"delete {checkpoint_path(output_path)} to start over")
+        batches = handler.iter_rows_after(table_name, start, end, batch_size)
+
+    def save(size: int) -> None:
+        encoded = [encode_value(value) for value in last] if isinstance(last, tuple) else encode_value(last)
+        _save_checkpoint(checkpoint_path(output_path), {
+            'table': table_name,
+            'key': key,
+            'compression': compression,
+            'last': encoded,
+            'rows': rows,
+            'bytes': size,
+            'sha256': hasher.hexdigest(),
+            'updated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        })
+
+    cancelled = False
+    with span('export_resumable', table=table_name, resumed_from=resumed_from):
+        with open_export_file(part, compression, append=checkpoint is not None) as f:
+            writer = csv.writer(f)
+            if checkpoint is None:
+                writer.writerow(columns)
+            since_rows, since_time = 0, time.monotonic()
+            for batch in batches:
+                if not batch:
+                    continue
+                with span('write', rows=len(batch)):
+                    writer.writerows([[row.get(column) for column in columns] for row in batch])
+                rows += len(batch)
+                since_rows += len(batch)
+                if not key:
+                    last = (last or 0) + len(batch)
+                elif len(key) == 1:
+                    last = batch[-1][key[0]]
+                else:
+                    last = tuple(batch[-1][column] for column in key)
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                if (cancelled or since_rows >= checkpoint_rows
+                        or time.monotonic() - since_time >= checkpoint_seconds):
+                    with span('checkpoint', rows=rows):
+                        offset = _sync(f, part, offset, hasher)
+                        save(offset)
+                    since_rows, since_time = 0, time.monotonic()
+                    if cancelled:
+                        break
+        close = getattr(batches, 'close', None)
+        if close is not None:
+            close()
+
+    if cancelled:
+        logger.info(f"Export of {table_name} cancelled after {rows} rows; run it again to resume")
+    else:
+        os.replace(part, output_path)
+        if os.path.exists(checkpoint_path(output_path)):
+            os.remove(checkpoint_path(output_path))
+        logger.info(f"Exported {rows} rows of {table_name} to {output_path}")
+    return {'table': table_name, 'rows': rows, 'complete': not cancelled, 'resumed_from': resumed_from,
+            'output_path': output_path if not cancelled else part}
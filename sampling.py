@@ -0,0 +1,102 @@
+"""
+Random samples of tables for quick previews.
+
+Handlers implement sample_table() with the fastest method their backend has:
+
+- PostgreSQL: ``TABLESAMPLE SYSTEM`` (random pages) on large tables,
+  ``TABLESAMPLE BERNOULLI`` (random rows) on smaller ones
+- SQLite: random probes into the rowid range, one index seek per row
+- dBase and MVO: reads of random record numbers
+- MySQL: rows picked on the server with ``RAND()``
+- Access and plugins: reservoir_sample() over the streamed table
+
+reservoir_sample() uses Li's Algorithm L, which draws how many rows to skip
+before the next replacement instead of a random number per row, so whole
+batches are passed over without looking at their rows.
+
+Example:
+    preview = handler.sample_table('events', 1000)
+    print(f'{len(preview)} of ~{handler.estimate_row_count("events")} rows')
+"""
+
+import math
+import random
+from typing import Iterable, List, Optional
+
+from result_set import ResultSet, as_result_set
+
+# Rows shown by a preview
+DEFAULT_SAMPLE_SIZE = 1000
+# Pages or rows sampled beyond the requested count, since TABLESAMPLE returns a varying number
+OVERSAMPLE_FACTOR = 2.0
+# Tables estimated above this many rows are sampled by page (SYSTEM) rather than by row (BERNOULLI)
+BLOCK_SAMPLE_MIN_ROWS = 1000000
+# Random probes per requested row before a rowid sample gives up on sparse ranges
+MAX_PROBES_PER_ROW = 4
+# First TABLESAMPLE percentage tried on a table without a row count estimate
+UNKNOWN_SIZE_PERCENT = 0.01
+
+def check_sample_size(size: Optional[int]) -> int:
+    """Return the sample size to use, DEFAULT_SAMPLE_SIZE if none is given."""
+    if size is None:
+        return DEFAULT_SAMPLE_SIZE
+    if size < 1:
+        raise ValueError("Sample size must be positive")
+    return size
+
+def reservoir_sample(batches: Iterable[ResultSet], size: Optional[int],
+                     rng: Optional[random.Random] = None) -> ResultSet:
+    """
+    Return a uniform random sample of ``size`` rows of a batch stream, in one pass.
+
+    :param batches: Iterable of row batches, e.g. a handler's iter_table()
+    :param size: Rows to keep (DEFAULT_SAMPLE_SIZE if None); all rows are returned if there are fewer
+    :param rng: Random number generator (for repeatable samples)
+    """
+    size = check_sample_size(size)
+    rng = rng or random.Random()
+    columns = None
+    reservoir: List[tuple] = []
+    # Position of the next row to enter the reservoir once it is full
+    next_index = size
+    weight = 1.0
+    seen = 0
+    for batch in batches:
+        batch = as_result_set(batch)
+        if columns is None:
+            columns = batch.columns
+        rows = batch.rows
+        position = 0
+        if len(reservoir) < size:
+            position = min(size - len(reservoir), len(rows))
+            reservoir.extend(rows[:position])
+            if len(reservoir) == size:
+                weight = math.exp(math.log(1.0 - rng.random()) / size)
+                next_index = size + _skip(rng, weight)
+        while seen + position <= next_index < seen + len(rows):
+            reservoir[rng.randrange(size)] = rows[next_index - seen]
+            weight *= math.exp(math.log(1.0 - rng.random()) / size)
+            next_index += _skip(rng, weight) + 1
+        seen += len(rows)
+    return ResultSet(columns or (), reservoir)
+
+def _skip(rng: random.Random, weight: float) -> int:
+    # Rows passed over before the next replacement: geometric with success probability weight
+    # (1 - random() is never 0, so its logarithm is defined)
+    if weight >= 1.0:
+        return 0
+    return int(math.log(1.0 - rng.random()) / math.log(1.0 - weight))
+
+def sample_percent(size: int, estimate: Optional[int]) -> float:
+    """Return the TABLESAMPLE percentage expected to yield about ``size`` rows with some to spare."""
+    if estimate is None:
+        return UNKNOWN_SIZE_PERCENT
+    if not estimate:
+        return 100.0
+    return min(100.0, 100.0 * size * OVERSAMPLE_FACTOR / estimate)
+
+def sample_indexes(count: int, size: int, rng: random.Random) -> List[int]:
+    """Return ``size`` distinct random positions below ``count`` (all of them if fewer), in order."""
+    if count <= size:
+        return list(range(count))
+    return sorted(rng.sample(range(count), size))
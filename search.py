@@ -0,0 +1,183 @@
+"""
+Full-text search over table rows.
+
+InvertedIndex maps every word of every value to the positions of the rows
+containing it. It is built incrementally (in a background thread for the rows
+shown in the grid), so searches can run while indexing is still in progress
+and return matching row positions without scanning the table.
+
+search_table() answers a search on the database itself where the backend has
+full-text support (SQLite FTS5 table, PostgreSQL tsvector, MySQL FULLTEXT
+index) and falls back to a single streaming scan of the table.
+"""
+
+import bisect
+import re
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from tracing import span
+
+# Rows indexed between two lock releases, so searches are not starved while building
+INDEX_CHUNK_ROWS = 5000
+
+_WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words."""
+    return _WORD_PATTERN.findall(text.lower())
+
+def search_terms(text: str) -> List[Tuple[str, bool]]:
+    """
+    Split a search string into (word, is_prefix) pairs for backend full-text queries.
+
+    A trailing ``*`` marks a prefix search on the last word of that term.
+    """
+    terms = []
+    for term in text.split():
+        words = tokenize(term)
+        for i, word in enumerate(words):
+            terms.append((word, term.endswith('*') and i == len(words) - 1))
+    return terms
+
+class InvertedIndex:
+    """Word -> sorted row positions, built incrementally and safe to query while building"""
+
+    def __init__(self, columns: Sequence[str] = None):
+        """
+        :param columns: Columns to index (all columns if omitted)
+        """
+        self.columns = list(columns) if columns else None
+        self.postings: Dict[str, array] = {}
+        self.row_count = 0
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancelled = False
+
+    def add_rows(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Index rows, numbering them after the rows already indexed."""
+        for offset in range(0, len(rows), INDEX_CHUNK_ROWS):
+            chunk = rows[offset:offset + INDEX_CHUNK_ROWS]
+            # Tokenize outside the lock; only the postings update needs it
+            entries = []
+            for row in chunk:
+                values = row.values() if self.columns is None else [row.get(c) for c in self.columns]
+                words = set()
+                for value in values:
+                    if value is not None:
+                        words.update(tokenize(str(value)))
+                entries.append(words)
+            with self._lock:
+                postings = self.postings
+                position = self.row_count
+                for words in entries:
+                    for word in words:
+                        posting = postings.get(word)
+                        if posting is None:
+                            posting = postings[word] = array('L')
+                        posting.append(position)
+                    position += 1
+                self.row_count = position
+
+    def build(self, batches: Iterable[Sequence[Dict[str, Any]]]) -> None:
+        """Index every batch of rows, e.g. from a handler's iter_table()."""
+        try:
+            for batch in batches:
+                if self._cancelled:
+                    return
+                with span('index_batch', rows=len(batch)):
+                    self.add_rows(batch)
+        finally:
+            self.done.set()
+
+    def build_async(self, batches: Iterable[Sequence[Dict[str, Any]]]) -> threading.Thread:
+        """Build the index in a background thread; search() works on the rows indexed so far."""
+        self._thread = threading.Thread(target=self.build, args=(batches,),
+                                        name='search-indexer', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def cancel(self) -> None:
+        """Stop a background build after the current batch."""
+        self._cancelled = True
+
+    def search(self, text: str) -> List[int]:
+        """
+        Return the positions of rows containing every word of ``text``.
+
+        A trailing ``*`` on a word matches any word with that prefix.
+        """
+        terms = text.lower().split()
+        if not terms:
+            return []
+        with self._lock:
+            postings = []
+            for term in terms:
+                postings.extend(self._postings(term))
+        if not postings or any(len(posting) == 0 for posting in postings):
+            return []
+        # Walk the rarest posting list and binary-search the others
+        postings.sort(key=len)
+        matches = list(postings[0])
+        for posting in postings[1:]:
+            matches = [position for position in matches if _contains(posting, position)]
+            if not matches:
+                break
+        return matches
+
+    def _postings(self, term: str) -> List[Sequence[int]]:
+        """Return the sorted posting lists that must all contain a matching row."""
+        if term.endswith('*'):
+            prefix = term[:-1]
+            positions = set()
+            for word, posting in self.postings.items():
+                if word.startswith(prefix):
+                    positions.update(posting)
+            return [sorted(positions)]
+        # A term like "o'neil" tokenizes to several words that must all match
+        return [self.postings.get(word, ()) for word in tokenize(term)]
+
+def _contains(posting: Sequence[int], position: int) -> bool:
+    index = bisect.bisect_left(posting, position)
+    return index < len(posting) and posting[index] == position
+
+def _term_matches(term: str, words: set) -> bool:
+    if term.endswith('*'):
+        return any(word.startswith(term[:-1]) for word in words)
+    return all(word in words for word in tokenize(term))
+
+def search_table(handler, table_name: str, text: str, columns: Sequence[str] = None,
+                 limit: int = None, pushdown: bool = True) -> List[Dict[str, Any]]:
+    """
+    Return the rows of a table containing every word of ``text``.
+
+    :param handler: Connected DatabaseHandler
+    :param table_name: Table to search
+    :param text: Words to search for
+    :param columns: Columns to search (all text columns on SQL backends if omitted)
+    :param limit: Maximum number of rows returned
+    :param pushdown: Use the backend's full-text search when it is available
+    """
+    if pushdown:
+        rows = handler.search_rows(table_name, text, columns, limit)
+        if rows is not None:
+            return rows
+    terms = text.lower().split()
+    if not terms:
+        return []
+    # Without backend support the table is scanned once; no index is kept in memory
+    rows = []
+    for batch in handler.iter_table(table_name):
+        for row in batch:
+            values = row.values() if not columns else [row.get(c) for c in columns]
+            words = set()
+            for value in values:
+                if value is not None:
+                    words.update(tokenize(str(value)))
+            if all(_term_matches(term, words) for term in terms):
+                rows.append(row)
+                if limit is not None and len(rows) >= limit:
+                    return rows
+    return rows
@@ -0,0 +1,307 @@
+"""
+Fast JSON serialization of row batches.
+
+RowSerializer turns batches of rows (ResultSets or row dictionaries) into JSON Lines (one object per
+line) or the elements of a JSON array. It uses orjson when installed;
+otherwise each column gets an encoder picked from the type of its values and
+cached, and the ``"column":`` key prefixes are encoded once, so a row costs
+one encoder call per value instead of a full ``json.dumps``.
+
+Values JSON has no type for are encoded as:
+
+- date, datetime, time: ISO 8601 strings
+- Decimal: JSON numbers
+- bytes: base64 strings
+- NaN and infinity: null
+
+Example:
+    count = write_json(handler.iter_table('orders'), 'orders.ndjson.gz')
+"""
+
+import base64
+import csv
+import datetime
+import decimal
+import importlib
+import io
+import json
+import math
+import uuid
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from compression import open_export_file
+from result_set import ResultSet
+from tracing import span
+
+# Output format names accepted by write_json()
+JSON_FORMATS = {'ndjson': 'ndjson', 'jsonl': 'ndjson', 'json': 'json'}
+# Content types of the formats encode_batches() produces
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson',
+                 'json': 'application/json'}
+
+try:
+    from json.encoder import c_encode_basestring as _encode_string
+except ImportError:
+    _encode_string = None
+if _encode_string is None:
+    from json.encoder import py_encode_basestring as _encode_string
+
+def _encode_float(value: float) -> str:
+    if math.isfinite(value):
+        return repr(value)
+    return 'null'
+
+def _encode_decimal(value: decimal.Decimal) -> str:
+    if value.is_finite():
+        return str(value)
+    return 'null'
+
+def _encode_bytes(value: bytes) -> str:
+    return '"' + base64.b64encode(value).decode('ascii') + '"'
+
+def _encode_isoformat(value) -> str:
+    return '"' + value.isoformat() + '"'
+
+def _encode_fallback(value: Any) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+def _json_default(value: Any) -> Any:
+    """``default`` hook for json/orjson covering the types above."""
+    if isinstance(value, decimal.Decimal):
+        return float(value) if value.is_finite() else None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Mapping):
+        # ResultSet row views
+        return dict(value)
+    return str(value)
+
+# Exact type -> encoder; subclasses fall back to _encode_fallback
+_ENCODERS: Dict[type, Callable[[Any], str]] = {
+    str: _encode_string,
+    int: str,
+    bool: lambda value: 'true' if value else 'false',
+    float: _encode_float,
+    type(None): lambda value: 'null',
+    decimal.Decimal: _encode_decimal,
+    bytes: _encode_bytes,
+    bytearray: lambda value: _encode_bytes(bytes(value)),
+    memoryview: lambda value: _encode_bytes(bytes(value)),
+    datetime.date: _encode_isoformat,
+    datetime.datetime: _encode_isoformat,
+    datetime.time: _encode_isoformat,
+    uuid.UUID: lambda value: '"' + str(value) + '"',
+}
+
+def _encode_items(items: Iterable[Tuple[Any, Any]]) -> str:
+    """Encode (key, value) pairs as a JSON object with the encoders above."""
+    return '{' + ','.join(_encode_string(str(key)) + ':' + _ENCODERS.get(type(value), _encode_fallback)(value)
+                          for key, value in items) + '}'
+
+def _load_orjson():
+    try:
+        return importlib.import_module('orjson')
+    except ImportError:
+        return None
+
+class RowSerializer:
+    """Serializes batches of row dictionaries to UTF-8 JSON"""
+
+    def __init__(self, use_orjson: bool = True):
+        """
+        :param use_orjson: Use orjson when it is installed
+        """
+        self.orjson = _load_orjson() if use_orjson else None
+        # orjson.Fragment (orjson 3.9+) writes Decimals with their exact digits; without it,
+        # rows holding Decimals are encoded by the pure-Python encoders (see _dumps_exact)
+        self._fragment = getattr(self.orjson, 'Fragment', None)
+        self.columns: Optional[List[str]] = None
+        self._prefixes: List[str] = []
+        self._encoders: List[Optional[Callable[[Any], str]]] = []
+        self._types: List[Optional[type]] = []
+
+    def _prepare(self, columns: Sequence[str]) -> None:
+        self.columns = list(columns)
+        self._prefixes = [('{' if i == 0 else ',') + _encode_string(str(column)) + ':'
+                          for i, column in enumerate(self.columns)]
+        self._encoders = [None] * len(self.columns)
+        self._types = [None] * len(self.columns)
+
+    def _encoder(self, index: int, value: Any) -> Callable[[Any], str]:
+        value_type = type(value)
+        if value_type is not self._types[index]:
+            # Cache the encoder per column; NULLs do not replace the column's encoder
+            encoder = _ENCODERS.get(value_type, _encode_fallback)
+            if value is None:
+                return encoder
+            self._types[index] = value_type
+            self._encoders[index] = encoder
+        return self._encoders[index]
+
+    def _orjson_default(self, value: Any) -> Any:
+        if isinstance(value, decimal.Decimal) and value.is_finite():
+            if self._fragment is None:
+                raise TypeError("Decimal needs orjson.Fragment")
+            return self._fragment(str(value))
+        return _json_default(value)
+
+    def _dumps_exact(self, row: Mapping) -> bytes:
+        try:
+            return self.orjson.dumps(row, default=self._orjson_default, option=self.orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson.JSONEncodeError is a TypeError; older orjson cannot write a Decimal exactly
+            return _encode_items(row.items()).encode('utf-8')
+
+    def encode_rows(self, rows: Union[ResultSet, Sequence[Dict[str, Any]]]) -> List[bytes]:
+        """Return the JSON encoding of each row."""
+        if isinstance(rows, ResultSet):
+            return self._encode_result_set(rows)
+        if self.orjson is not None:
+            if self._fragment is None:
+                return [self._dumps_exact(row) for row in rows]
+            dumps = self.orjson.dumps
+            option = self.orjson.OPT_NON_STR_KEYS
+            return [dumps(row, default=self._orjson_default, option=option) for row in rows]
+        if not rows:
+            return []
+        if self.columns is None:
+            self._prepare(list(rows[0].keys()))
+        columns, prefixes = self.columns, self._prefixes
+        encoder = self._encoder
+        encoded = []
+        for row in rows:
+            try:
+                if len(row) != len(columns):
+                    raise KeyError
+                parts = []
+                for i, column in enumerate(columns):
+                    value = row[column]
+                    parts.append(prefixes[i])
+                    parts.append(encoder(i, value)(value))
+            except KeyError:
+                # Rows with other keys (possible in MVO files) are encoded on their own
+                encoded.append(_encode_fallback(row).encode('utf-8'))
+                continue
+            parts.append('}')
+            encoded.append(''.join(parts).encode('utf-8'))
+        return encoded
+
+    def _encode_result_set(self, rows: ResultSet) -> List[bytes]:
+        columns = rows.columns
+        if self.orjson is not None:
+            if self._fragment is None:
+                return [self._dumps_exact(dict(zip(columns, values))) for values in rows.rows]
+            dumps = self.orjson.dumps
+            option = self.orjson.OPT_NON_STR_KEYS
+            return [dumps(dict(zip(columns, values)), default=self._orjson_default, option=option)
+                    for values in rows.rows]
+        if not columns:
+            return [b'{}'] * len(rows)
+        if self.columns is None or tuple(self.columns) != columns:
+            self._prepare(columns)
+        prefixes = self._prefixes
+        encoder = self._encoder
+        encoded = []
+        for values in rows.rows:
+            parts = []
+            for i, value in enumerate(values):
+                parts.append(prefixes[i])
+                parts.append(encoder(i, value)(value))
+            parts.append('}')
+            encoded.append(''.join(parts).encode('utf-8'))
+        return encoded
+
+def write_json(batches: Iterable[Sequence[Dict[str, Any]]], output_path: str,
+               fmt: str = 'ndjson', compression: str = 'auto', use_orjson: bool = True,
+               append: bool = False) -> int:
+    """
+    Stream row batches to a JSON Lines or JSON array file.
+
+    :param batches: Iterable of row batches, e.g. a handler's iter_table()
+    :param output_path: Output file
+    :param fmt: 'ndjson' (or 'jsonl') for one object per line, 'json' for an array
+    :param compression: None, 'gzip', 'zstd', or 'auto' to pick it from the suffix
+    :param use_orjson: Use orjson when it is installed
+    :param append: Add the rows to the end of an existing JSON Lines file
+    :return: Number of rows written
+    """
+    if fmt not in JSON_FORMATS:
+        raise ValueError(f"Unsupported JSON format: {fmt}")
+    array = JSON_FORMATS[fmt] == 'json'
+    if array and append:
+        raise ValueError("Rows cannot be appended to a JSON array file; use the ndjson format")
+    serializer = RowSerializer(use_orjson)
+    count = 0
+    with open_export_file(output_path, compression, binary=True, append=append) as f:
+        if array:
+            f.write(b'[')
+        for batch in batches:
+            if not batch:
+                continue
+            with span('serialize', rows=len(batch)):
+                encoded = serializer.encode_rows(batch)
+            with span('write', rows=len(batch)):
+                if array:
+                    f.write((b',\n' if count else b'\n') + b',\n'.join(encoded))
+                else:
+                    f.write(b'\n'.join(encoded) + b'\n')
+            count += len(batch)
+        if array:
+            f.write(b'\n]\n' if count else b']\n')
+    return count
+
+def encode_batches(batches: Iterable[Sequence[Dict[str, Any]]], fmt: str = 'ndjson',
+                   use_orjson: bool = True, empty_header: Callable[[], List[str]] = None) -> Iterator[bytes]:
+    """
+    Encode row batches as CSV, JSON Lines or a JSON array, one chunk of UTF-8 bytes per batch.
+
+    For streaming to stdout or a socket; write_json() and write_csv() write files.
+
+    :param batches: Iterable of row batches (ResultSets or row dictionaries)
+    :param fmt: 'csv', 'ndjson' (or 'jsonl') or 'json'
+    :param use_orjson: Use orjson when it is installed
+    :param empty_header: Callable returning the CSV header sent when there are no rows
+    """
+    if fmt == 'csv':
+        text = io.StringIO()
+        writer = csv.writer(text)
+        headers = None
+        for batch in batches:
+            if not batch:
+                continue
+            if headers is None:
+                headers = list(batch.columns) if isinstance(batch, ResultSet) else list(batch[0].keys())
+                writer.writerow(headers)
+            if isinstance(batch, ResultSet) and list(batch.columns) == headers:
+                writer.writerows(batch.rows)
+            else:
+                writer.writerows([[row.get(header) for header in headers] for row in batch])
+            chunk = text.getvalue().encode('utf-8')
+            text.seek(0)
+            text.truncate()
+            yield chunk
+        if headers is None and empty_header is not None:
+            writer.writerow(empty_header())
+            yield text.getvalue().encode('utf-8')
+        return
+    if fmt not in JSON_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    array = JSON_FORMATS[fmt] == 'json'
+    serializer = RowSerializer(use_orjson)
+    count = 0
+    if array:
+        yield b'['
+    for batch in batches:
+        if not batch:
+            continue
+        encoded = serializer.encode_rows(batch)
+        if array:
+            yield (b',\n' if count else b'\n') + b',\n'.join(encoded)
+        else:
+            yield b'\n'.join(encoded) + b'\n'
+        count += len(batch)
+    if array:
+        yield b'\n]\n' if count else b']\n'
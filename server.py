@@ -0,0 +1,418 @@
+"""
+Read-only HTTP service for browsing databases without the desktop app.
+
+Requests are served concurrently (one thread each) from a fixed-size pool of
+connected handlers; a request that cannot get a connection within
+``acquire_timeout`` seconds is answered 503. Connections are made read-only
+where the backend can enforce it (SQLite ``query_only``, PostgreSQL and
+MySQL read-only sessions), and only single SELECT/WITH/VALUES statements
+are accepted.
+
+Rows are streamed with chunked transfer encoding, a batch per chunk, as
+JSON Lines (default), CSV or a JSON array. Every request runs under a
+QueryLimits with the server's time limit (the statement itself is
+interrupted on the SQL backends) and, for queries, its row limit. A result
+cut short by a limit ends with an ``X-Truncated`` trailer.
+
+Endpoints:
+    GET /health                      pool statistics
+    GET /tables                      {"tables": [...]}
+    GET /tables/<table>?page=1&page_size=100&order_by=name,-id&columns=id,name&format=csv
+    GET /query?sql=...&param=...&format=ndjson
+    POST /query                      JSON {"sql": ..., "params": [...], "format": ...} or the SQL as text
+
+Example:
+    python server.py --db sales.db --port 8080 --pool-size 4 --timeout 30
+    curl 'http://localhost:8080/tables/orders?page=2&page_size=50'
+    curl --data 'SELECT status, COUNT(*) AS n FROM orders GROUP BY status' 'http://localhost:8080/query?format=csv'
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from database_handlers import DatabaseHandler
+from limits import PartialResult, QueryLimits
+from query_log import normalize_query
+from serializer import CONTENT_TYPES, encode_batches
+from tracing import span
+
+DEFAULT_PORT = 8080
+# Connections opened at most; further concurrent requests wait for one
+DEFAULT_POOL_SIZE = 4
+# Seconds a request waits for a pooled connection before it is answered 503
+ACQUIRE_TIMEOUT = 5.0
+# Seconds a request may run (statement plus streaming)
+DEFAULT_TIMEOUT = 30.0
+# Rows a /query response returns at most
+DEFAULT_MAX_ROWS = 100000
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+# Rows fetched per chunk sent
+STREAM_BATCH_SIZE = 500
+
+logger = logging.getLogger('QueryServer')
+
+_READ_QUERY = re.compile(r'\s*(select|with|values)\b', re.IGNORECASE)
+
+class RequestError(ValueError):
+    """Invalid request, answered with an HTTP error status"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+class HandlerPool:
+    """Fixed-size pool of connected, read-only handlers shared by request threads"""
+
+    def __init__(self, factory: Callable[[], DatabaseHandler], size: int = DEFAULT_POOL_SIZE,
+                 acquire_timeout: float = ACQUIRE_TIMEOUT):
+        """
+        :param factory: Returns a new, unconnected handler
+        :param size: Connections open at most
+        :param acquire_timeout: Seconds to wait for a free connection
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.factory = factory
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        # Most recently returned first, so idle connections beyond the load stay unused
+        self._idle: 'queue.LifoQueue[DatabaseHandler]' = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self.in_use = 0
+        self.timeouts = 0
+        self.closed = False
+
+    def _connect(self) -> DatabaseHandler:
+        handler = self.factory()
+        # A pooled connection serves one request at a time, but not always from the same thread
+        handler.check_same_thread = False
+        handler.connect()
+        handler.set_read_only()
+        with self._lock:
+            self._open += 1
+        return handler
+
+    def _discard(self, handler: DatabaseHandler) -> None:
+        with self._lock:
+            self._open -= 1
+        try:
+            handler.close()
+        except Exception as e:
+            logger.debug(f"Error closing a pooled connection: {e}")
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[DatabaseHandler]:
+        """Borrow a handler for the duration of a request."""
+        if self.closed:
+            raise RequestError("Server is shutting down", 503)
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise RequestError(f"No database connection free within {self.acquire_timeout:g}s", 503)
+        try:
+            try:
+                handler = self._idle.get_nowait()
+            except queue.Empty:
+                handler = self._connect()
+            with self._lock:
+                self.in_use += 1
+            reusable = False
+            try:
+                yield handler
+                reusable = True
+            except RequestError:
+                reusable = True
+                raise
+            finally:
+                with self._lock:
+                    self.in_use -= 1
+                # Otherwise the connection may be mid-statement; replace it
+                if reusable and not self.closed:
+                    try:
+                        # End the read transaction so an idle connection holds no snapshot
+                        handler.rollback()
+                        self._idle.put(handler)
+                    except Exception as e:
+                        logger.warning(f"Dropping a pooled connection: {e}")
+                        self._discard(handler)
+                else:
+                    self._discard(handler)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Close the idle connections; connections in use are closed when returned."""
+        self.closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self.in_use,
+                'idle': self._idle.qsize(),
+                'timeouts': self.timeouts,
+            }
+
+def _deadline_batches(batches: Iterator[List[Dict[str, Any]]], limits: QueryLimits,
+                      deadline: float) -> Iterator[List[Dict[str, Any]]]:
+    """Stop a batch stream between batches once the request's time is up."""
+    try:
+        for batch in batches:
+            yield batch
+            if isinstance(batch, PartialResult):
+                return
+            if time.monotonic() > deadline:
+                yield PartialResult([], 'max_seconds', limits)
+                return
+    finally:
+        batches.close()
+
+class BrowserRequestHandler(BaseHTTPRequestHandler):
+    """Routes the read-only endpoints of a QueryServer"""
+
+    protocol_version = 'HTTP/1.1'
+    server: 'QueryServer'
+
+    def log_message(self, format: str, *args) -> None:
+        logger.info(f"{self.address_string()} {format % args}")
+
+    def do_GET(self) -> None:
+        self._dispatch('GET')
+
+    def do_POST(self) -> None:
+        self._dispatch('POST')
+
+    def _dispatch(self, method: str) -> None:
+        if method == 'POST' and urlsplit(self.path).path.rstrip('/') != '/query':
+            # The request body is left unread; the connection cannot carry another request
+            self.close_connection = True
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip('/') or '/'
+        try:
+            with span('http_request', method=method, path=path):
+                if path == '/health' and method == 'GET':
+                    self._send_json(200, {'status': 'ok', 'pool': self.server.pool.to_dict()})
+                elif path == '/tables' and method == 'GET':
+                    with self.server.pool.connection() as handler:
+                        tables = handler.get_tables()
+                    self._send_json(200, {'tables': tables})
+                elif path.startswith('/tables/') and method == 'GET':
+                    self._table_page(unquote(path[len('/tables/'):]), query)
+                elif path == '/query':
+                    self._query(method, query)
+                else:
+                    raise RequestError(f"No endpoint {method} {path}", 404)
+        except RequestError as e:
+            self._send_json(e.status, {'error': str(e)})
+        except Exception as e:
+            logger.exception(f"{method} {self.path} failed")
+            self._send_json(500, {'error': str(e)})
+
+    @staticmethod
+    def _argument(query: Dict[str, List[str]], name: str, default: Any = None) -> Any:
+        values = query.get(name)
+        return values[-1] if values else default
+
+    def _integer(self, query: Dict[str, List[str]], name: str, default: int, low: int, high: int) -> int:
+        text = self._argument(query, name)
+        if text is None:
+            return default
+        try:
+            value = int(text)
+        except ValueError:
+            raise RequestError(f"{name} must be an integer")
+        if not low <= value <= high:
+            raise RequestError(f"{name} must be between {low} and {high}")
+        return value
+
+    def _format(self, value: Optional[str]) -> str:
+        fmt = (value or 'ndjson').lower()
+        if fmt == 'jsonl':
+            fmt = 'ndjson'
+        if fmt not in CONTENT_TYPES:
+            raise RequestError(f"Unsupported format: {fmt}; use one of {', '.join(sorted(CONTENT_TYPES))}")
+        return fmt
+
+    def _limits(self, max_rows: Optional[int] = None) -> QueryLimits:
+        return QueryLimits(max_rows=max_rows, max_seconds=self.server.timeout)
+
+    def _table_page(self, table: str, query: Dict[str, List[str]]) -> None:
+        page = self._integer(query, 'page', 1, 1, 10 ** 9)
+        page_size = self._integer(query, 'page_size', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        fmt = self._format(self._argument(query, 'format'))
+        columns = [c for c in (self._argument(query, 'columns') or '').split(',') if c] or None
+        order_by = [(term[1:], 'desc') if term.startswith('-') else (term, 'asc')
+                    for term in (self._argument(query, 'order_by') or '').split(',') if term]
+        limits = self._limits()
+        with self.server.pool.connection() as handler:
+            if table not in handler.get_tables():
+                raise RequestError(f"No table {table}", 404)
+            known = set(handler.get_columns(table))
+            unknown = [c for c in list(columns or ()) + [c for c, _ in order_by] if c not in known]
+            if unknown:
+                raise RequestError(f"Unknown columns: {', '.join(unknown)}")
+            if not order_by and handler.LIMIT_CLAUSE:
+                # Pages of SQL tables are only stable in a fixed order
+                order_by = handler.get_primary_key(table)
+            batches = handler.read_page(table, (page - 1) * page_size, page_size, columns, order_by or None,
+                                        batch_size=STREAM_BATCH_SIZE, limits=limits)
+            self._stream(batches, fmt, limits, empty_header=lambda: columns or handler.get_columns(table))
+
+    def _query(self, method: str, query: Dict[str, List[str]]) -> None:
+        sql = self._argument(query, 'sql')
+        params: Sequence[Any] = query.get('param', [])
+        fmt = self._argument(query, 'format')
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8') if length else ''
+            if (self.headers.get('Content-Type') or '').startswith('application/json'):
+                try:
+                    request = json.loads(body or '{}')
+                except ValueError as e:
+                    raise RequestError(f"Invalid JSON body: {e}")
+                if not isinstance(request, dict):
+                    raise RequestError("JSON body must be an object")
+                sql = request.get('sql', sql)
+                params = request.get('params') or params
+                fmt = request.get('format', fmt)
+            elif body:
+                sql = body
+        fmt = self._format(fmt)
+        if not sql or not _READ_QUERY.match(sql):
+            raise RequestError("Only SELECT, WITH and VALUES queries are accepted")
+        if ';' in normalize_query(sql):
+            raise RequestError("One statement per request")
+        if not isinstance(params, (list, tuple)):
+            raise RequestError("params must be a list")
+        limits = self._limits(self.server.max_rows)
+        with self.server.pool.connection() as handler:
+            if not handler.SQL_QUERIES:
+                raise RequestError(f"{type(handler).__name__} does not run SQL queries")
+            batches = handler.iter_limited(sql, tuple(params) or None, limits, batch_size=STREAM_BATCH_SIZE)
+            self._stream(batches, fmt, limits)
+
+    def _stream(self, batches: Iterator[List[Dict[str, Any]]], fmt: str, limits: QueryLimits,
+                empty_header: Callable[[], List[str]] = None) -> None:
+        """Send row batches as a chunked response; errors before the first chunk become 400."""
+        truncated: List[PartialResult] = []
+
+        def watched():
+            for batch in _deadline_batches(batches, limits, time.monotonic() + self.server.timeout):
+                if isinstance(batch, PartialResult):
+                    truncated.append(batch)
+                yield batch
+        chunks = encode_batches(watched(), fmt, empty_header=empty_header)
+        try:
+            first = next(chunks, b'')
+        except Exception as e:
+            # The statement failed (syntax, unknown table, write on a read-only connection...)
+            chunks.close()
+            raise RequestError(str(e))
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES[fmt])
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Trailer', 'X-Truncated')
+        self.end_headers()
+        try:
+            self._write_chunk(first)
+            for chunk in chunks:
+                self._write_chunk(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info(f"{self.address_string()} disconnected during {self.path}")
+            self.close_connection = True
+            chunks.close()
+            return
+        except Exception:
+            # Headers are gone; ending without the last chunk tells the client the body is incomplete
+            logger.exception(f"Streaming {self.path} failed")
+            self.close_connection = True
+            chunks.close()
+            return
+        self.wfile.write(b'0\r\n')
+        if truncated:
+            self.wfile.write(f'X-Truncated: {truncated[0].describe()}\r\n'.encode('latin-1'))
+        self.wfile.write(b'\r\n')
+
+    def _write_chunk(self, data: bytes) -> None:
+        if data:
+            self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPES['json'])
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class QueryServer(ThreadingHTTPServer):
+    """HTTP server answering each request in its own thread from a HandlerPool"""
+
+    daemon_threads = True
+
+    def __init__(self, address, pool: HandlerPool, timeout: float = DEFAULT_TIMEOUT,
+                 max_rows: int = DEFAULT_MAX_ROWS):
+        """
+        :param address: (host, port) to listen on; port 0 picks a free port
+        :param pool: Connections the requests share
+        :param timeout: Seconds a request may run
+        :param max_rows: Rows a /query response returns at most
+        """
+        super().__init__(address, BrowserRequestHandler)
+        self.pool = pool
+        self.timeout = timeout
+        self.max_rows = max_rows
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.close()
+
+def main(argv: Sequence[str] = None) -> int:
+    from cli import add_connection_arguments, create_handler
+    parser = argparse.ArgumentParser(prog='server.py', description='Serve a database read-only over HTTP.')
+    add_connection_arguments(parser)
+    parser.add_argument('--listen', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE, help='Database connections')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Seconds per request')
+    parser.add_argument('--max-rows', type=int, default=DEFAULT_MAX_ROWS, help='Rows per /query response')
+    args = parser.parse_args(argv)
+    if not args.db and not args.type:
+        parser.error('one of --db or --type is required')
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
+    logger.addHandler(console)
+    logger.setLevel(logging.INFO)
+
+    pool = HandlerPool(lambda: create_handler(args), args.pool_size)
+    server = QueryServer((args.listen, args.port), pool, args.timeout, args.max_rows)
+    logger.info(f"Serving {args.db or args.database} on http://{args.listen}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+"""
+External merge sort for handlers that cannot sort on the server.
+
+dBase and MVO tables are read as a stream of batches. external_sort() sorts
+the stream within a memory budget: rows are collected until the budget is
+reached, sorted and spilled to a temporary file as a sorted run, and the runs
+are finally merged with ``heapq.merge``, so only one buffered chunk per run is
+held in memory while the sorted rows are produced.
+
+Order specifications are (column, direction) tuples, direction being 'asc' or
+'desc'. As in PostgreSQL, NULLs sort last in ascending and first in descending order.
+"""
+
+import heapq
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from tracing import span
+
+DEFAULT_MEMORY_BUDGET = 128 * 1024 * 1024
+# Rows pickled together in a run file; larger chunks read faster but hold more memory per run
+RUN_CHUNK_ROWS = 1000
+
+logger = logging.getLogger('ExternalSort')
+
+class _Descending:
+    """Wraps a sort key to invert its ordering"""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+def normalize_order_by(order_by: Sequence[Any]) -> List[Tuple[str, str]]:
+    """
+    Validate an order specification.
+
+    :param order_by: Column names or (column, 'asc'|'desc') tuples
+    :return: List of (column, direction) tuples
+    """
+    normalized = []
+    for item in order_by:
+        column, direction = (item, 'asc') if isinstance(item, str) else item
+        direction = direction.lower()
+        if direction not in ('asc', 'desc'):
+            raise ValueError(f"Unsupported sort direction: {direction}")
+        normalized.append((column, direction))
+    return normalized
+
+def sort_key(order_by: Sequence[Any]) -> Callable[[Dict[str, Any]], tuple]:
+    """Build a key function for rows from an order specification."""
+    order_by = normalize_order_by(order_by)
+
+    def key(row: Dict[str, Any]) -> tuple:
+        parts = []
+        for column, direction in order_by:
+            value = row.get(column)
+            part = (False, value) if value is not None else (True, 0)
+            parts.append(_Descending(part) if direction == 'desc' else part)
+        return tuple(parts)
+    return key
+
+def _write_run(rows: List[Dict[str, Any]], spill_dir: str) -> str:
+    fd, path = tempfile.mkstemp(prefix='dbbrowser_sort_', suffix='.run', dir=spill_dir)
+    with os.fdopen(fd, 'wb') as f:
+        for offset in range(0, len(rows), RUN_CHUNK_ROWS):
+            pickle.dump(rows[offset:offset + RUN_CHUNK_ROWS], f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+def _read_run(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                return
+            yield from chunk
+
+def _estimate_row_size(row: Dict[str, Any]) -> int:
+    return sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row.values())
+
+def external_sort(batches: Iterable[Sequence[Dict[str, Any]]], order_by: Sequence[Any],
+                  memory_budget: int = DEFAULT_MEMORY_BUDGET, spill_dir: str = None,
+                  batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Sort a stream of row batches, spilling sorted runs to disk above a memory budget.
+
+    :param batches: Iterable of row-dictionary batches, e.g. a handler's iter_table()
+    :param order_by: Column names or (column, 'asc'|'desc') tuples
+    :param memory_budget: Approximate bytes of rows held in memory before a run is spilled
+    :param spill_dir: Directory for run files (system temp dir by default)
+    :param batch_size: Rows per yielded batch
+    """
+    key = sort_key(order_by)
+    buffer: List[Dict[str, Any]] = []
+    used = 0
+    runs: List[str] = []
+    try:
+        for batch in batches:
+            buffer.extend(batch)
+            # Sampling the first row of each batch keeps the estimate cheap
+            if batch:
+                used += _estimate_row_size(batch[0]) * len(batch)
+            if used > memory_budget:
+                with span('sort_run', rows=len(buffer)):
+                    buffer.sort(key=key)
+                    runs.append(_write_run(buffer, spill_dir))
+                buffer = []
+                used = 0
+
+        with span('sort_run', rows=len(buffer)):
+            buffer.sort(key=key)
+        if not runs:
+            for offset in range(0, len(buffer), batch_size):
+                yield buffer[offset:offset + batch_size]
+            return
+
+        logger.info(f"Sort exceeded {memory_budget} bytes; merging {len(runs) + 1} sorted runs")
+        merged = heapq.merge(*[_read_run(path) for path in runs], buffer, key=key)
+        batch = []
+        for row in merged:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        for path in runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
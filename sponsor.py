@@ -1,5 +1,4 @@
 import tkinter as tk
-import webbrowser
 
 # Sponsor Class
 class Sponsor:
@@ -7,6 +6,7 @@ class Sponsor:
         self.root = root
 
     def show_sponsor(self):
+        import webbrowser
         dialog = tk.Toplevel(self.root)
         dialog.title("Sponsor the Project")
         dialog.geometry('500x150')
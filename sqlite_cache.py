@@ -0,0 +1,213 @@
+"""
+Local SQLite acceleration cache for legacy file formats.
+
+dBase and MVO sources only support full scans, and Access needs an ODBC round
+trip for every browse. SQLiteCache materializes a source table into a local
+SQLite file (bulk-loaded, with indexes on chosen columns) keyed by the source
+path and modification time; handlers with the cache enabled then serve
+queries, sorts and page fetches from it at SQLite speed.
+"""
+
+import datetime
+import decimal
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from metrics import get_registry
+from result_set import as_result_set
+from table_copy import generic_type
+from tracing import span
+
+CACHE_DIR_ENV = 'DBBROWSER_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.dbbrowser', 'cache')
+
+# Rows inserted per executemany() call while materializing
+LOAD_BATCH_SIZE = 10000
+
+logger = logging.getLogger('SQLiteCache')
+
+def _column_type(value: Any) -> str:
+    if isinstance(value, bool) or isinstance(value, int):
+        return 'INTEGER'
+    if isinstance(value, (float, decimal.Decimal)):
+        return 'REAL'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return 'BLOB'
+    return 'TEXT'
+
+# Generic column type (see table_copy.generic_type) -> SQLite type of its cache column; others are TEXT
+_DECLARED_TYPES = {
+    'integer': 'INTEGER', 'bigint': 'INTEGER', 'boolean': 'INTEGER',
+    'float': 'REAL', 'decimal': 'REAL', 'blob': 'BLOB',
+}
+
+def _declared_type(native: str) -> str:
+    # decimal(p,s) loses its arguments, as REAL has none
+    return _DECLARED_TYPES.get(generic_type(native or '').split('(')[0], 'TEXT')
+
+def to_sqlite_value(value: Any) -> Any:
+    """Convert driver values (dbf dates, decimals...) to types SQLite stores natively."""
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return str(value)
+
+class SQLiteCache:
+    """SQLite cache file holding materialized copies of one source's tables"""
+
+    def __init__(self, source_path: str, cache_dir: str = None):
+        """
+        :param source_path: Path of the source database file
+        :param cache_dir: Directory for cache files (``DBBROWSER_CACHE_DIR`` or ~/.dbbrowser/cache)
+        """
+        self.source_path = os.path.abspath(source_path)
+        self.cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        digest = hashlib.sha1(self.source_path.encode('utf-8')).hexdigest()[:16]
+        base = os.path.splitext(os.path.basename(source_path))[0]
+        self.cache_path = os.path.join(self.cache_dir, f'{base}-{digest}.sqlite')
+        self.handler = None
+        self.logger = logger
+
+    def open(self) -> None:
+        """Open (creating if needed) the cache file."""
+        if self.handler is not None:
+            return
+        # Imported here to avoid a circular import with database_handlers
+        from database_handlers import SQLiteHandler
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.handler = SQLiteHandler(self.cache_path)
+        self.handler.connect()
+        self.handler.conn.execute("""
+            CREATE TABLE IF NOT EXISTS _dbbrowser_cache (
+                table_name TEXT PRIMARY KEY,
+                source_mtime REAL,
+                source_size INTEGER,
+                row_count INTEGER,
+                indexes TEXT,
+                created_at REAL
+            )
+        """)
+        self.handler.conn.commit()
+
+    def close(self) -> None:
+        if self.handler is not None:
+            self.handler.close()
+            self.handler = None
+
+    def _source_stamp(self):
+        stat = os.stat(self.source_path)
+        return stat.st_mtime, stat.st_size
+
+    def is_fresh(self, table_name: str, index_columns: Sequence[str] = ()) -> bool:
+        """Whether the cached copy of a table matches the source file and requested indexes."""
+        self.open()
+        row = self.handler.conn.execute(
+            "SELECT source_mtime, source_size, indexes FROM _dbbrowser_cache WHERE table_name = ?",
+            (table_name,)
+        ).fetchone()
+        if row is None:
+            return False
+        mtime, size = self._source_stamp()
+        cached_indexes = set(filter(None, (row[2] or '').split(',')))
+        return row[0] == mtime and row[1] == size and set(index_columns) <= cached_indexes
+
+    def materialize(self, source_handler, table_name: str,
+                    index_columns: Sequence[str] = ()) -> Optional[int]:
+        """
+        Bulk-load a table from ``source_handler`` into the cache.
+
+        :param source_handler: Connected handler of the source database
+        :param table_name: Table to copy
+        :param index_columns: Columns to index after loading
+        :return: Number of rows loaded, or None if the table has no columns and was not cached
+        """
+        self.open()
+        conn = self.handler.conn
+        quote = self.handler.quote_identifier
+        mtime, size = self._source_stamp()
+        start = time.perf_counter()
+        count = 0
+        with span('cache_materialize', table=table_name):
+            # The cache is disposable, so trade durability for load speed
+            conn.execute('PRAGMA journal_mode=OFF')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('BEGIN')
+            try:
+                conn.execute(f'DROP TABLE IF EXISTS {quote(table_name)}')
+                columns: Optional[List[str]] = None
+                insert = None
+                for batch in source_handler.iter_table(table_name, LOAD_BATCH_SIZE):
+                    batch = as_result_set(batch)
+                    if columns is None:
+                        columns = list(batch.columns)
+                        definitions = ', '.join(
+                            f'{quote(column)} {_column_type(self._first_value(batch, column))}'
+                            for column in columns
+                        )
+                        conn.execute(f'CREATE TABLE {quote(table_name)} ({definitions})')
+                        insert = (f'INSERT INTO {quote(table_name)} VALUES '
+                                  f'({", ".join("?" * len(columns))})')
+                    if list(batch.columns) != columns:
+                        batch = batch.project(columns)
+                    conn.executemany(insert, [[to_sqlite_value(value) for value in values] for values in batch.rows])
+                    count += len(batch)
+                if columns is None:
+                    # No rows to take types from: use the source's declared column types
+                    column_types = source_handler.get_column_types(table_name)
+                    if not column_types:
+                        # SQLite tables need a column; leave reads of this one to the source
+                        conn.execute('ROLLBACK')
+                        self.logger.info(f"Not caching {table_name}: it has no rows or columns")
+                        return None
+                    definitions = ', '.join(f'{quote(column)} {_declared_type(column_type)}'
+                                            for column, column_type in column_types)
+                    conn.execute(f'CREATE TABLE {quote(table_name)} ({definitions})')
+                for column in index_columns:
+                    conn.execute(f'CREATE INDEX {quote(f"ix_{table_name}_{column}")} '
+                                 f'ON {quote(table_name)} ({quote(column)})')
+                conn.execute(
+                    "INSERT OR REPLACE INTO _dbbrowser_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (table_name, mtime, size, count, ','.join(index_columns), time.time())
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        get_registry().inc('cache_loads_total', handler=type(source_handler).__name__, table=table_name)
+        self.logger.info(f"Cached {count} rows of {table_name} in {time.perf_counter() - start:.2f}s")
+        return count
+
+    @staticmethod
+    def _first_value(batch: List[Dict[str, Any]], column: str) -> Any:
+        for row in batch:
+            if row.get(column) is not None:
+                return row[column]
+        return None
+
+    def ensure(self, source_handler, table_name: str, index_columns: Sequence[str] = ()) -> bool:
+        """
+        Materialize a table unless an up-to-date copy is already cached.
+
+        :return: Whether the table can be read from the cache
+        """
+        if self.is_fresh(table_name, index_columns):
+            get_registry().inc('cache_hits_total', handler=type(source_handler).__name__,
+                               table=table_name)
+            return True
+        get_registry().inc('cache_misses_total', handler=type(source_handler).__name__,
+                           table=table_name)
+        return self.materialize(source_handler, table_name, index_columns) is not None
+
+    def invalidate(self) -> None:
+        """Delete the cache file."""
+        self.close()
+        if os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
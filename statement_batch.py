@@ -0,0 +1,78 @@
+"""
+Batched execution of many statements in one transaction.
+
+DatabaseHandler.execute_batch() takes a list of statements (data fixes,
+maintenance scripts) and runs them in a single transaction, returning one
+StatementResult per statement. Over a network link, the round trip per
+statement dominates; the network backends therefore send several statements
+per request:
+
+- PostgreSQL: consecutive statements that return no rows are interpolated
+  client-side and sent as one multi-statement query, a page at a time
+- MySQL: a page of statements goes out as one multi-statement packet, and
+  the result of each is read back with nextset()
+- SQLite and Access run locally and execute the statements one by one
+
+Example:
+    results = handler.execute_batch([
+        ("UPDATE accounts SET status = %s WHERE id = %s", ('closed', 17)),
+        "DELETE FROM sessions WHERE expires_at < now()",
+        "SELECT COUNT(*) AS open FROM accounts WHERE status = 'open'",
+    ])
+    print(results[2].rows, [result.rowcount for result in results[:2]])
+"""
+
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Statements sent to the server per round trip
+DEFAULT_PAGE_SIZE = 100
+
+# Statements that return rows (and so are not packed with others on PostgreSQL)
+_ROW_STATEMENT = re.compile(r'\s*(select|with|values|show|explain|pragma|describe|desc)\b', re.IGNORECASE)
+_RETURNING = re.compile(r'\breturning\b', re.IGNORECASE)
+
+Statement = Union[str, Tuple[str, Optional[Sequence[Any]]]]
+
+class StatementResult:
+    """Outcome of one statement of a batch"""
+
+    def __init__(self, query: str, params: Optional[Sequence[Any]] = None,
+                 rows: Optional[List[Dict[str, Any]]] = None, rowcount: Optional[int] = None):
+        """
+        :param query: SQL statement
+        :param params: Its parameters
+        :param rows: Rows returned, for statements that return rows
+        :param rowcount: Rows affected; None when the driver cannot tell (statements sent together)
+        """
+        self.query = query
+        self.params = params
+        self.rows = rows
+        self.rowcount = rowcount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'query': self.query,
+            'params': list(self.params) if self.params is not None else None,
+            'rows': self.rows,
+            'rowcount': self.rowcount,
+        }
+
+def normalize_statements(statements: Sequence[Statement]) -> List[Tuple[str, Optional[tuple]]]:
+    """Turn SQL strings and (SQL, parameters) pairs into (SQL, parameters or None) pairs."""
+    normalized = []
+    for statement in statements:
+        if isinstance(statement, str):
+            normalized.append((statement, None))
+        else:
+            query, params = statement
+            normalized.append((query, tuple(params) if params else None))
+    return normalized
+
+def returns_rows(query: str) -> bool:
+    """Whether a statement returns rows (queries, and writes with a RETURNING clause)."""
+    return bool(_ROW_STATEMENT.match(query) or _RETURNING.search(query))
+
+def pages(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,176 @@
+"""
+Prepared statement cache for parameterized queries.
+
+Running the same SQL text with different parameters (paging by key, row
+lookups) makes the server parse and plan it on every call. A
+StatementCache remembers the statements one connection has prepared, keyed
+by their SQL text, so a repeated query only sends EXECUTE with its new
+parameters:
+
+- PostgreSQL: ``PREPARE name AS ...`` / ``EXECUTE name (...)``
+- MySQL: ``PREPARE name FROM ...`` / ``EXECUTE name USING @vars``
+- SQLite: the sqlite3 module's own statement cache, sized to match; the
+  StatementCache only mirrors it to count hits
+
+The least recently used statement is deallocated once the cache is full.
+A query the server refuses to prepare (e.g. a parameter whose type cannot
+be inferred, such as ``SELECT %s``) is remembered as unpreparable and runs
+through the driver's plain execute() from then on. Lookups are counted in
+the ``prepared_statement_cache_total`` metric (labels ``handler`` and
+``result``: hit, miss, eviction or unprepared).
+
+Example:
+    handler.statement_cache_size = 200   # before connect(); 0 disables the cache
+    handler.connect()
+    for key in keys:
+        handler.execute_query('SELECT * FROM orders WHERE id = %s', (key,))
+    print(handler.statements.to_dict())
+"""
+
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from metrics import get_registry
+
+# Statements kept prepared per connection
+DEFAULT_CAPACITY = 100
+# Prefix of server-side statement names; a counter keeps names unique per connection
+STATEMENT_PREFIX = 'dbbrowser_stmt_'
+
+# Statements the servers accept in PREPARE
+_PREPARABLE = re.compile(r'\s*(select|with|values|insert|update|delete)\b', re.IGNORECASE)
+# DB-API 'format' placeholders and escaped percent signs
+_FORMAT_PLACEHOLDER = re.compile(r'%%|%s')
+
+logger = logging.getLogger('StatementCache')
+
+def preparable(query: str, params: Any = None) -> bool:
+    """
+    Whether a query can go through a statement cache (DML with positional parameters).
+
+    Parameters that are tuples or lists are expanded by the driver (``IN %s``),
+    which a server-side placeholder cannot do, so such queries are not prepared.
+    """
+    if not (_PREPARABLE.match(query) and '%(' not in query):
+        return False
+    return not any(isinstance(value, (tuple, list)) for value in params or ())
+
+def convert_placeholders(query: str, placeholder: Callable[[int], str]) -> str:
+    """
+    Replace ``%s`` placeholders with a server's own, unescaping ``%%``.
+
+    :param query: Query in the DB-API 'format' paramstyle
+    :param placeholder: Function returning the placeholder for parameter n (from 1)
+    """
+    count = 0
+
+    def replace(match) -> str:
+        nonlocal count
+        if match.group() == '%%':
+            return '%'
+        count += 1
+        return placeholder(count)
+    return _FORMAT_PLACEHOLDER.sub(replace, query)
+
+class StatementCache:
+    """LRU cache of the prepared statements of one connection"""
+
+    def __init__(self, handler_name: str, capacity: int = DEFAULT_CAPACITY,
+                 prepare: Optional[Callable[[str, str], None]] = None,
+                 deallocate: Optional[Callable[[str], None]] = None):
+        """
+        :param handler_name: Handler class name, used as the metric label
+        :param capacity: Statements kept prepared at most
+        :param prepare: Called with (name, query) to prepare a statement on the server
+        :param deallocate: Called with the name of an evicted statement
+        """
+        if capacity < 1:
+            raise ValueError("Statement cache capacity must be at least 1")
+        self.handler_name = handler_name
+        self.capacity = capacity
+        self._prepare = prepare
+        self._deallocate = deallocate
+        # SQL text -> statement name, least recently used first
+        self._statements: 'OrderedDict[str, str]' = OrderedDict()
+        # SQL text of queries the server failed to prepare, oldest first (at most capacity)
+        self._unpreparable: 'OrderedDict[str, None]' = OrderedDict()
+        self._counter = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    def _count(self, result: str) -> None:
+        get_registry().inc('prepared_statement_cache_total', handler=self.handler_name, result=result)
+
+    def get(self, query: str) -> Optional[str]:
+        """
+        Return the name of the statement prepared for a query, preparing it on a miss.
+
+        :return: The statement name, or None if the server cannot prepare the query
+        """
+        if query in self._unpreparable:
+            self._count('unprepared')
+            return None
+        name = self._statements.get(query)
+        if name is not None:
+            self._statements.move_to_end(query)
+            self.hits += 1
+            self._count('hit')
+            return name
+        self.misses += 1
+        self._count('miss')
+        while len(self._statements) >= self.capacity:
+            _, evicted = self._statements.popitem(last=False)
+            self.evictions += 1
+            self._count('eviction')
+            if self._deallocate is not None:
+                self._deallocate(evicted)
+        self._counter += 1
+        name = f'{STATEMENT_PREFIX}{self._counter}'
+        if self._prepare is not None:
+            try:
+                self._prepare(name, query)
+            except Exception as e:
+                logger.debug(f"Running unprepared, PREPARE failed: {e}")
+                if len(self._unpreparable) >= self.capacity:
+                    self._unpreparable.popitem(last=False)
+                self._unpreparable[query] = None
+                self._count('unprepared')
+                return None
+        self._statements[query] = name
+        return name
+
+    def discard(self, query: str) -> None:
+        """
+        Forget the statement of a query that failed, so the next call prepares it again.
+
+        The server-side statement is left alone (the failed transaction may
+        not accept DEALLOCATE); its name is never reused.
+        """
+        self._statements.pop(query, None)
+
+    def clear(self) -> None:
+        """Forget every statement, e.g. after the connection was closed."""
+        self._statements.clear()
+        self._unpreparable.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'handler': self.handler_name,
+            'capacity': self.capacity,
+            'size': len(self._statements),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hit_rate, 4),
+        }
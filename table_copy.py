@@ -0,0 +1,324 @@
+"""
+Copy tables between databases of different types.
+
+copy_table() streams a table from a source handler into a destination
+handler. A reader fetches batches with the source's iter_table() while a
+writer loads earlier batches with the destination's bulk_insert() (COPY on
+PostgreSQL, multi-row INSERTs on MySQL, executemany on SQLite and Access),
+so both databases work at the same time. The queue between the two holds
+at most ``max_in_flight`` batches: a slow destination throttles the reader
+instead of letting rows pile up in memory. The load is committed once, at
+the end, and rolled back if anything fails. With ``if_exists='replace'`` the
+existing table survives a failed copy: SQLite and PostgreSQL drop it in the
+load's transaction, other backends load into a temporary table and rename it
+over the existing one once the load is committed.
+
+Column types are translated through generic type names:
+
+    source native type -> generic_type() -> destination native_type()
+
+Generic types are integer, bigint, float, decimal(p,s), varchar(n), text,
+boolean, date, datetime, time and blob.
+
+Example:
+    stats = copy_table(dbase_handler, 'customers', sqlite_handler)
+"""
+
+import datetime
+import decimal
+import logging
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from result_set import ResultSet, as_result_set
+from tracing import span
+
+DEFAULT_BATCH_SIZE = 1000
+# Batches fetched but not yet written; bounds the memory held by the pipeline
+DEFAULT_MAX_IN_FLIGHT = 4
+# Seconds between checks of the other side's state while waiting on the queue
+POLL_INTERVAL = 0.1
+
+logger = logging.getLogger('TableCopy')
+
+# End-of-stream marker passed through the queue
+_DONE = object()
+
+# Keyword found in a native type name -> generic type, checked in order
+_TYPE_KEYWORDS = (
+    ('bool', 'boolean'), ('yesno', 'boolean'), ('logical', 'boolean'),
+    ('blob', 'blob'), ('bytea', 'blob'), ('binary', 'blob'), ('image', 'blob'), ('ole', 'blob'),
+    ('interval', 'text'), ('point', 'text'), ('char', 'varchar'), ('string', 'varchar'),
+    ('timestamp', 'datetime'), ('datetime', 'datetime'), ('date', 'date'), ('time', 'time'),
+    ('bigint', 'bigint'), ('int8', 'bigint'), ('serial8', 'bigint'), ('bigserial', 'bigint'),
+    ('int', 'integer'), ('serial', 'integer'), ('counter', 'integer'), ('long', 'integer'),
+    ('short', 'integer'), ('byte', 'integer'),
+    ('numeric', 'decimal'), ('decimal', 'decimal'), ('money', 'decimal'), ('currency', 'decimal'),
+    ('double', 'float'), ('float', 'float'), ('real', 'float'),
+)
+
+def generic_type(native: str) -> str:
+    """
+    Translate a backend's column type name into a generic type.
+
+    Unknown types (and SQLite's untyped columns) become 'text'.
+    """
+    native = native.strip().lower()
+    if native.endswith('[]'):
+        return 'text'
+    match = re.match(r'([^(]*)(?:\(([^)]*)\))?', native)
+    name, args = match.group(1).strip(), match.group(2)
+    if (name == 'bit' and args in (None, '1')) or native == 'tinyint(1)':
+        # MySQL's BOOLEAN is TINYINT(1); Access and SQL Server call it BIT
+        return 'boolean'
+    for keyword, generic in _TYPE_KEYWORDS:
+        if keyword not in name:
+            continue
+        if generic == 'integer' and 'unsigned' in native:
+            # INT UNSIGNED overflows a signed 32-bit integer
+            return 'bigint'
+        if generic == 'varchar':
+            # char(n) and varchar(n) keep their length; long/unsized text types become text
+            if args and args.strip().isdigit() and 'text' not in name and 'long' not in name:
+                return f'varchar({args.strip()})'
+            return 'text'
+        if generic == 'decimal':
+            if 'money' in name or 'currency' in name:
+                return 'decimal(19,4)'
+            return f'decimal({args.replace(" ", "")})' if args else 'decimal'
+        return generic
+    return 'text'
+
+def _value_type(value: Any) -> Optional[str]:
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'bigint' if not -2 ** 31 <= value < 2 ** 31 else 'integer'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, decimal.Decimal):
+        return 'decimal'
+    # datetime is a subclass of date, so it is checked first
+    if isinstance(value, datetime.datetime):
+        return 'datetime'
+    if isinstance(value, datetime.date):
+        return 'date'
+    if isinstance(value, datetime.time):
+        return 'time'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return 'blob'
+    if value is None:
+        return None
+    return 'text'
+
+def infer_column_types(columns: Sequence[str],
+                       rows: Sequence[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    Infer generic column types from sample rows, for backends without a schema.
+
+    A column whose sampled values have different types, or only NULLs, is 'text'.
+    """
+    types = []
+    for column in columns:
+        found = {_value_type(row.get(column)) for row in rows} - {None}
+        if found == {'integer', 'bigint'}:
+            found = {'bigint'}
+        elif found == {'integer', 'float'}:
+            found = {'float'}
+        types.append((column, found.pop() if len(found) == 1 else 'text'))
+    return types
+
+def translate_schema(source, table_name: str, columns: Sequence[str] = None,
+                     column_types: Dict[str, str] = None) -> List[Tuple[str, str]]:
+    """
+    Return (column, generic type) pairs describing a source table.
+
+    :param source: Connected source DatabaseHandler
+    :param table_name: Source table
+    :param columns: Columns to keep (all columns if omitted)
+    :param column_types: Column -> generic type overrides
+    """
+    schema = [(column, generic_type(native)) for column, native in source.get_column_types(table_name)]
+    if columns:
+        by_name = dict(schema)
+        missing = [column for column in columns if column not in by_name]
+        if missing:
+            raise ValueError(f"Columns not found in {table_name}: {', '.join(missing)}")
+        schema = [(column, by_name[column]) for column in columns]
+    overrides = column_types or {}
+    return [(column, overrides.get(column, column_type)) for column, column_type in schema]
+
+class CopyStats:
+    """Progress and timing of a table copy"""
+
+    def __init__(self, source_table: str, destination_table: str):
+        self.source_table = source_table
+        self.destination_table = destination_table
+        self.rows = 0
+        self.batches = 0
+        self.seconds = 0.0
+        # Time the writer waited for the reader (source slower) and vice versa
+        self.writer_wait = 0.0
+        self.reader_wait = 0.0
+        self.pipelined = True
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source_table': self.source_table,
+            'destination_table': self.destination_table,
+            'rows': self.rows,
+            'batches': self.batches,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'writer_wait': round(self.writer_wait, 3),
+            'reader_wait': round(self.reader_wait, 3),
+            'pipelined': self.pipelined,
+        }
+
+def _thread_bound(handler) -> bool:
+    """Whether a handler's connection may only be used from the thread that opened it."""
+    # sqlite3 connections check their thread unless opened with check_same_thread=False;
+    # the local cache is always such a connection
+    return bool(getattr(handler, 'check_same_thread', False)) or handler.cache is not None
+
+def _run_pipeline(batches: Iterable[List[Any]], load, stats: CopyStats, max_in_flight: int,
+                  writer_in_thread: bool) -> None:
+    """Run the reader and the writer concurrently, one of them in a worker thread."""
+    pending: queue.Queue = queue.Queue(maxsize=max_in_flight)
+    failed = threading.Event()
+    errors: List[BaseException] = []
+
+    def put(item) -> bool:
+        # Blocks while the queue is full (back-pressure); gives up if the writer failed
+        start = time.perf_counter()
+        try:
+            while not failed.is_set():
+                try:
+                    pending.put(item, timeout=POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            stats.reader_wait += time.perf_counter() - start
+
+    def get():
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    return pending.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if failed.is_set():
+                        return _DONE
+        finally:
+            stats.writer_wait += time.perf_counter() - start
+
+    def read() -> None:
+        try:
+            for batch in batches:
+                if batch and not put(batch):
+                    return
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+        finally:
+            # Release the source cursor in the thread that used it
+            close = getattr(batches, 'close', None)
+            if close is not None:
+                close()
+            put(_DONE)
+
+    def write() -> None:
+        try:
+            while True:
+                batch = get()
+                if batch is _DONE:
+                    return
+                load(batch)
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+
+    worker = threading.Thread(target=write if writer_in_thread else read, name='table-copy', daemon=True)
+    worker.start()
+    (read if writer_in_thread else write)()
+    worker.join()
+    if errors:
+        raise errors[0]
+
+def copy_table(source, table_name: str, destination, destination_table: str = None,
+               columns: Sequence[str] = None, filters: Sequence[Tuple[str, str, Any]] = None,
+               column_types: Dict[str, str] = None, if_exists: str = 'fail',
+               batch_size: int = DEFAULT_BATCH_SIZE,
+               max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> CopyStats:
+    """
+    Copy a table from one database into another, creating the destination table.
+
+    Both handlers must be connected. A SQLite connection (or a handler with
+    the local cache enabled) can only be used from the thread that opened
+    it, so that side stays in the calling thread and the other side moves to
+    the worker thread; when both sides are such connections the copy runs
+    without pipelining.
+
+    :param source: Source DatabaseHandler (any backend)
+    :param table_name: Source table
+    :param destination: Destination DatabaseHandler (SQLite, MySQL, PostgreSQL or Access)
+    :param destination_table: Destination table name (defaults to table_name)
+    :param columns: Columns to copy (all columns if omitted)
+    :param filters: (column, operator, value) tuples selecting the rows to copy
+    :param column_types: Column -> generic type overrides for the destination table
+    :param if_exists: 'fail', 'replace' or 'append' when the destination table exists
+    :param batch_size: Rows per batch
+    :param max_in_flight: Batches buffered between the reader and the writer
+    :return: CopyStats
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    destination_table = destination_table or table_name
+    stats = CopyStats(table_name, destination_table)
+    schema = translate_schema(source, table_name, columns, column_types)
+    names = [column for column, _ in schema]
+    # A replaced table is dropped in the load's transaction, or swapped for a load table after it
+    load_table = destination.create_table(destination_table, schema, if_exists)
+
+    def load(batch: ResultSet) -> None:
+        batch = as_result_set(batch)
+        rows = batch.rows if list(batch.columns) == names else batch.project(names).rows
+        destination.bulk_insert(load_table, names, rows)
+        stats.rows += len(rows)
+        stats.batches += 1
+
+    start = time.perf_counter()
+    with span('copy_table', table=table_name, destination=destination_table):
+        try:
+            batches = source.iter_table(table_name, batch_size, columns=columns, filters=filters)
+            source_bound, destination_bound = _thread_bound(source), _thread_bound(destination)
+            if source_bound and destination_bound:
+                stats.pipelined = False
+                for batch in batches:
+                    if batch:
+                        load(batch)
+            else:
+                _run_pipeline(batches, load, stats, max_in_flight, writer_in_thread=source_bound)
+            destination.commit()
+        except BaseException:
+            destination.rollback()
+            if load_table != destination_table:
+                destination.drop_table(load_table)
+            raise
+        finally:
+            stats.seconds = time.perf_counter() - start
+        if load_table != destination_table:
+            # Kept if this fails: the loaded rows are committed under load_table
+            destination.replace_table(load_table, destination_table)
+    logger.info(f"Copied {stats.rows} rows from {table_name} to {destination_table} "
+                f"in {stats.seconds:.2f}s ({stats.rows_per_second:.0f} rows/s)")
+    return stats
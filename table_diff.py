@@ -0,0 +1,360 @@
+"""
+Compare a table in two databases without transferring both copies.
+
+diff_tables() checks that a table and its copy (a migration, an export
+loaded elsewhere) hold the same rows. Both tables are split into key ranges
+and each range is summarized by its row count and an order-independent
+checksum of its rows. Ranges whose summaries agree are done; the others are
+bisected into smaller ranges, down to ranges of at most ``leaf_rows`` rows,
+whose rows are fetched from both sides and compared. For tables that mostly
+match, only the checksums and the rows around the differences cross the
+network.
+
+Checksums are computed where the rows are (handler.checksum_rows()):
+
+- PostgreSQL: ``md5()`` of each row's text form, summed in the query
+- MySQL: ``MD5()`` of the concatenated columns, summed in the query
+- SQLite: the row_hash() below, registered as an aggregate function
+- others: rows are streamed and hashed with row_hash()
+
+A server-side checksum is only comparable with the same kind of checksum
+(ROW_CHECKSUM); when the two handlers differ, both sides stream their rows
+and hash them with row_hash(), which normalizes values first, so that e.g.
+Decimal('1.50') from PostgreSQL and 1.5 from SQLite hash the same.
+
+Ranges are taken over the primary key (or ``key``): integer keys are split
+arithmetically, other keys at evenly spaced keys read from the source. The
+key must sort the same way in both databases (beware of string collations).
+
+Example:
+    diff = diff_tables(postgres_handler, 'orders', sqlite_handler)
+    if not diff.matches:
+        print(diff.summary())
+        for key, columns in diff.changed:
+            ...
+"""
+
+import datetime
+import decimal
+import hashlib
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from result_set import as_result_set
+from tracing import span
+
+# Ranges of at most this many rows (on either side) are compared row by row
+DEFAULT_LEAF_ROWS = 1000
+# Sub-ranges a mismatching range is split into
+DEFAULT_BISECTION_FACTOR = 16
+# Checksums are sums of 60-bit row hashes modulo 2**60, which fit a signed 64-bit integer
+CHECKSUM_BITS = 60
+CHECKSUM_MASK = (1 << CHECKSUM_BITS) - 1
+
+logger = logging.getLogger('TableDiff')
+
+def _decimal_text(value: decimal.Decimal) -> str:
+    if not value.is_finite():
+        return str(value)
+    text = format(value.normalize(), 'f')
+    return '0' if text in ('-0', '0') else text
+
+def _float_text(value: float) -> str:
+    # Same text as the equal Decimal: 1.0 -> '1', 1.5 -> '1.5'
+    if value.is_integer() and abs(value) < 1e16:
+        return str(int(value))
+    text = repr(value)
+    if 'e' in text or 'n' in text:
+        # Exponent notation, inf and nan
+        return _decimal_text(decimal.Decimal(text))
+    return text
+
+# Exact type -> text of a value; other types go through normalize_value()'s isinstance checks
+_NORMALIZERS = {
+    str: lambda value: value,
+    int: str,
+    float: _float_text,
+    bool: lambda value: '1' if value else '0',
+    decimal.Decimal: _decimal_text,
+    bytes: bytes.hex,
+    datetime.datetime: lambda value: value.isoformat(sep=' '),
+}
+
+def normalize_value(value: Any) -> Optional[str]:
+    """Return the text compared and hashed for a value, the same across drivers (None for NULL)."""
+    if value is None:
+        return None
+    normalizer = _NORMALIZERS.get(type(value))
+    if normalizer is not None:
+        return normalizer(value)
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(int(value))
+    if isinstance(value, float):
+        return _float_text(value)
+    if isinstance(value, decimal.Decimal):
+        return _decimal_text(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (datetime.date, datetime.time, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+def normalize_row(values: Sequence[Any]) -> Tuple[Optional[str], ...]:
+    return tuple([None if value is None else _NORMALIZERS.get(type(value), normalize_value)(value)
+                  for value in values])
+
+def row_hash(values: Sequence[Any]) -> int:
+    """Return a 60-bit hash of a row's normalized values."""
+    parts = ['\x00' if text is None else '\x01' + text for text in normalize_row(values)]
+    digest = hashlib.md5('\x1f'.join(parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') & CHECKSUM_MASK
+
+class RowChecksum:
+    """SQLite aggregate: the sum of row_hash() over the rows, modulo 2**60"""
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, *values):
+        self.total = (self.total + row_hash(values)) & CHECKSUM_MASK
+
+    def finalize(self):
+        return self.total
+
+def stream_checksum(handler, table_name: str, columns: Sequence[str], filters=None) -> Tuple[int, int]:
+    """Return (row count, checksum) of the matching rows by streaming and hashing them here."""
+    count = total = 0
+    for batch in handler.iter_table(table_name, columns=list(columns), filters=filters):
+        rows = as_result_set(batch).rows
+        count += len(rows)
+        for values in rows:
+            total += row_hash(values)
+    return count, total & CHECKSUM_MASK
+
+class TableDiff:
+    """Differences between a table and its copy, and the work done to find them"""
+
+    def __init__(self, source_table: str, target_table: str, key: Sequence[str], columns: Sequence[str]):
+        self.source_table = source_table
+        self.target_table = target_table
+        self.key = list(key)
+        self.columns = list(columns)
+        self.source_rows = 0
+        self.target_rows = 0
+        # Keys of rows only in the source, only in the target, and (key, columns) of changed rows
+        self.missing: List[tuple] = []
+        self.extra: List[tuple] = []
+        self.changed: List[Tuple[tuple, List[str]]] = []
+        self.ranges_checked = 0
+        self.rows_fetched = 0
+        # Whether each side computed its own checksums (same ROW_CHECKSUM) rather than streaming rows
+        self.native_checksums = False
+        self.seconds = 0.0
+
+    @property
+    def matches(self) -> bool:
+        return not (self.missing or self.extra or self.changed)
+
+    @property
+    def fetched_fraction(self) -> float:
+        """Rows fetched for comparison, as a fraction of the rows of both tables."""
+        total = self.source_rows + self.target_rows
+        return self.rows_fetched / total if total else 0.0
+
+    def summary(self) -> str:
+        if self.matches:
+            result = f'{self.source_table} matches {self.target_table} ({self.source_rows:,} rows)'
+        else:
+            result = (f'{self.source_table} differs from {self.target_table}: {len(self.missing):,} missing, '
+                      f'{len(self.extra):,} extra, {len(self.changed):,} changed')
+        return (f'{result}; {self.ranges_checked:,} ranges checked, {self.rows_fetched:,} rows fetched '
+                f'({self.fetched_fraction:.2%}) in {self.seconds:.2f}s')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source_table': self.source_table,
+            'target_table': self.target_table,
+            'key': self.key,
+            'columns': self.columns,
+            'matches': self.matches,
+            'source_rows': self.source_rows,
+            'target_rows': self.target_rows,
+            'missing': [list(key) for key in self.missing],
+            'extra': [list(key) for key in self.extra],
+            'changed': [{'key': list(key), 'columns': columns} for key, columns in self.changed],
+            'ranges_checked': self.ranges_checked,
+            'rows_fetched': self.rows_fetched,
+            'native_checksums': self.native_checksums,
+            'seconds': round(self.seconds, 3),
+        }
+
+def _range_filters(key: Sequence[str], low: Optional[tuple], high: Optional[tuple]) -> List[Tuple[Any, str, Any]]:
+    """Filters selecting low <= key < high; None leaves that end open."""
+    column = key[0] if len(key) == 1 else tuple(key)
+    filters = []
+    if low is not None:
+        filters.append((column, '>=', low[0] if len(key) == 1 else low))
+    if high is not None:
+        filters.append((column, '<', high[0] if len(key) == 1 else high))
+    return filters
+
+class _Side:
+    """One of the two tables being compared"""
+
+    def __init__(self, handler, table_name: str, native_checksums: bool):
+        self.handler = handler
+        self.table_name = table_name
+        self.native_checksums = native_checksums
+
+    def checksum(self, columns: Sequence[str], filters) -> Tuple[int, int]:
+        if self.native_checksums:
+            return self.handler.checksum_rows(self.table_name, columns, filters)
+        # Different checksum kinds: both sides hash streamed rows the same way
+        return stream_checksum(self.handler, self.table_name, columns, filters)
+
+    def keys(self, key: Sequence[str], filters) -> List[tuple]:
+        keys = []
+        for batch in self.handler.iter_table(self.table_name, columns=list(key), filters=filters,
+                                             order_by=list(key)):
+            keys.extend(as_result_set(batch).rows)
+        return keys
+
+    def rows(self, columns: Sequence[str], filters) -> List[tuple]:
+        rows = []
+        for batch in self.handler.iter_table(self.table_name, columns=list(columns), filters=filters):
+            rows.extend(as_result_set(batch).rows)
+        return rows
+
+def _integer_bounds(sides: Sequence[_Side], key: Sequence[str], filters) -> Optional[Tuple[int, int]]:
+    """Return the smallest and largest key in the range over both tables, if the key is one integer column."""
+    if len(key) != 1:
+        return None
+    low = high = None
+    for side in sides:
+        handler = side.handler
+        if handler.SQL_QUERIES:
+            query, params = handler.build_select(side.table_name, None, filters)
+            column = handler.quote_identifier(key[0])
+            query = query.replace('SELECT *', f'SELECT MIN({column}) AS low, MAX({column}) AS high', 1)
+            row = handler.execute_query(query, params or None)[0]
+            values = [row['low'], row['high']]
+        else:
+            values = [value for (value,) in side.keys(key, filters)]
+        values = [value for value in values if value is not None]
+        if not values:
+            continue
+        if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+            return None
+        low = min(values) if low is None else min(low, min(values))
+        high = max(values) if high is None else max(high, max(values))
+    return None if low is None else (low, high)
+
+def _split(sides: Sequence[_Side], key: Sequence[str], low: Optional[tuple], high: Optional[tuple],
+           factor: int) -> List[Tuple[Optional[tuple], Optional[tuple]]]:
+    """Split a key range into up to ``factor`` sub-ranges; a single range if it cannot be split."""
+    filters = _range_filters(key, low, high)
+    bounds = _integer_bounds(sides, key, filters)
+    if bounds is not None:
+        first, last = bounds
+        step = max(1, -(-(last - first + 1) // factor))
+        points = [(value,) for value in range(first + step, last + 1, step)]
+    else:
+        # Evenly spaced keys of the source, or of the target for a range only it has rows in
+        keys = sides[0].keys(key, filters) or sides[1].keys(key, filters)
+        step = max(1, len(keys) // factor)
+        points = sorted(set(keys[step::step]))
+        points = [point for point in points if point != keys[0]]
+    edges = [low] + points + [high]
+    return [(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+
+def _compare_rows(diff: TableDiff, sides: Sequence[_Side], filters) -> None:
+    key_positions = [diff.columns.index(column) for column in diff.key]
+    found = []
+    for side in sides:
+        rows = side.rows(diff.columns, filters)
+        diff.rows_fetched += len(rows)
+        normalized = {}
+        for row in rows:
+            values = normalize_row(row)
+            normalized[tuple(row[position] for position in key_positions)] = values
+        found.append(normalized)
+    source, target = found
+    target_keys = {tuple(normalize_row(key)): key for key in target}
+    for key, values in source.items():
+        other_key = target_keys.pop(tuple(normalize_row(key)), None)
+        if other_key is None:
+            diff.missing.append(key)
+            continue
+        other = target[other_key]
+        if values != other:
+            diff.changed.append((key, [column for column, a, b in zip(diff.columns, values, other) if a != b]))
+    diff.extra.extend(target_keys.values())
+
+def diff_tables(source, source_table: str, target, target_table: str = None, key: Sequence[str] = None,
+                columns: Sequence[str] = None, leaf_rows: int = DEFAULT_LEAF_ROWS,
+                bisection_factor: int = DEFAULT_BISECTION_FACTOR) -> TableDiff:
+    """
+    Compare a table with its copy in another (or the same) database.
+
+    :param source: Handler of the original table
+    :param source_table: Table to compare
+    :param target: Handler of the copy
+    :param target_table: Name of the copy (the source table's name by default)
+    :param key: Columns identifying a row (the source's primary key by default)
+    :param columns: Columns compared (all of the source's by default); must exist in both tables
+    :param leaf_rows: Ranges with at most this many rows on either side are compared row by row
+    :param bisection_factor: Sub-ranges a mismatching range is split into
+    :return: TableDiff listing missing, extra and changed rows
+    """
+    if leaf_rows < 1 or bisection_factor < 2:
+        raise ValueError("leaf_rows must be positive and bisection_factor at least 2")
+    target_table = target_table or source_table
+    key = list(key or source.get_primary_key(source_table))
+    if not key:
+        raise ValueError(f"{source_table} has no primary key; pass key=[...] to diff it")
+    columns = list(columns or source.get_columns(source_table))
+    columns += [column for column in key if column not in columns]
+    missing = [column for column in columns if column not in target.get_columns(target_table)]
+    if missing:
+        raise ValueError(f"Columns not found in {target_table}: {', '.join(missing)}")
+
+    diff = TableDiff(source_table, target_table, key, columns)
+    diff.native_checksums = source.ROW_CHECKSUM == target.ROW_CHECKSUM
+    sides = [_Side(source, source_table, diff.native_checksums),
+             _Side(target, target_table, diff.native_checksums)]
+    start = time.perf_counter()
+    with span('diff_table', table=source_table, target=target_table):
+        # (low, high, whether the range is one of those covering the table, which give the row counts)
+        pending: List[Tuple[Optional[tuple], Optional[tuple], bool]] = [(None, None, True)]
+        estimate = source.estimate_row_count(source_table)
+        if estimate and estimate > leaf_rows * bisection_factor:
+            # Checksumming the whole table first would read every row once more than its first split
+            pending = [(low, high, True) for low, high in reversed(_split(sides, key, None, None, bisection_factor))]
+        # Depth-first, so only the ranges along the current path are pending
+        while pending:
+            low, high, top = pending.pop()
+            filters = _range_filters(key, low, high)
+            with span('checksum', low=str(low), high=str(high)):
+                summaries = [side.checksum(columns, filters) for side in sides]
+            diff.ranges_checked += 1
+            if top:
+                diff.source_rows += summaries[0][0]
+                diff.target_rows += summaries[1][0]
+            if summaries[0] == summaries[1]:
+                continue
+            if max(summaries[0][0], summaries[1][0]) > leaf_rows:
+                parts = _split(sides, key, low, high, bisection_factor)
+                if len(parts) > 1:
+                    pending.extend((part_low, part_high, False) for part_low, part_high in reversed(parts))
+                    continue
+            with span('compare', low=str(low), high=str(high)):
+                _compare_rows(diff, sides, filters)
+    diff.seconds = time.perf_counter() - start
+    logger.info(diff.summary())
+    return diff
@@ -0,0 +1,195 @@
+"""
+Opt-in tracing for Database Browser.
+
+Records nested timing spans around handler and UI stages (connect, execute,
+fetch, convert, render, write) and exports them as Chrome trace-event JSON,
+which can be opened in Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+
+Tracing is disabled by default; enable it with ``get_tracer().start()`` or by
+setting the ``DBBROWSER_TRACE`` environment variable.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List
+from metrics import is_coroutine_function
+
+# Hard cap on buffered events so a forgotten trace cannot exhaust memory
+MAX_EVENTS = 1_000_000
+
+
+class _NullSpan:
+    """Shared no-op span used while tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A single timed region, recorded as a Chrome complete ('X') event"""
+
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = f'{exc_type.__name__}: {exc}'
+        self.tracer._add_event({
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': (self.start - self.tracer._origin) / 1000.0,
+            'dur': (end - self.start) / 1000.0,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': self.args,
+        })
+        return False
+
+    def set(self, **args: Any) -> None:
+        """Attach extra arguments (row counts, byte counts...) to the span."""
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects spans from any thread and exports them as a Chrome trace"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._origin = time.perf_counter_ns()
+        self.dropped = 0
+
+    def start(self) -> None:
+        """Discard previous events and begin recording."""
+        with self._lock:
+            self._events = []
+            self._threads = {}
+            self._origin = time.perf_counter_ns()
+            self.dropped = 0
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+
+    def span(self, name: str, category: str = 'handler', **args: Any):
+        """
+        Open a span as a context manager.
+
+        :param name: Stage name shown in the trace viewer
+        :param category: Event category ('handler', 'ui', ...)
+        :param args: Extra arguments recorded with the event
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, category, args)
+
+    def _add_event(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            if len(self._events) >= MAX_EVENTS:
+                self.dropped += 1
+                return
+            self._events.append(event)
+            tid = event['tid']
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._events)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Return the recorded spans in the Chrome trace-event format."""
+        pid = os.getpid()
+        with self._lock:
+            metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                         'args': {'name': 'Database Browser'}}]
+            metadata.extend({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                             'args': {'name': name}}
+                            for tid, name in self._threads.items())
+            events = sorted(self._events, key=lambda e: e['ts'])
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped_events': self.dropped},
+        }
+
+    def export_chrome_trace(self, output_path: str) -> int:
+        """
+        Write the trace to ``output_path`` as Chrome trace-event JSON.
+
+        :return: Number of span events written
+        """
+        trace = self.to_chrome_trace()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, default=str)
+        return sum(1 for event in trace['traceEvents'] if event['ph'] == 'X')
+
+
+TRACER = Tracer()
+if os.environ.get('DBBROWSER_TRACE'):
+    TRACER.start()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer."""
+    return TRACER
+
+
+def span(name: str, category: str = 'handler', **args: Any):
+    """Shortcut for ``get_tracer().span(...)``."""
+    if not TRACER.enabled:
+        return _NULL_SPAN
+    return Span(TRACER, name, category, args)
+
+
+def traced(name: str, category: str = 'handler') -> Callable:
+    """Decorate a method so every call is recorded as a span."""
+    def decorator(func):
+        if getattr(func, '__traced__', False):
+            return func
+
+        if is_coroutine_function(func):
+            @functools.wraps(func)
+            async def wrapper(self, *args, **kwargs):
+                if not TRACER.enabled:
+                    return await func(self, *args, **kwargs)
+                with Span(TRACER, name, category, {'handler': type(self).__name__}):
+                    return await func(self, *args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(self, *args, **kwargs):
+                if not TRACER.enabled:
+                    return func(self, *args, **kwargs)
+                with Span(TRACER, name, category, {'handler': type(self).__name__}):
+                    return func(self, *args, **kwargs)
+
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator